@@ -0,0 +1,489 @@
+"""
+Streaming score analytics over the high-score history.
+
+    python analytics.py                         # high_scores.csv: per-map summary + runs per day
+    python analytics.py big_history.csv --map Ruins.map --days 60
+    python analytics.py --json stats.json --workers 4
+
+The CSV is read once, in fixed-size chunks, so memory does not grow with
+the file. Per map, the result holds the run count, the exact mean, and
+the median, p90 and p99 of score and time_sec. It also holds the number
+of runs per day, taken from the datetime column.
+
+Quantiles come from a QuantileSketch: a log-bucketed histogram with a
+relative accuracy of STATS_ACCURACY. A value v falls into bucket
+ceil(log(v) / log(gamma)), with gamma = (1 + a) / (1 - a). Any quantile
+is then within a of the exact one. A sketch keeps a few hundred buckets
+whatever the number of runs, and two sketches merge by adding their
+buckets.
+
+Speed: a chunk is split into its four columns with bytes.split and list
+slicing. Conversion (int, float, log, bucket index), day extraction and
+counting (Counter over (map, value) pairs) all run as C loops through
+map/zip. Python code only runs once per distinct (map, value) pair in a
+chunk, plus one addition per row for the exact time_sec sums. The exact
+time_sec min and max come from min()/max() over the column, and times
+of 0 are counted apart without going through log. A chunk
+that does not split into exactly four columns falls back to the csv
+module; this happens with a quoted map name containing a comma or with
+a malformed row. Large files are split into byte ranges on line
+boundaries, and each range is handled by a worker process. The workers'
+sketches are merged at the end.
+
+The same MapStats are kept up to date by the ScoreStore (scores.py). The
+map menu shows the fields listed in MENU_STATS under the Top 10.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from itertools import compress, repeat
+from operator import mul
+
+import options as cfg
+
+CHUNK_BYTES = 4 << 20      # lus d'un coup: ~100k lignes, quelques dizaines de Mo de colonnes au plus
+MIN_RANGE_BYTES = 16 << 20 # en dessous, pas de découpage entre processus
+QUANTILES = (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))
+HIST_WIDTH = 40
+DAY = slice(0, 10)         # "AAAA-MM-JJ" de datetime
+RANGE_SPLIT = 8            # cartes d'un morceau au-delà desquelles min/max passent par une boucle
+
+
+# ======================
+#   SKETCHES
+# ======================
+class QuantileSketch:
+    """Quantiles approchés (erreur relative `accuracy`) en mémoire bornée; moyenne, min et max exacts."""
+    __slots__ = ("accuracy", "gamma", "mult", "bins", "zeros", "count", "total", "min", "max")
+
+    def __init__(self, accuracy=None):
+        self.accuracy = cfg.STATS_ACCURACY if accuracy is None else accuracy
+        self.gamma = (1 + self.accuracy) / (1 - self.accuracy)
+        self.mult = 1 / math.log(self.gamma)   # valeur v > 0 -> seau ceil(log(v) * mult)
+        self.bins = {}       # indice de seau -> nombre de valeurs
+        self.zeros = 0       # valeurs <= 0 (scores nuls)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, n=1):
+        self.count += n
+        self.total += value * n
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self.zeros += n
+        else:
+            i = math.ceil(math.log(value) * self.mult)
+            self.bins[i] = self.bins.get(i, 0) + n
+
+    def add_bucket(self, i, n):
+        """
+        n valeurs > 0 déjà rangées dans le seau i. Leur somme (`total`) et les
+        bornes exactes (add_range) sont ajoutées à part par l'appelant.
+        """
+        self.count += n
+        self.bins[i] = self.bins.get(i, 0) + n
+
+    def add_range(self, low, high):
+        """Élargit min/max aux valeurs exactes d'un lot compté par add_bucket."""
+        if low < self.min:
+            self.min = low
+        if high > self.max:
+            self.max = high
+
+    def bucket_value(self, i):
+        """Valeur représentative du seau i: à `accuracy` près de toutes celles qu'il contient."""
+        return 2 * self.gamma ** i / (self.gamma + 1)
+
+    def merge(self, other):
+        for i, n in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        """Valeur au rang q (0..1), à `accuracy` près; None si vide."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return max(self.min, 0)
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if seen > rank:
+                return min(max(self.bucket_value(i), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"accuracy": self.accuracy, "bins": sorted(self.bins.items()), "zeros": self.zeros,
+                "count": self.count, "total": self.total,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        sk = cls(d["accuracy"])
+        sk.bins = {int(i): n for i, n in d["bins"]}
+        sk.zeros, sk.count, sk.total = d["zeros"], d["count"], d["total"]
+        if sk.count:
+            sk.min, sk.max = d["min"], d["max"]
+        return sk
+
+
+class MapStats:
+    """Statistiques d'une carte: esquisses de score et de temps, parties par jour."""
+    __slots__ = ("score", "time", "days")
+
+    def __init__(self, accuracy=None):
+        self.score = QuantileSketch(accuracy)
+        self.time = QuantileSketch(accuracy)
+        self.days = Counter()    # "AAAA-MM-JJ" -> parties
+
+    @property
+    def count(self):
+        return self.score.count
+
+    def add(self, score, time_sec, datetime):
+        self.score.add(score)
+        self.time.add(time_sec)
+        self.days[datetime[:10]] += 1
+
+    def merge(self, other):
+        self.score.merge(other.score)
+        self.time.merge(other.time)
+        self.days.update(other.days)
+
+    def summary(self):
+        """Dict prêt pour JSON: nombre, moyenne et quantiles de score et time_sec."""
+        out = {"runs": self.count}
+        for name, sk in (("score", self.score), ("time", self.time)):
+            out[name] = {"mean": sk.mean, "min": sk.min if sk.count else None,
+                         "max": sk.max if sk.count else None}
+            out[name].update((label, sk.quantile(q)) for label, q in QUANTILES)
+        return out
+
+    def field(self, spec):
+        """Valeur d'un champ de MENU_STATS: "runs", ou "score.p90", "time.mean"..."""
+        if spec == "runs":
+            return self.count
+        metric, _, stat = spec.partition(".")
+        sk = {"score": self.score, "time": self.time}.get(metric)
+        if sk is None:
+            return None     # champ inconnu: ignoré
+        if stat == "mean":
+            return sk.mean
+        q = dict(QUANTILES).get(stat)
+        return None if q is None else sk.quantile(q)
+
+    def to_dict(self):
+        return {"score": self.score.to_dict(), "time": self.time.to_dict(), "days": dict(self.days)}
+
+    @classmethod
+    def from_dict(cls, d):
+        st = cls()
+        st.score = QuantileSketch.from_dict(d["score"])
+        st.time = QuantileSketch.from_dict(d["time"])
+        st.days = Counter(d["days"])
+        return st
+
+
+def format_fields(stats, fields):
+    """'1234 runs · score p50 3 · time p50 42s' pour la liste de champs `fields` (MENU_STATS)."""
+    parts = []
+    for spec in fields:
+        value = stats.field(spec)
+        if spec == "runs":
+            parts.append(f"{value} runs")
+        elif value is not None:
+            metric, _, stat = spec.partition(".")
+            text = f"{value:.0f}s" if metric == "time" else f"{value:.1f}" if stat == "mean" else f"{value:.0f}"
+            parts.append(f"{metric} {stat} {text}")
+    return " · ".join(parts)
+
+
+# ======================
+#   STREAMING
+# ======================
+def _label(raw):
+    """Nom de carte brut (octets, éventuellement entre guillemets CSV) -> str."""
+    text = raw.decode("utf-8", errors="replace")
+    if text.startswith('"'):
+        text = text[1:-1].replace('""', '"')
+    return text or "Empty map"
+
+def _map_stats(stats, label):
+    st = stats.get(label)
+    if st is None:
+        st = stats[label] = MapStats()
+    return st
+
+def _column_ranges(ids, values, maps):
+    """
+    Min et max exacts de `values` par numéro de carte: {numéro: (min, max)}.
+    min()/max() en C sur la colonne (filtrée par compress quand le morceau
+    mélange quelques cartes); boucle Python seulement au-delà de RANGE_SPLIT cartes.
+    """
+    present = set(ids)
+    if len(present) == 1:
+        return {present.pop(): (min(values), max(values))}
+    if len(present) <= RANGE_SPLIT:
+        out = {}
+        for i in present:
+            sel = list(compress(values, map(i.__eq__, ids)))
+            out[i] = (min(sel), max(sel))
+        return out
+    low, high = [math.inf] * maps, [-math.inf] * maps
+    for i, v in zip(ids, values):
+        if v < low[i]:
+            low[i] = v
+        if v > high[i]:
+            high[i] = v
+    return {i: (low[i], high[i]) for i in present}
+
+def _scan_columns(stats, labels, body, lines):
+    """
+    Chemin rapide: toutes les lignes ont exactement 4 champs et des nombres valides.
+    Le morceau est découpé en colonnes (split + tranches), converti et compté
+    par des boucles en C (map, zip, Counter) avec le numéro de carte de chaque
+    ligne pour clé; le Python ne voit que les paires distinctes, plus une
+    addition par ligne pour la somme exacte des temps. Min et max des temps
+    sont les valeurs exactes de la colonne; les temps <= 0 vont dans `zeros`.
+    Lève ValueError sinon, sans avoir rien compté.
+    `labels` = (nom brut -> numéro, [MapStats]).
+    """
+    flat = body.replace(b"\n", b",").split(b",")
+    if len(flat) != 4 * lines:
+        raise ValueError("not a plain 4-column chunk")
+    maps = flat[0::4]
+    index, owners = labels
+    for raw in set(maps).difference(index):
+        index[raw] = len(owners)
+        owners.append(_map_stats(stats, _label(raw)))
+    ids = list(map(index.__getitem__, maps))
+    times = list(map(float, flat[2::4]))
+    scores = Counter(zip(ids, map(int, flat[1::4])))
+    zeros = Counter()
+    logged_ids, logged = ids, times
+    if min(times) <= 0:
+        # temps nuls (ou négatifs): comptés à part, comme QuantileSketch.add; seuls les autres passent par log
+        zeros = Counter(i for i, t in zip(ids, times) if t <= 0)
+        logged_ids = [i for i, t in zip(ids, times) if t > 0]
+        logged = [t for t in times if t > 0]
+    mult = QuantileSketch().mult
+    buckets = Counter(zip(logged_ids, map(math.ceil, map(mul, map(math.log, logged), repeat(mult)))))
+    days = Counter(zip(ids, map(bytes.__getitem__, flat[3::4], repeat(DAY))))
+    totals = [0.0] * len(owners)
+    for i, t in zip(ids, times):
+        totals[i] += t
+    ranges = _column_ranges(ids, times, len(owners))
+
+    for (i, score), n in scores.items():
+        owners[i].score.add(score, n)
+    for (i, b), n in buckets.items():
+        owners[i].time.add_bucket(b, n)
+    for i, n in zeros.items():
+        owners[i].time.zeros += n
+        owners[i].time.count += n
+    for i, total in enumerate(totals):
+        owners[i].time.total += total
+    for i, (low, high) in ranges.items():
+        owners[i].time.add_range(low, high)
+    for (i, day), n in days.items():
+        owners[i].days[day.decode("ascii", errors="replace")] += n
+
+def _scan_rows(stats, body):
+    """Chemin sûr (virgules entre guillemets, lignes invalides): module csv. Retourne les lignes valides."""
+    rows = 0
+    for rec in csv.reader(body.decode("utf-8", errors="replace").split("\n")):
+        try:
+            score, time_sec, dt = int(rec[1]), float(rec[2]), rec[3]
+        except (IndexError, ValueError):
+            continue
+        _map_stats(stats, rec[0] or "Empty map").add(score, time_sec, dt)
+        rows += 1
+    return rows
+
+def _scan_chunk(stats, labels, chunk):
+    """Lignes complètes d'un morceau -> MapStats. Retourne (lignes, lignes ignorées)."""
+    body = chunk[:-1] if chunk.endswith(b"\n") else chunk
+    if not body:
+        return 0, 0
+    lines = body.count(b"\n") + 1
+    try:
+        _scan_columns(stats, labels, body, lines)
+        return lines, 0
+    except ValueError:
+        pass
+    # quelques lignes à part (nom de carte avec virgule...): elles seules passent par csv
+    split = body.split(b"\n")
+    plain = [line for line in split if line.count(b",") == 3]
+    if plain and len(plain) < lines:
+        try:
+            _scan_columns(stats, labels, b"\n".join(plain), len(plain))
+            other = b"\n".join(line for line in split if line.count(b",") != 3)
+            return lines, lines - len(plain) - _scan_rows(stats, other)
+        except ValueError:
+            pass
+    return lines, lines - _scan_rows(stats, body)
+
+def scan_range(job):
+    """
+    job = (chemin, début, fin), bornes alignées sur des débuts de ligne.
+    Retourne ({carte: MapStats}, lignes lues, lignes ignorées).
+    """
+    path, start, end = job
+    stats, labels = {}, ({}, [])
+    total = skipped = 0
+    with open(path, "rb") as f:
+        f.seek(start)
+        if start == 0 and f.readline().startswith(b"map,"):
+            start = f.tell()   # en-tête
+        f.seek(start)
+        pos, rest = start, b""
+        while pos < end:
+            data = f.read(min(CHUNK_BYTES, end - pos))
+            if not data:
+                break
+            pos += len(data)
+            data = rest + data
+            cut = data.rfind(b"\n") + 1 if pos < end else len(data)
+            rest = data[cut:]   # ligne coupée: complétée par le morceau suivant
+            n, bad = _scan_chunk(stats, labels, data[:cut])
+            total += n
+            skipped += bad
+        if rest:
+            n, bad = _scan_chunk(stats, labels, rest)
+            total += n
+            skipped += bad
+    return {label: st for label, st in stats.items() if st.count}, total, skipped
+
+def split_ranges(path, parts):
+    """Découpe le fichier en `parts` plages d'octets commençant chacune au début d'une ligne."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for k in range(1, parts):
+            f.seek(max(bounds[-1], size * k // parts - 1))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(path, a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def scan_file(path, workers=None):
+    """Un passage sur le CSV (en parallèle sur les gros fichiers). Retourne (stats, lignes, ignorées)."""
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    parts = max(1, min(workers, size // MIN_RANGE_BYTES))
+    jobs = split_ranges(path, parts)
+    if parts == 1:
+        results = [scan_range(job) for job in jobs]
+    else:
+        # import tardif: scores.py (donc le menu) importe ce module
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan_range, jobs))
+    stats, lines, skipped = {}, 0, 0
+    for part, n, bad in results:
+        lines += n
+        skipped += bad
+        for label, st in part.items():
+            if label in stats:
+                stats[label].merge(st)
+            else:
+                stats[label] = st
+    return stats, lines, skipped
+
+
+# ======================
+#   REPORT
+# ======================
+def _num(value, fmt):
+    return "-" if value is None else format(value, fmt)
+
+def report_lines(stats):
+    """Tableau par carte: parties, puis moyenne/p50/p90/p99 du score et du temps."""
+    head = f"{'map':<20} {'runs':>9} | {'score mean':>10} {'p50':>5} {'p90':>5} {'p99':>5} | " \
+           f"{'time mean':>9} {'p50':>6} {'p90':>6} {'p99':>6}"
+    lines = [head, "-" * len(head)]
+    for label in sorted(stats, key=lambda m: -stats[m].count):
+        st = stats[label]
+        s, t = st.score, st.time
+        q = [s.quantile(p) for _, p in QUANTILES]
+        qt = [t.quantile(p) for _, p in QUANTILES]
+        lines.append(f"{label[:20]:<20} {st.count:>9} | {_num(s.mean, '10.2f')} "
+                     + " ".join(_num(v, '5.0f') for v in q)
+                     + f" | {_num(t.mean, '8.1f')}s " + " ".join(_num(v, '5.1f') + "s" for v in qt))
+    return lines
+
+def day_histogram(days, last=None, width=HIST_WIDTH):
+    """Parties par jour (les `last` derniers jours présents), en barres."""
+    items = sorted(days.items())
+    if last:
+        items = items[-last:]
+    if not items:
+        return ["(no runs)"]
+    top = max(n for _, n in items)
+    return [f"{day} {n:>9} {'█' * max(1, round(n * width / top))}" for day, n in items]
+
+
+# ======================
+#   CLI
+# ======================
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Streaming high-score analytics")
+    ap.add_argument("path", nargs="?", default=cfg.HIGH_SCORE_FILE, help="high-score CSV")
+    ap.add_argument("--map", action="append", help="only these maps (repeatable)")
+    ap.add_argument("--days", type=int, default=30, help="days shown in the runs-per-day histogram (0 = all)")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    ap.add_argument("--json", help="also write the summaries and daily counts as JSON")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if not os.path.exists(args.path):
+        print(f"{args.path}: no such file")
+        return 1
+    t0 = time.perf_counter()
+    stats, lines, skipped = scan_file(args.path, args.workers)
+    dt = time.perf_counter() - t0
+    if args.map:
+        stats = {m: st for m, st in stats.items() if m in args.map}
+
+    for line in report_lines(stats):
+        print(line)
+    days = Counter()
+    for st in stats.values():
+        days.update(st.days)
+    print()
+    print(f"Runs per day ({'all maps' if not args.map else ', '.join(args.map)}):")
+    for line in day_histogram(days, args.days):
+        print(line)
+    print()
+    print(f"{lines} lines ({skipped} skipped) in {dt:.2f}s "
+          f"({lines / dt / 1e6 if dt else 0:.1f}M lines/s), quantiles within {cfg.STATS_ACCURACY:.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"accuracy": cfg.STATS_ACCURACY,
+                       "maps": {m: dict(st.summary(), days=dict(sorted(st.days.items())))
+                                for m, st in stats.items()}}, f, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+Offline fairness analyzer for maps and attack patterns.
+
+    python analyze.py                          # every map in maps/ + the empty map, attacks/
+    python analyze.py --maps Ruins.map --attacks attacks --json report.json
+    python analyze.py --fail-on base           # CI: exit status 1 if a hit can be unavoidable
+
+For each map, pattern, orientation and placement origin that choose_attack
+can produce, the analyzer asks: if the player stands on any reachable cell
+when the attack appears, can they reach a cell outside it before the damage
+phase? The warning phase gives round(warning / TICK) moves: MIN_WARNING at
+top speed, BASE_WARNING at the start of a run.
+
+Everything is done with bitboards (bit y*w+x, as in GridState):
+  - an attack placement is its orientation mask shifted by the origin;
+  - "cells within k moves of a safe cell" is k bitwise dilations of the safe
+    set, stopped as soon as every attacked cell is covered;
+  - the coverage heatmap is a bit-sliced counter (one plane per bit of the
+    count), so adding a placement costs a few ANDs/XORs, whatever the map.
+One job = one (map, pattern file). Jobs run on a process pool, and their
+results are cached by map hash + pattern hash + timing rules, so CI only
+recomputes what changed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import options as cfg
+from bitgrid import FreeCellIndex, GridState
+from engine import build_attack_table, compile_pattern, list_attack_files, spawn_position
+from mini_adventure import list_maps, read_map_file
+from replay import EMPTY_MAP, _file_digest, map_hash
+from tilemap import TILEMAP_EXT
+
+CACHE_VERSION = 1
+HEAT_DIGITS = "0123456789"
+
+
+# ======================
+#   BITBOARDS
+# ======================
+class BitCounter:
+    """Compteur par case en tranches de bits: planes[k] = bit k du compte de chaque case."""
+
+    def __init__(self):
+        self.planes = []
+
+    def add(self, mask):
+        carry = mask
+        planes = self.planes
+        for k in range(len(planes)):
+            if not carry:
+                return
+            plane = planes[k]
+            planes[k] = plane ^ carry
+            carry &= plane
+        if carry:
+            planes.append(carry)
+
+    def counts(self, size):
+        """Compte de chaque case (liste de `size` entiers)."""
+        out = [0] * size
+        for k, plane in enumerate(self.planes):
+            bit = 1 << k
+            bits = format(plane, f"0{size}b")[::-1] if plane else ""
+            i = bits.find("1")
+            while i != -1:
+                out[i] += bit
+                i = bits.find("1", i + 1)
+        return out
+
+
+def moves_in(seconds):
+    """Déplacements possibles pendant `seconds` de warning (un par pas de simulation)."""
+    return int(round(seconds / cfg.TICK))
+
+
+class Board:
+    """Masques d'une carte pour les dilatations: cases libres, atteignables, bords de colonnes."""
+
+    def __init__(self, walls, start, w, h):
+        grid = GridState(w, h, walls)
+        self.w, self.h, self.size = w, h, grid.size
+        self.free = grid.full & ~grid.walls
+        spawn = spawn_position(start, walls, w, h)
+        reach = 0
+        for i in FreeCellIndex.reachable(grid, spawn).cells:
+            reach |= 1 << i
+        self.reach = reach
+        first_col = 0
+        for y in range(h):
+            first_col |= 1 << (y * w)
+        self.not_first = grid.full & ~first_col
+        self.not_last = grid.full & ~(first_col << (w - 1))
+
+    def dilate(self, m):
+        """Cases à au plus un pas de `m` (murs et bords bloquent, pas de passage d'une rangée à l'autre)."""
+        w = self.w
+        grown = m | (m >> w) | (m << w) | ((m >> 1) & self.not_last) | ((m << 1) & self.not_first)
+        return grown & self.free
+
+    def trapped(self, attack, k_min, k_max):
+        """
+        Cases atteignables de l'attaque d'où aucune case sûre n'est accessible en k
+        déplacements. Retourne (piégées à k_min, piégées à k_max) en masques.
+        """
+        target = attack & self.reach
+        safe = self.reach & ~attack
+        if not safe:
+            return target, target
+        zone = safe
+        at_min = None
+        for k in range(1, k_max + 1):
+            grown = self.dilate(zone)
+            stuck = grown == zone   # plus rien ne s'étend: le reste est enfermé
+            zone = grown
+            if k == k_min:
+                at_min = target & ~zone
+            if stuck or not target & ~zone:
+                break
+        left = target & ~zone
+        return (left if at_min is None else at_min), left
+
+
+# ======================
+#   ONE JOB: (map, pattern)
+# ======================
+_MAPS = {}
+
+def _load_map(name, maps_dir):
+    key = (name, maps_dir)
+    if key not in _MAPS:
+        if name == EMPTY_MAP:
+            walls, start, w, h = set(), None, cfg.GRID_W, cfg.GRID_H
+        else:
+            walls, start, w, h = read_map_file(os.path.join(maps_dir, name))
+        _MAPS[key] = Board(walls, start, w, h)
+    return _MAPS[key]
+
+def analyze_job(job):
+    """Analyse d'un pattern sur une carte. Retourne un dict sérialisable en JSON."""
+    map_name, maps_dir, pattern_path = job
+    t0 = time.perf_counter()
+    board = _load_map(map_name, maps_dir)
+    w, size = board.w, board.size
+    k_min, k_max = moves_in(cfg.MIN_WARNING), moves_in(cfg.BASE_WARNING)
+    shp = compile_pattern(pattern_path)
+    table = build_attack_table([shp], board.w, board.h) if shp else []
+
+    result = {
+        "map": map_name,
+        "pattern": os.path.basename(pattern_path),
+        "fits": bool(table),
+        "placements": 0,
+        "no_safe_cell": 0,
+        "unfair_min": 0,      # placements où un coup est inévitable depuis au moins une case (MIN_WARNING)
+        "unfair_base": 0,     # ... avec BASE_WARNING
+        "worst": None,        # placement qui piège le plus de cases (MIN_WARNING)
+        "heat": [0.0] * size, # probabilité qu'une attaque de ce pattern couvre la case
+    }
+    if not table:
+        result["seconds"] = time.perf_counter() - t0
+        return result
+
+    variants = table[0]
+    heat = result["heat"]
+    worst_n = 0
+    for vi, (_, max_ox, max_oy, masks) in enumerate(variants):
+        shape = 0
+        for _, m in masks:
+            shape |= m
+        counter = BitCounter()
+        origins = (max_ox + 1) * (max_oy + 1)
+        for oy in range(max_oy + 1):
+            for ox in range(max_ox + 1):
+                attack = shape << (oy * w + ox)
+                counter.add(attack)
+                result["placements"] += 1
+                if not attack & board.reach:
+                    continue
+                if not board.reach & ~attack:
+                    result["no_safe_cell"] += 1
+                trapped_min, trapped_max = board.trapped(attack, k_min, k_max)
+                if trapped_min:
+                    result["unfair_min"] += 1
+                    n = bin(trapped_min).count("1")
+                    if n > worst_n:
+                        worst_n = n
+                        result["worst"] = {"orientation": vi, "origin": [ox, oy], "trapped_cells": n}
+                if trapped_max:
+                    result["unfair_base"] += 1
+        # pattern tiré uniformément, puis orientation, puis origine (comme choose_attack)
+        weight = 1.0 / (len(variants) * origins)
+        for i, c in enumerate(counter.counts(size)):
+            if c:
+                heat[i] += c * weight
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+# ======================
+#   CACHE + POOL
+# ======================
+def _file_hash(path):
+    h = hashlib.sha256()
+    _file_digest(h, path)
+    return h.hexdigest()[:32]
+
+def job_key(job):
+    """Clé de cache: contenu de la carte, du pattern et règles de temps."""
+    map_name, maps_dir, pattern_path = job
+    rules = f"{cfg.TICK}:{cfg.MIN_WARNING}:{cfg.BASE_WARNING}:{cfg.GRID_W}x{cfg.GRID_H}"
+    return f"{map_hash(map_name, maps_dir).hex()}:{_file_hash(pattern_path)}:{rules}:{CACHE_VERSION}"
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def save_cache(path, cache):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+def run_jobs(jobs, workers=None, cache=None):
+    """Résultats des jobs, depuis le cache ou calculés sur un pool de processus (workers=1: en local)."""
+    cache = {} if cache is None else cache
+    keys = [job_key(job) for job in jobs]
+    todo = [(job, key) for job, key in zip(jobs, keys) if key not in cache]
+    if todo:
+        if workers == 1 or len(todo) == 1:
+            results = [analyze_job(job) for job, _ in todo]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(analyze_job, [job for job, _ in todo]))
+        for (job, key), res in zip(todo, results):
+            # le cache est indépendant du nom de la carte (clé = contenu)
+            cache[key] = res
+    out = []
+    for job, key in zip(jobs, keys):
+        res = dict(cache[key])
+        res["map"] = job[0]
+        out.append(res)
+    return out, len(todo)
+
+
+# ======================
+#   REPORT
+# ======================
+def map_summary(rows, board):
+    """Agrège les patterns d'une carte (tirés uniformément parmi ceux qui tiennent)."""
+    fitting = [r for r in rows if r["fits"]]
+    heat = [0.0] * board.size
+    for r in fitting:
+        for i, v in enumerate(r["heat"]):
+            heat[i] += v / len(fitting)
+    return {
+        "map": rows[0]["map"],
+        "size": [board.w, board.h],
+        "reachable": bin(board.reach).count("1"),
+        "placements": sum(r["placements"] for r in rows),
+        "no_safe_cell": sum(r["no_safe_cell"] for r in rows),
+        "unfair_min": sum(r["unfair_min"] for r in rows),
+        "unfair_base": sum(r["unfair_base"] for r in rows),
+        "heat": heat,
+        "patterns": rows,
+    }
+
+def heat_lines(summary, board):
+    """Carte de chaleur ASCII: 0-9 = part de la couverture maximale, '#' = mur, ' ' = inaccessible."""
+    w, h = board.w, board.h
+    heat = summary["heat"]
+    top = max(heat) or 1.0
+    lines = []
+    for y in range(h):
+        row = []
+        for x in range(w):
+            i = y * w + x
+            if not (board.free >> i) & 1:
+                row.append("#")
+            elif not (board.reach >> i) & 1:
+                row.append(" ")
+            else:
+                row.append(HEAT_DIGITS[min(9, int(heat[i] / top * 9.999))])
+        lines.append(" ".join(row))
+    return lines
+
+def report_lines(summary, board):
+    w, h = summary["size"]
+    out = [f"{summary['map']} ({w}x{h}, {summary['reachable']} reachable cells)",
+           f"  {'pattern':<18}{'placements':>11}{'no safe':>9}"
+           f"{'unfair@' + str(cfg.MIN_WARNING) + 's':>14}{'unfair@' + str(cfg.BASE_WARNING) + 's':>14}  worst"]
+    for r in summary["patterns"]:
+        if not r["fits"]:
+            out.append(f"  {r['pattern']:<18}{'(does not fit)':>11}")
+            continue
+        worst = ""
+        if r["worst"]:
+            wr = r["worst"]
+            worst = f"{wr['trapped_cells']} cells (orientation {wr['orientation']} at {tuple(wr['origin'])})"
+        out.append(f"  {r['pattern']:<18}{r['placements']:>11}{r['no_safe_cell']:>9}"
+                   f"{r['unfair_min']:>14}{r['unfair_base']:>14}  {worst}")
+    out.append(f"  {'total':<18}{summary['placements']:>11}{summary['no_safe_cell']:>9}"
+               f"{summary['unfair_min']:>14}{summary['unfair_base']:>14}")
+    out.append("  coverage heatmap (0-9, relative):")
+    out.extend("    " + line for line in heat_lines(summary, board))
+    return out
+
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Map/pattern fairness analyzer")
+    ap.add_argument("--maps", nargs="+", default=["all"],
+                    help="map file names in maps/, 'empty' for the default map, or 'all'")
+    ap.add_argument("--maps-dir", default=cfg.MAPS_DIR)
+    ap.add_argument("--attacks", default=cfg.ATTACKS_DIR, help="pattern folder")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    ap.add_argument("--cache", default=cfg.ANALYZE_CACHE, help="result cache ('' to disable)")
+    ap.add_argument("--json", help="also write the full report (with heatmaps) as JSON")
+    ap.add_argument("--fail-on", choices=["none", "min", "base", "no-safe"], default="none",
+                    help="exit status 1 if a placement makes a hit unavoidable: at MIN_WARNING (min), "
+                         "at BASE_WARNING (base), or only when it covers every reachable cell (no-safe)")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    maps = []
+    for m in args.maps:
+        if m == "all":
+            maps.append(EMPTY_MAP)
+            maps.extend(name for name in list_maps(args.maps_dir)
+                        if not name.lower().endswith(TILEMAP_EXT))   # .tmap: trop grandes pour un balayage complet
+        elif m.lower() == "empty":
+            maps.append(EMPTY_MAP)
+        else:
+            maps.append(m)
+    patterns = [os.path.join(args.attacks, f) for f in list_attack_files(args.attacks)]
+    jobs = [(m, args.maps_dir, p) for m in maps for p in patterns]
+
+    t0 = time.perf_counter()
+    cache = load_cache(args.cache) if args.cache else {}
+    rows, computed = run_jobs(jobs, workers=args.workers, cache=cache)
+    if args.cache and computed:
+        save_cache(args.cache, cache)
+    dt = time.perf_counter() - t0
+
+    summaries = []
+    for m in maps:
+        board = _load_map(m, args.maps_dir)
+        summary = map_summary([r for r in rows if r["map"] == m], board)
+        summaries.append(summary)
+        for line in report_lines(summary, board):
+            print(line)
+        print()
+    print(f"{len(jobs)} map/pattern pairs ({computed} computed, {len(jobs) - computed} cached) in {dt:.2f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"rules": {"TICK": cfg.TICK, "MIN_WARNING": cfg.MIN_WARNING,
+                                 "BASE_WARNING": cfg.BASE_WARNING},
+                       "maps": summaries}, f, indent=1)
+
+    field = {"min": "unfair_min", "base": "unfair_base", "no-safe": "no_safe_cell"}.get(args.fail_on)
+    if field and any(s[field] for s in summaries):
+        bad = ", ".join(s["map"] for s in summaries if s[field])
+        print(f"FAIL: unavoidable hits ({args.fail_on}) on {bad}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Compiled asset cache: parsed attack patterns and maps in one binary pack.
+
+    python assets.py build      # compile what changed under attacks/ and maps/
+    python assets.py info
+
+With thousands of pattern files, parsing attacks/ (trimming, cropping,
+8 orientations per pattern) takes seconds at every start. The pack keeps
+the parsed result of each file, tagged with the mtime and size of the
+source. At start it is loaded with one read() and one marshal.loads().
+Only files whose stat changed are parsed again, and the pack is rewritten
+(atomically) only when something changed. Tile maps (.tmap) are already
+a compiled format and are not packed.
+
+File layout: header magic "MAPK", version u16, Python major/minor u8 u8
+(marshal is version-specific: another interpreter rebuilds the pack),
+then one marshal'd dict {kind: {path: (mtime_ns, size, value)}}.
+"""
+import argparse
+import gc
+import marshal
+import os
+import struct
+import sys
+import threading
+
+import options as cfg
+from engine import compile_pattern, list_attack_files
+
+MAGIC = b"MAPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHBB")
+
+KIND_PATTERN = "pattern"
+KIND_MAP = "map"
+
+
+class AssetPack:
+    """Cache persistant des fichiers parsés, validé par (mtime, taille) de chaque source."""
+
+    def __init__(self, path=None):
+        self.path = path or cfg.ASSET_PACK
+        self.entries = {}   # kind -> {chemin: (mtime_ns, taille, valeur)}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()   # thread des patterns + préchargement du menu
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        if len(data) < HEADER.size:
+            return
+        if HEADER.unpack_from(data) != (MAGIC, VERSION) + tuple(sys.version_info[:2]):
+            return   # autre format ou autre Python: reconstruit au fil des lectures
+        # des centaines de milliers de petits tuples: sans GC pendant le chargement (3x plus rapide)
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            entries = marshal.loads(memoryview(data)[HEADER.size:])
+        except (EOFError, ValueError, TypeError):
+            return
+        finally:
+            if enabled:
+                gc.enable()
+        if isinstance(entries, dict):
+            self.entries = entries
+
+    def get(self, kind, path, parse):
+        """Valeur compilée de `path`; `parse(path)` seulement si le fichier a changé."""
+        st = os.stat(path)
+        key = os.path.normpath(path)
+        with self._lock:
+            entry = self.entries.get(kind, {}).get(key)
+            if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self.hits += 1
+                return entry[2]
+        value = parse(path)   # hors du verrou: un autre thread peut lire le pack
+        with self._lock:
+            self.misses += 1
+            self.entries.setdefault(kind, {})[key] = (st.st_mtime_ns, st.st_size, value)
+            self.dirty = True
+        return value
+
+    def prune(self, kind, folder, keep):
+        """Oublie les fichiers de `folder` absents de `keep` (supprimés ou renommés)."""
+        folder = os.path.normpath(folder)
+        keep = {os.path.normpath(p) for p in keep}
+        with self._lock:
+            table = self.entries.get(kind, {})
+            stale = [k for k in table if os.path.dirname(k) == folder and k not in keep]
+            for k in stale:
+                del table[k]
+            if stale:
+                self.dirty = True
+
+    def save(self):
+        """Réécrit le pack s'il a changé. Retourne True si le fichier a été écrit."""
+        with self._lock:
+            if not self.dirty:
+                return False
+            data = HEADER.pack(MAGIC, VERSION, *sys.version_info[:2]) + marshal.dumps(self.entries)
+            self.dirty = False
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError:
+            return False
+        return True
+
+    def stats(self):
+        counts = {kind: len(table) for kind, table in self.entries.items()}
+        return {"entries": counts, "hits": self.hits, "misses": self.misses}
+
+
+_PACK = None
+_PACK_LOCK = threading.Lock()
+
+def get_pack():
+    """Le pack partagé du processus (chargé au premier appel)."""
+    global _PACK
+    with _PACK_LOCK:
+        if _PACK is None:
+            _PACK = AssetPack()
+        return _PACK
+
+
+# ======================
+#   PATTERNS
+# ======================
+_CELLS = {}   # (x, y, vague) -> tuple partagé
+
+def _shared_cells(shp):
+    """
+    Un seul objet par cellule (x, y, vague) pour tous les patterns: marshal écrit
+    alors une référence au lieu du tuple (pack ~3x plus petit, chargement ~4x plus rapide).
+    """
+    share = _CELLS.setdefault
+    shp["cells"] = [share(c, c) for c in shp["cells"]]
+    shp["variants"] = [(tuple(share(c, c) for c in cells), w, h) for cells, w, h in shp["variants"]]
+    return shp
+
+def _compile_shared(path):
+    shp = compile_pattern(path)
+    return _shared_cells(shp) if shp else shp
+
+def load_attack_patterns(folder, pack=None):
+    """engine.load_attack_patterns, via le pack: seuls les fichiers modifiés sont reparsés."""
+    pack = pack or get_pack()
+    paths = [os.path.join(folder, f) for f in list_attack_files(folder)]
+    patterns = []
+    for path in paths:
+        try:
+            shp = pack.get(KIND_PATTERN, path, _compile_shared)
+        except Exception:
+            continue
+        if shp:
+            patterns.append(shp)
+    pack.prune(KIND_PATTERN, folder, paths)
+    return patterns
+
+
+class PatternLoader:
+    """Charge les patterns dans un thread de fond pendant que le menu est affiché."""
+
+    def __init__(self, folder, pack=None):
+        self.patterns = None
+        self._thread = threading.Thread(target=self._run, args=(folder, pack), daemon=True)
+        self._thread.start()
+
+    def _run(self, folder, pack):
+        try:
+            self.patterns = load_attack_patterns(folder, pack)
+        except Exception:
+            self.patterns = []
+
+    def result(self):
+        """Les patterns (attend la fin du chargement si besoin)."""
+        self._thread.join()
+        return self.patterns
+
+
+# ======================
+#   CLI
+# ======================
+def build(pack, attacks_dir, maps_dir):
+    """Compile tous les patterns et cartes ASCII; retourne (patterns, cartes)."""
+    from mini_adventure import list_maps, read_map_file   # tardif: le jeu importe ce module
+    patterns = load_attack_patterns(attacks_dir, pack)
+    paths = [os.path.join(maps_dir, name) for name in list_maps(maps_dir)]
+    maps = 0
+    for path in paths:
+        if path.lower().endswith((".map", ".txt")):
+            try:
+                pack.get(KIND_MAP, path, read_map_file)
+                maps += 1
+            except Exception:
+                pass
+    pack.prune(KIND_MAP, maps_dir, paths)
+    return len(patterns), maps
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Compiled asset pack (parsed patterns and maps)")
+    ap.add_argument("cmd", choices=("build", "info"))
+    ap.add_argument("--pack", default=cfg.ASSET_PACK, help=f"pack file (default {cfg.ASSET_PACK})")
+    ap.add_argument("--attacks", default=cfg.ATTACKS_DIR)
+    ap.add_argument("--maps", default=cfg.MAPS_DIR)
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    pack = AssetPack(args.pack)
+    if args.cmd == "build":
+        n_patterns, n_maps = build(pack, args.attacks, args.maps)
+        written = pack.save()
+        print(f"{n_patterns} patterns, {n_maps} maps ({pack.misses} parsed, {pack.hits} up to date)"
+              f"{' -> ' + args.pack if written else ''}")
+    else:
+        size = os.path.getsize(args.pack) if os.path.exists(args.pack) else 0
+        print(f"{args.pack}: {size} bytes, {pack.stats()['entries']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Autopilot: an input policy that dodges attacks and collects coins.
+
+    policy = Autopilot()                      # policy(engine) -> action, once per tick
+    simulate_run(..., policy=policy)          # batch runs (simulate.py --policy autopilot)
+    AUTOPILOT = True in options.py            # interactive game, attract mode
+
+All searches are done off the per-tick path:
+  - coins: a BFS distance field to each coin cell, computed once per target
+    and kept in an LRU (DistanceFields, which can be shared by every run on
+    the same map);
+  - attacks: when a round of attacks is placed, an escape field over the
+    attacked cells only (BFS from the cells next to a safe one), and the
+    time at which each wave level turns to X.
+Each tick then only compares the player's four neighbours.
+"""
+from array import array
+from collections import OrderedDict
+
+import options as cfg
+from engine import ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT, ACTION_UP, attack_cells
+from tilemap import ChunkedGridState
+
+STEPS = ((ACTION_UP, 0, -1), (ACTION_DOWN, 0, 1), (ACTION_LEFT, -1, 0), (ACTION_RIGHT, 1, 0))
+FAR = 1 << 30
+
+
+class DistanceFields:
+    """
+    Champs de distance d'une carte: pour une cible, la distance (en pas) de chaque
+    case à la cible, -1 si elle est inatteignable. Un parcours en largeur par cible,
+    gardé dans un LRU: une pièce ne coûte qu'un parcours, quel que soit le nombre de ticks.
+    """
+
+    def __init__(self, grid, cache_size=None):
+        self.w, self.h, self.size = grid.w, grid.h, grid.size
+        self.walls = grid.bits(grid.walls)   # '1' = mur, index y*w+x
+        self.cache_size = cfg.AUTOPILOT_FIELD_CACHE if cache_size is None else cache_size
+        self._fields = OrderedDict()
+        self.builds = 0
+
+    def to(self, target):
+        """Champ de distance vers `target` (x, y): array('i') indexé par y*w+x."""
+        key = target[1] * self.w + target[0]
+        fields = self._fields
+        field = fields.get(key)
+        if field is not None:
+            fields.move_to_end(key)
+            return field
+        field = fields[key] = self._bfs(key)
+        self.builds += 1
+        if len(fields) > self.cache_size:
+            fields.popitem(last=False)
+        return field
+
+    def _bfs(self, s):
+        w, size, walls = self.w, self.size, self.walls
+        dist = array("i", [-1]) * size
+        if walls[s] == "1":
+            return dist
+        dist[s] = 0
+        order = [s]
+        append = order.append
+        k = 0
+        while k < len(order):
+            i = order[k]
+            k += 1
+            d = dist[i] + 1
+            col = i % w
+            if i >= w and dist[i - w] < 0 and walls[i - w] == "0":
+                dist[i - w] = d
+                append(i - w)
+            if i + w < size and dist[i + w] < 0 and walls[i + w] == "0":
+                dist[i + w] = d
+                append(i + w)
+            if col and dist[i - 1] < 0 and walls[i - 1] == "0":
+                dist[i - 1] = d
+                append(i - 1)
+            if col + 1 < w and dist[i + 1] < 0 and walls[i + 1] == "0":
+                dist[i + 1] = d
+                append(i + 1)
+        return dist
+
+
+class Autopilot:
+    """
+    Politique d'entrée (même interface que idle_policy / make_random_policy):
+    fuit les cases '!' avant qu'elles passent en 'X', sinon va vers la pièce.
+    Déterministe: un enregistrement de partie jouée par l'autopilote se rejoue.
+    """
+
+    def __init__(self, fields=None, tick=None):
+        self.fields = fields   # DistanceFields de la carte (construit au premier appel sinon)
+        self.tick = cfg.TICK if tick is None else tick
+        self._timeline = None
+        self.danger = frozenset()   # cases couvertes par le tour d'attaques en cours (index y*w+x)
+        self._levels = []      # [(t, cases en X à partir de t dans la phase damage)]
+        self._escape = {}      # case attaquée -> pas jusqu'à une case sûre
+
+    # ----- un tour d'attaques: une fois par placement -----
+    def _plan(self, engine):
+        grid = engine.grid
+        w, size = grid.w, grid.size
+        stagger = cfg.WAVE_STAGGER
+        by_time = {}
+        for atk in engine.current_attacks:
+            for wave, mask in atk:
+                t = (wave - 1) * stagger
+                by_time.setdefault(t, []).extend(attack_cells(atk, mask, w))
+        # ensembles d'index plutôt que plans de bits: un test par case ne dépend
+        # pas de la taille de la carte
+        acc = set()
+        self._levels = []
+        for t in sorted(by_time):
+            acc.update(by_time[t])
+            self._levels.append((t, frozenset(acc)))
+        self.danger = danger = frozenset(acc)
+
+        # Champ de fuite, limité aux cases attaquées: départ des cases voisines d'une case sûre.
+        escape = {}
+        frontier = []
+        for i in sorted(danger):
+            for j in self._neighbours(i, w, size):
+                if j not in danger and not grid.is_wall(j % w, j // w):
+                    escape[i] = 1
+                    frontier.append(i)
+                    break
+        k = 0
+        while k < len(frontier):
+            i = frontier[k]
+            k += 1
+            for j in self._neighbours(i, w, size):
+                if j not in escape and j in danger:
+                    escape[j] = escape[i] + 1
+                    frontier.append(j)
+        self._escape = escape
+
+    @staticmethod
+    def _neighbours(i, w, size):
+        col = i % w
+        if i >= w:
+            yield i - w
+        if i + w < size:
+            yield i + w
+        if col:
+            yield i - 1
+        if col + 1 < w:
+            yield i + 1
+
+    def _deadly(self, engine):
+        """Cases en 'X' lors de la collision du prochain pas (même calcul que le moteur)."""
+        now = (round(engine.now / self.tick) + 1) * self.tick
+        if engine.phase == 'damage':
+            t = now - engine.phase_start
+            if t >= engine.damage_dur:
+                return frozenset()   # la phase se termine avant la collision
+        elif engine.phase == 'warning' and now - engine.phase_start >= engine.warning_dur:
+            t = 0.0        # passage en damage: la vague 1 frappe tout de suite
+        else:
+            return frozenset()
+        cells = frozenset()
+        for lt, acc in self._levels:
+            if lt > t:
+                break
+            cells = acc
+        return cells
+
+    # ----- décision: quelques comparaisons par tick -----
+    def __call__(self, engine):
+        grid = engine.grid
+        if engine.timeline is not self._timeline:
+            self._timeline = engine.timeline
+            if engine.timeline is not None:
+                self._plan(engine)
+            else:
+                self.danger, self._levels, self._escape = frozenset(), [], {}
+        if self.fields is None and not isinstance(grid, ChunkedGridState):
+            self.fields = DistanceFields(grid)
+
+        w = grid.w
+        px, py = engine.px, engine.py
+        here = py * w + px
+        moves = [(None, here)]
+        for action, dx, dy in STEPS:
+            nx, ny = px + dx, py + dy
+            if grid.in_bounds(nx, ny) and not grid.is_wall(nx, ny):
+                moves.append((action, ny * w + nx))
+        danger = self.danger
+        if danger:
+            deadly = self._deadly(engine)
+            moves = [m for m in moves if m[1] not in deadly] or moves
+
+        if here in danger:
+            # sur une case attaquée: vers la case sûre la plus proche
+            escape = self._escape
+            return min(moves, key=lambda m: escape.get(m[1], FAR) if m[1] in danger else 0)[0]
+
+        if danger:
+            moves = [m for m in moves if m[1] not in danger] or [(None, here)]
+        coin = engine.coin_pos
+        if coin is None:
+            return None
+        if self.fields is None:
+            # carte en tuiles: pas de champ de la taille de la carte, rapprochement glouton
+            cx, cy = coin
+            return min(moves, key=lambda m: abs(m[1] % w - cx) + abs(m[1] // w - cy))[0]
+        field = self.fields.to(coin)
+        return min(moves, key=lambda m: field[m[1]] if field[m[1]] >= 0 else FAR)[0]
+
+
+def make_autopilot(fields=None, tick=None):
+    """Politique d'entrée autopilote (voir Autopilot)."""
+    return Autopilot(fields, tick)
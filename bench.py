@@ -0,0 +1,467 @@
+"""
+Benchmark suite: times the game's hot functions on synthetic inputs,
+without a terminal.
+
+    python bench.py                          # every benchmark, every scale
+    python bench.py --quick                  # small scales only
+    python bench.py --only draw_game e2e     # name filter (substring)
+    python bench.py --save bench_baseline.json
+    python bench.py --compare bench_baseline.json --threshold 0.15
+
+Scales: grids from 10x10 to 500x500, 1 to 50 simultaneous attacks, score
+files from 100 to 1M rows, 1 to 500 spectators. Each case reports ops/sec
+(best of a few timed rounds), plus the memory blocks still allocated after
+one call and the peak traced memory during it (tracemalloc). "e2e_tick" is one full
+game tick: engine step, attack layers and a frame sent to a null
+terminal. With --compare, a case whose ops/sec dropped by more than
+the threshold is flagged and the exit status is 1.
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import options as cfg
+import mini_adventure as game
+from autopilot import Autopilot, DistanceFields
+from bitgrid import FreeCellIndex, GridState
+from analytics import scan_file
+from broadcast import FrameBroadcaster, Viewer
+from engine import (
+    Engine, attacks_wave_render, build_attack_table, choose_attack, load_attack_patterns,
+    make_random_policy, merged_cells, pick_attack_masks, wave_layers,
+)
+from render import DiffRenderer
+from scores import FIELDS, SNAPSHOT_SUFFIX, ScoreStore
+
+GRID_SIZES = (10, 50, 100, 500)
+ATTACK_COUNTS = (1, 5, 20, 50)
+SCORE_ROWS = (100, 10_000, 100_000, 1_000_000)
+QUICK_GRID_SIZES = (10, 50)
+QUICK_SCORE_ROWS = (100, 10_000)
+VIEWER_COUNTS = (1, 10, 100, 500)
+QUICK_VIEWER_COUNTS = (1, 100)
+
+ATTACK_GRID = 50   # taille de grille des benchmarks "attaques"
+SEED = 1234
+
+
+class NullOut:
+    """Terminal factice: compte les octets, n'affiche rien."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, s):
+        self.bytes += len(s)
+
+    def flush(self):
+        pass
+
+
+# ======================
+#   SYNTHETIC INPUTS
+# ======================
+def random_walls(w, h, rng, density=0.15):
+    return {(x, y) for y in range(h) for x in range(w) if rng.random() < density}
+
+def random_layers(w, h, rng, n_attacks=5, patterns=None):
+    """Deux plans warning/damage plausibles: des attaques réelles placées au hasard."""
+    table = build_attack_table(patterns or _patterns(), w, h)
+    warning = damage = 0
+    for i in range(n_attacks):
+        for wave, mask in pick_attack_masks(table, w, rng):
+            if i % 2 and wave <= 2:
+                damage |= mask
+            else:
+                warning |= mask
+    return warning, damage
+
+def write_map_file(path, w, h, rng):
+    walls = random_walls(w, h, rng)
+    walls.discard((0, 0))
+    with open(path, "w", encoding="utf-8") as f:
+        for y in range(h):
+            row = "".join("P" if (x, y) == (0, 0) else "#" if (x, y) in walls else "." for x in range(w))
+            f.write(row + "\n")
+
+def write_score_file(path, n_rows, rng, n_maps=20):
+    maps = [f"map_{i:02d}.map" for i in range(n_maps)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(FIELDS)
+        for i in range(n_rows):
+            writer.writerow([rng.choice(maps), rng.randint(0, 60), round(rng.uniform(1, 300), 2),
+                             f"2025-01-{1 + i % 28:02d} 12:00:00"])
+
+_PATTERN_CACHE = []
+
+def _patterns():
+    if not _PATTERN_CACHE:
+        _PATTERN_CACHE.extend(load_attack_patterns(cfg.ATTACKS_DIR))
+    return _PATTERN_CACHE
+
+def dict_attacks(n, rng, grid=ATTACK_GRID):
+    """n attaques placées, au format historique dict pos->wave."""
+    patterns = _patterns()
+    return [choose_attack(patterns, grid, grid, rng) for _ in range(n)]
+
+def mask_attacks(n, rng, grid=ATTACK_GRID):
+    table = build_attack_table(_patterns(), grid, grid)
+    return [pick_attack_masks(table, grid, rng) for _ in range(n)]
+
+
+# ======================
+#   BENCHMARK CASES
+# ======================
+# Chaque fabrique reçoit (échelle, dossier temporaire) et retourne une
+# fonction sans argument: un appel = une opération mesurée.
+
+def case_draw_game(size, tmp):
+    rng = random.Random(SEED)
+    game.GRID_W, game.GRID_H = size, size
+    grid = GridState(size, size, random_walls(size, size, rng))
+    frames = [random_layers(size, size, rng) for _ in range(2)]
+    grid.set_coin((size // 2, size // 2))
+    renderer = DiffRenderer(out=NullOut(), field_col_gap=cfg.SIDE_GAP_SPACES)
+    state = {"i": 0}
+
+    def op():
+        i = state["i"] = state["i"] + 1
+        grid.set_layers(*frames[i & 1])
+        game.draw_game(i % size, 0, [1], i, i * cfg.TICK, None, None,
+                       1.0, 1.0, 0.5, 0.1, False, renderer=renderer, grid=grid)
+    return op
+
+def case_merged_cells(n, tmp):
+    rng = random.Random(SEED)
+    layers = attacks_wave_render(dict_attacks(n, rng), "damage", 0.35)
+    return lambda: merged_cells(layers)
+
+def case_attacks_wave_render(n, tmp):
+    attacks = dict_attacks(n, random.Random(SEED))
+    return lambda: attacks_wave_render(attacks, "damage", 0.35)
+
+def case_wave_layers(n, tmp):
+    attacks = mask_attacks(n, random.Random(SEED))
+    return lambda: wave_layers(attacks, "damage", 0.35)
+
+def case_choose_attack(size, tmp):
+    patterns = _patterns()
+    rng = random.Random(SEED)
+    return lambda: choose_attack(patterns, size, size, rng)
+
+def case_pick_attack_masks(size, tmp):
+    table = build_attack_table(_patterns(), size, size)
+    rng = random.Random(SEED)
+    return lambda: pick_attack_masks(table, size, rng)
+
+def case_free_cell_index(size, tmp):
+    """Construction de l'index des cases atteignables (une fois par carte)."""
+    rng = random.Random(SEED)
+    walls = random_walls(size, size, rng)
+    walls.discard((0, 0))
+    grid = GridState(size, size, walls)
+    return lambda: FreeCellIndex.reachable(grid, (0, 0))
+
+def case_coin_spawn(size, tmp):
+    """Un tirage de pièce: pick + swap-remove + remise de l'ancienne case."""
+    rng = random.Random(SEED)
+    walls = random_walls(size, size, rng, density=0.6)   # carte dense
+    walls.discard((0, 0))
+    cells = FreeCellIndex.reachable(GridState(size, size, walls), (0, 0))
+    state = {"coin": None}
+
+    def op():
+        if state["coin"] is not None:
+            cells.add(state["coin"])
+        pos = cells.pick(rng, ((0, 0),))
+        if pos is not None:
+            cells.discard(pos)
+        state["coin"] = pos
+    return op
+
+def case_autopilot(size, tmp):
+    """Un tick piloté par l'autopilote: décision (champs de distance en cache) + step."""
+    rng = random.Random(SEED)
+    walls = random_walls(size, size, rng)
+    patterns = _patterns()
+    table = build_attack_table(patterns, size, size)
+    state = {}
+
+    def new_engine():
+        engine = Engine(walls, None, size, size, patterns,
+                        rng=random.Random(rng.random()), attack_table=table)
+        state["engine"], state["tick"] = engine, 0
+        if "fields" not in state:
+            state["fields"] = DistanceFields(engine.grid)
+        state["policy"] = Autopilot(state["fields"])
+
+    def op():
+        engine = state["engine"]
+        engine.step(state["tick"] * cfg.TICK, state["policy"](engine))
+        state["tick"] += 1
+        if not engine.alive:
+            new_engine()
+
+    new_engine()
+    return op
+
+def case_read_map_file(size, tmp):
+    path = os.path.join(tmp, f"bench_{size}x{size}.map")
+    write_map_file(path, size, size, random.Random(SEED))
+    return lambda: game.read_map_file(path)
+
+def _score_file(rows, tmp):
+    path = os.path.join(tmp, f"scores_{rows}.csv")
+    if not os.path.exists(path):
+        write_score_file(path, rows, random.Random(SEED))
+    return path
+
+def case_load_high_scores(rows, tmp):
+    path = _score_file(rows, tmp)
+    return lambda: game.load_high_scores(path)
+
+def case_score_store_cold(rows, tmp):
+    """Premier top 10 d'un ScoreStore neuf (sans snapshot .idx)."""
+    path = _score_file(rows, tmp)
+
+    def op():
+        store = ScoreStore(path)
+        top = store.top("map_00.map", 10)
+        if store._snapshot_thread is not None:
+            store._snapshot_thread.join()
+        try:
+            os.remove(path + SNAPSHOT_SUFFIX)   # le prochain appel repart à froid
+        except FileNotFoundError:
+            pass
+        return top
+    return op
+
+def case_score_analytics(rows, tmp):
+    """Un passage de analytics.py sur tout le fichier (un seul processus)."""
+    path = _score_file(rows, tmp)
+    return lambda: scan_file(path, workers=1)
+
+def case_e2e_tick(size, tmp):
+    rng = random.Random(SEED)
+    game.GRID_W, game.GRID_H = size, size
+    walls = random_walls(size, size, rng)
+    patterns = _patterns()
+    table = build_attack_table(patterns, size, size)
+    policy = make_random_policy(random.Random(SEED + 1))
+    renderer = DiffRenderer(out=NullOut(), field_col_gap=cfg.SIDE_GAP_SPACES)
+    state = {}
+
+    def new_engine():
+        state["engine"] = Engine(walls, None, size, size, patterns,
+                                 rng=random.Random(rng.random()), attack_table=table)
+        state["tick"] = 0
+
+    def op():
+        engine = state["engine"]
+        engine.step(state["tick"] * cfg.TICK, policy(engine))
+        state["tick"] += 1
+        per_attack = engine.update_layers()
+        game.draw_game(engine.px, engine.py, per_attack, engine.score, engine.now,
+                       engine.coin_pos, walls, engine.idle_dur, engine.warning_dur,
+                       engine.damage_dur, engine.multi_prob, engine.multi_active,
+                       renderer=renderer, grid=engine.grid)
+        if not engine.alive:
+            new_engine()
+
+    new_engine()
+    return op
+
+class NullTransport:
+    """Transport de spectateur factice: compte les octets reçus (memoryview, sans copie)."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+def case_broadcast(viewers, tmp):
+    """Une frame diffusée: construite et encodée une fois, puis confiée à chaque spectateur."""
+    rng = random.Random(SEED)
+    size = 50
+    grid = GridState(size, size, random_walls(size, size, rng))
+    frames = [random_layers(size, size, rng) for _ in range(2)]
+    grid.set_coin((size // 2, size // 2))
+    hub = FrameBroadcaster()
+    for _ in range(viewers):
+        viewer = Viewer(hub)
+        viewer.transport = NullTransport()
+        viewer.need_key = False
+        hub.viewers[viewer] = None
+    state = {"i": 0}
+
+    def draw(renderer, viewport):
+        i = state["i"]
+        game.draw_game(i % size, 0, [1], i, i * cfg.TICK, None, None, 1.0, 1.0, 0.5, 0.1, False,
+                       renderer=renderer, grid=grid, viewport=viewport)
+
+    def op():
+        i = state["i"] = state["i"] + 1
+        grid.set_layers(*frames[i & 1])
+        hub.publish(draw)
+    return op
+
+# (nom, fabrique, libellé d'échelle, échelles, échelles --quick)
+CASES = [
+    ("draw_game",          case_draw_game,          "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("merged_cells",       case_merged_cells,       "attacks", ATTACK_COUNTS, ATTACK_COUNTS),
+    ("attacks_wave_render", case_attacks_wave_render, "attacks", ATTACK_COUNTS, ATTACK_COUNTS),
+    ("wave_layers",        case_wave_layers,        "attacks", ATTACK_COUNTS, ATTACK_COUNTS),
+    ("choose_attack",      case_choose_attack,      "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("pick_attack_masks",  case_pick_attack_masks,  "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("free_cell_index",    case_free_cell_index,    "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("coin_spawn",         case_coin_spawn,         "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("autopilot",          case_autopilot,          "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("read_map_file",      case_read_map_file,      "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("load_high_scores",   case_load_high_scores,   "rows",    SCORE_ROWS,    QUICK_SCORE_ROWS),
+    ("score_store_cold",   case_score_store_cold,   "rows",    SCORE_ROWS,    QUICK_SCORE_ROWS),
+    ("score_analytics",    case_score_analytics,    "rows",    SCORE_ROWS,    QUICK_SCORE_ROWS),
+    ("e2e_tick",           case_e2e_tick,           "grid",    GRID_SIZES,    QUICK_GRID_SIZES),
+    ("broadcast",          case_broadcast,          "viewers", VIEWER_COUNTS, QUICK_VIEWER_COUNTS),
+]
+
+def scale_label(kind, value):
+    if kind == "grid":
+        return f"{value}x{value}"
+    return f"{value} {kind}"
+
+
+# ======================
+#   MEASUREMENT
+# ======================
+def time_op(op, min_time=0.2, rounds=3):
+    """Meilleur débit (ops/s) sur `rounds` tours d'au moins `min_time` secondes."""
+    best = 0.0
+    for _ in range(rounds):
+        gc.collect()
+        n = 0
+        t0 = time.perf_counter()
+        while True:
+            op()
+            n += 1
+            dt = time.perf_counter() - t0
+            if dt >= min_time:
+                break
+        best = max(best, n / dt)
+    return best
+
+def alloc_op(op):
+    """(blocs encore alloués après un appel, pic mémoire en Ko) via tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = op()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(max(0, s.count_diff) for s in after.compare_to(before, "filename"))
+    del result
+    return blocks, peak / 1024
+
+def run_cases(only=None, quick=False, min_time=0.2, rounds=3, log=print):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="miniadv_bench_") as tmp:
+        for name, factory, kind, scales, quick_scales in CASES:
+            if only and not any(o in name for o in only):
+                continue
+            for value in (quick_scales if quick else scales):
+                key = f"{name}[{scale_label(kind, value)}]"
+                try:
+                    op = factory(value, tmp)
+                    op()   # échauffement (caches, imports)
+                except ValueError as e:
+                    # ex. taille de carte refusée par le format
+                    results[key] = {"error": str(e)}
+                    log(f"{key:<42} skipped: {e}")
+                    continue
+                ops = time_op(op, min_time, rounds)
+                blocks, peak_kb = alloc_op(op)
+                results[key] = {"ops_per_sec": round(ops, 2), "alloc_blocks": blocks,
+                                "peak_kb": round(peak_kb, 1)}
+                log(f"{key:<42} {ops:>12.1f} ops/s  {blocks:>8} blocks  {peak_kb:>10.1f} KB peak")
+    return results
+
+
+# ======================
+#   BASELINE / COMPARE
+# ======================
+def save_baseline(path, results):
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+def compare(results, baseline, threshold):
+    """Lignes de comparaison et nombre de régressions (débit en baisse > threshold)."""
+    lines = []
+    regressions = 0
+    base_results = baseline.get("results", {})
+    for key, cur in results.items():
+        base = base_results.get(key)
+        if not base or "ops_per_sec" not in base or "ops_per_sec" not in cur:
+            lines.append(f"{key:<42} (no baseline)")
+            continue
+        ratio = cur["ops_per_sec"] / base["ops_per_sec"] if base["ops_per_sec"] else float("inf")
+        flag = ""
+        if ratio < 1.0 - threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio > 1.0 + threshold:
+            flag = "  faster"
+        lines.append(f"{key:<42} {base['ops_per_sec']:>12.1f} -> {cur['ops_per_sec']:>12.1f} ops/s"
+                     f"  x{ratio:.2f}{flag}")
+    return lines, regressions
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Mini-Adventure benchmark suite (no terminal needed)")
+    ap.add_argument("--only", nargs="+", help="run only benchmarks whose name contains one of these")
+    ap.add_argument("--quick", action="store_true", help="small scales only")
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds per timed round")
+    ap.add_argument("--rounds", type=int, default=3, help="timed rounds (best one is kept)")
+    ap.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    ap.add_argument("--compare", metavar="JSON", help="compare against a saved baseline")
+    ap.add_argument("--threshold", type=float, default=0.15,
+                    help="relative ops/sec drop reported as a regression (default 0.15)")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    results = run_cases(args.only, args.quick, args.min_time, args.rounds)
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"baseline -> {args.save}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.threshold)
+        print()
+        for line in lines:
+            print(line)
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+from array import array
+
+# =========================================
+#  Bitboard grid: one integer bitmask per plane
+# =========================================
+# Cell (x, y) is bit y*w + x. Walls, warning ('!'), damage ('X') and the
+# coin are each one plane, so merging attacks is a bitwise OR and the
+# collision test is a single AND, whatever the number of attacks.
+
+def cell_index(x, y, w):
+    return y * w + x
+
+def cells_to_mask(cells, w):
+    """Positions (x, y) -> bitmask."""
+    mask = 0
+    for (x, y) in cells:
+        mask |= 1 << (y * w + x)
+    return mask
+
+def mask_to_cells(mask, w):
+    """Bitmask -> liste de positions (x, y), par index croissant."""
+    out = []
+    while mask:
+        low = mask & -mask
+        i = low.bit_length() - 1
+        out.append((i % w, i // w))
+        mask ^= low
+    return out
+
+def wave_masks(cells, w):
+    """
+    cells: [(x, y, wave)] -> tuple de (wave, mask) triés par vague,
+    une entrée par niveau de vague présent (9 au maximum).
+    """
+    by_wave = {}
+    for (x, y, wave) in cells:
+        by_wave[wave] = by_wave.get(wave, 0) | (1 << (y * w + x))
+    return tuple(sorted(by_wave.items()))
+
+
+class GridState:
+    """Plans de bits de la carte: murs, avertissement, dégâts, pièce."""
+    empty = 0   # plan vide
+
+    def __init__(self, w, h, walls=()):
+        self.w = w
+        self.h = h
+        self.size = w * h
+        self.full = (1 << self.size) - 1
+        self.walls = cells_to_mask(walls, w)
+        self.warning = 0
+        self.damage = 0
+        self.coin = 0
+
+    def bit(self, x, y):
+        return 1 << (y * self.w + x)
+
+    def is_wall(self, x, y):
+        return (self.walls >> (y * self.w + x)) & 1 == 1
+
+    def covers(self, mask, x, y):
+        """La case (x, y) est-elle dans le plan `mask` ?"""
+        return (mask >> (y * self.w + x)) & 1 == 1
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.w and 0 <= y < self.h
+
+    def set_coin(self, pos):
+        self.coin = 0 if pos is None else self.bit(*pos)
+
+    def set_layers(self, warning, damage):
+        """Couches fusionnées; le 'X' a priorité sur le '!'."""
+        self.damage = damage
+        self.warning = warning & ~damage
+
+    def clear_layers(self):
+        self.warning = 0
+        self.damage = 0
+
+    def hit(self, x, y):
+        return (self.damage >> (y * self.w + x)) & 1 == 1
+
+    def cell_char(self, x, y, warning_char="!", damage_char="X"):
+        i = y * self.w + x
+        if (self.damage >> i) & 1:
+            return damage_char
+        if (self.warning >> i) & 1:
+            return warning_char
+        return None
+
+    def free_mask(self, exclude=(), window=None):
+        """
+        Cases libres (ni mur, ni exclues). Avec `window` = (x0, y0, vw, vh), dans
+        la carte: seulement cette fenêtre, en bits locaux ((y - y0) * vw + x - x0).
+        """
+        if window is not None:
+            return window_free_mask(self.window_walls(*window), window, exclude)
+        return self.full & ~self.walls & ~cells_to_mask(exclude, self.w)
+
+    def random_free_cell(self, exclude=(), rng=None):
+        """Case libre tirée au hasard (murs et `exclude` écartés), ou None si la carte est pleine."""
+        free = self.free_mask(exclude)
+        if not free:
+            return None
+        size, w = self.size, self.w
+        while True:
+            i = rng.randrange(size)
+            if (free >> i) & 1:
+                return (i % w, i // w)
+
+    def bits(self, mask):
+        """Chaîne '0'/'1' indexée par cellule (pour parcourir un plan en O(n) au rendu)."""
+        return format(mask & self.full, f"0{self.size}b")[::-1]
+
+    def window_bits(self, mask, x0, y0, vw, vh):
+        """
+        Fenêtre (x0, y0, vw, vh) d'un plan: une chaîne '0'/'1' par rangée.
+        La bande de rangées est extraite d'un seul décalage et formatée une
+        fois, puis chaque rangée y est découpée: le coût suit la fenêtre
+        (à la largeur de carte près), pas la carte entière.
+        """
+        w = self.w
+        n = (vh - 1) * w + vw
+        band = (mask >> (y0 * w + x0)) & ((1 << n) - 1)
+        if not band:
+            return [("0" * vw)] * vh
+        s = format(band, f"0{n}b")[::-1]
+        return [s[r * w:r * w + vw] for r in range(vh)]
+
+    def window_walls(self, x0, y0, vw, vh):
+        """Murs de la fenêtre, au format de window_bits."""
+        return self.window_bits(self.walls, x0, y0, vw, vh)
+
+
+_FREE_BITS = str.maketrans("01", "10")   # rangée de murs -> rangée de cases libres
+
+def window_free_mask(wall_rows, window, exclude=()):
+    """Rangées de murs '0'/'1' d'une fenêtre -> masque local de ses cases libres, `exclude` retirées."""
+    x0, y0, vw, vh = window
+    bits = "".join(wall_rows).translate(_FREE_BITS)[::-1]
+    mask = int(bits, 2) if bits else 0
+    for x, y in exclude:
+        if x0 <= x < x0 + vw and y0 <= y < y0 + vh:
+            mask &= ~(1 << ((y - y0) * vw + x - x0))
+    return mask
+
+
+# =========================================
+#  Free-cell index (coin spawning)
+# =========================================
+# The cells reachable from the spawn point (4-neighbour flood fill, walls
+# block) are stored once in an array, with a cell -> slot map. A random
+# pick is one randrange() on the array. Occupying or freeing a cell is a
+# swap with the last slot, so the array never has holes. Cells cut off by
+# walls are never in the index, so a coin is always reachable.
+
+class FreeCellIndex:
+    __slots__ = ("w", "cells", "where")
+
+    def __init__(self, w, cells, size):
+        self.w = w
+        self.cells = array("i", cells)          # cases libres (index y*w+x)
+        self.where = array("i", [-1]) * size    # case -> position dans cells, -1 si absente
+        where = self.where
+        for k, c in enumerate(self.cells):
+            where[c] = k
+
+    @classmethod
+    def reachable(cls, grid, start):
+        """Index des cases atteignables depuis `start` (parcours en largeur sur les murs de `grid`)."""
+        w, size = grid.w, grid.size
+        seen = bytearray(grid.bits(grid.walls), "ascii")   # '1' = mur ou déjà vu
+        x, y = start
+        s = y * w + x
+        if not grid.in_bounds(x, y) or seen[s] == 49:
+            return cls(w, (), size)
+        seen[s] = 49
+        order = [s]
+        append = order.append
+        k = 0
+        while k < len(order):
+            i = order[k]
+            k += 1
+            col = i % w
+            if i >= w and seen[i - w] == 48:
+                seen[i - w] = 49
+                append(i - w)
+            if i + w < size and seen[i + w] == 48:
+                seen[i + w] = 49
+                append(i + w)
+            if col and seen[i - 1] == 48:
+                seen[i - 1] = 49
+                append(i - 1)
+            if col + 1 < w and seen[i + 1] == 48:
+                seen[i + 1] = 49
+                append(i + 1)
+        return cls(w, order, size)
+
+    def copy(self):
+        other = FreeCellIndex.__new__(FreeCellIndex)
+        other.w = self.w
+        other.cells = array("i", self.cells)
+        other.where = array("i", self.where)
+        return other
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, pos):
+        i = pos[1] * self.w + pos[0]
+        return 0 <= i < len(self.where) and self.where[i] >= 0
+
+    def _swap(self, a, b):
+        cells, where = self.cells, self.where
+        ca, cb = cells[a], cells[b]
+        cells[a], cells[b] = cb, ca
+        where[cb], where[ca] = a, b
+
+    def discard(self, pos):
+        """Retire une case (occupée par une pièce...): échange avec la dernière, O(1)."""
+        i = pos[1] * self.w + pos[0]
+        k = self.where[i] if 0 <= i < len(self.where) else -1
+        if k < 0:
+            return False
+        self._swap(k, len(self.cells) - 1)
+        self.cells.pop()
+        self.where[i] = -1
+        return True
+
+    def add(self, pos):
+        """Remet une case libérée dans l'index, O(1)."""
+        i = pos[1] * self.w + pos[0]
+        if self.where[i] >= 0:
+            return
+        self.where[i] = len(self.cells)
+        self.cells.append(i)
+
+    def pick(self, rng, exclude=()):
+        """
+        Case tirée uniformément parmi celles de l'index, hors `exclude`.
+        Les cases exclues sont échangées en fin de tableau puis laissées hors
+        du tirage: O(len(exclude)), quelle que soit la carte. None si vide.
+        """
+        n = len(self.cells)
+        w, where = self.w, self.where
+        for (x, y) in exclude:
+            k = where[y * w + x]
+            if 0 <= k < n:
+                n -= 1
+                self._swap(k, n)
+        if n <= 0:
+            return None
+        i = self.cells[rng.randrange(n)]
+        return (i % w, i // w)
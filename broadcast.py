@@ -0,0 +1,166 @@
+"""
+Spectator broadcast: many viewers watch one live run.
+
+    SPECTATE_PORT = 4001 in options.py         # the local game accepts viewers (asyncio loop)
+    python server.py --watch-port 4001         # viewers follow the server's featured session
+    telnet 127.0.0.1 4001                      # watch (Q leaves)
+
+A FrameBroadcaster has its own DiffRenderer and Viewport at a fixed
+spectator size (SPECTATE_SIZE). Each frame is built and encoded to bytes
+once, whatever the number of viewers. The same buffer is then handed to
+every viewer transport as a memoryview: a viewer whose socket accepts the
+frame gets it without a copy.
+
+Slow viewers never hold the game back. Each viewer transport has a
+high-water mark (SPECTATE_SEND_BUFFER). Above it, asyncio calls
+pause_writing() and that viewer's frames are dropped. When its buffer
+drains it gets a keyframe: a full repaint of the current frame, encoded
+at most once per frame and shared by every viewer that needs it. The diffs
+that follow apply to it.
+"""
+import asyncio
+import time
+
+import options as cfg
+from profiler import Histogram
+from render import DiffRenderer, Viewport
+
+# Telnet: le serveur fait l'écho (le client n'affiche pas ce qu'on tape), mode caractère
+IAC, WILL, OPT_ECHO, OPT_SGA = 255, 251, 1, 3
+NEGOTIATE = bytes([IAC, WILL, OPT_ECHO, IAC, WILL, OPT_SGA])
+
+
+def encode(text):
+    """Texte de frame -> octets pour un terminal distant (pas de traduction \\n -> \\r\\n côté client)."""
+    return text.replace("\n", "\r\n").encode("utf-8")
+
+
+class Viewer(asyncio.Protocol):
+    """Un spectateur (socket ou pipe): ne reçoit que des frames entières, ou rien quand il est en retard."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.transport = None
+        self.paused = False      # tampon d'envoi au-dessus du seuil: frames abandonnées
+        self.need_key = True     # prochaine frame: keyframe (arrivée ou rattrapage)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(high=cfg.SPECTATE_SEND_BUFFER)
+        if transport.get_extra_info("peername") is not None:   # socket (pas un pipe): telnet
+            transport.write(NEGOTIATE)
+        self.hub.add(self)
+
+    def connection_lost(self, exc):
+        self.hub.remove(self)
+
+    def data_received(self, data):
+        if b"q" in data.lower():
+            self.transport.close()
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.need_key = True
+
+
+class FrameBroadcaster:
+    """Construit et encode chaque frame une fois, puis la diffuse à tous les spectateurs."""
+
+    def __init__(self, size=None):
+        self.size = tuple(size or cfg.SPECTATE_SIZE)
+        self.renderer = DiffRenderer(field_col_gap=cfg.SIDE_GAP_SPACES, defer=True, size=lambda: self.size)
+        self.viewport = Viewport(cfg.VIEW_MARGIN)
+        self.viewers = {}        # Viewer -> None (ordre d'arrivée)
+        self._key = None         # keyframe de la frame courante, encodée à la demande
+        self._servers = []
+
+        # Stats
+        self.frames = 0
+        self.bytes_encoded = 0
+        self.sent = 0            # frames confiées à un transport
+        self.dropped = 0         # frames abandonnées (spectateur en retard)
+        self.resyncs = 0         # keyframes envoyées
+        self.encode_time = Histogram()   # µs: construction + encodage d'une frame
+        self.fanout_time = Histogram()   # µs: distribution à tous les spectateurs
+
+    def add(self, viewer):
+        self.viewers[viewer] = None
+        if self.renderer.front_lines is not None:
+            viewer.transport.write(self.keyframe())
+            viewer.need_key = False
+            self.resyncs += 1
+
+    def remove(self, viewer):
+        self.viewers.pop(viewer, None)
+
+    def keyframe(self):
+        """Repeinte complète de la frame courante, encodée une fois par frame."""
+        if self._key is None:
+            self._key = memoryview(encode(self.renderer.keyframe()))
+        return self._key
+
+    def restart(self):
+        """Nouvelle partie diffusée: la prochaine frame est une repeinte complète."""
+        self.renderer.invalidate()
+        self.viewport = Viewport(cfg.VIEW_MARGIN)
+
+    def publish(self, draw):
+        """
+        `draw(renderer, viewport)` dessine la frame (voir GameSession.draw).
+        Sans spectateur rien n'est construit; la frame suivante repartira en repeinte complète.
+        """
+        if not self.viewers:
+            self.renderer.invalidate()
+            return
+        t0 = time.perf_counter()
+        draw(self.renderer, self.viewport)
+        text = self.renderer.take()
+        self._key = None
+        if not text:
+            return
+        data = memoryview(encode(text))
+        self.frames += 1
+        self.bytes_encoded += len(data)
+        t1 = time.perf_counter()
+        self.encode_time.add(int((t1 - t0) * 1e6))
+        for viewer in self.viewers:
+            if viewer.paused:
+                self.dropped += 1
+            elif viewer.need_key:
+                viewer.transport.write(self.keyframe())
+                viewer.need_key = False
+                self.resyncs += 1
+            else:
+                viewer.transport.write(data)
+                self.sent += 1
+        self.fanout_time.add(int((time.perf_counter() - t1) * 1e6))
+
+    # ----- transports -----
+    async def serve(self, host=None, port=None):
+        """Accepte des spectateurs TCP/telnet sur host:port (SPECTATE_HOST / SPECTATE_PORT)."""
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: Viewer(self), host or cfg.SPECTATE_HOST,
+                                          port or cfg.SPECTATE_PORT, backlog=1024)
+        self._servers.append(server)
+        return server
+
+    async def attach_pipe(self, pipe):
+        """Ajoute un spectateur sur un pipe ou une FIFO ouverte en écriture."""
+        loop = asyncio.get_running_loop()
+        _, viewer = await loop.connect_write_pipe(lambda: Viewer(self), pipe)
+        return viewer
+
+    def close(self):
+        for server in self._servers:
+            server.close()
+        self._servers.clear()
+        for viewer in list(self.viewers):
+            viewer.transport.close()
+
+    def summary(self):
+        return (f"spectators: {len(self.viewers)} | {self.frames} frames encoded once "
+                f"({self.encode_time.mean:.0f} µs), fan-out {self.fanout_time.mean:.0f} µs | "
+                f"{self.dropped} dropped, {self.resyncs} keyframes")
@@ -0,0 +1,922 @@
+import hashlib
+import os
+import random
+from collections import deque
+
+import options as cfg
+import npbackend
+from bitgrid import FreeCellIndex, GridState, wave_masks
+from tilemap import ChunkedGridState, TileMap
+
+# =========================================
+#  Headless engine: patterns, phases, rules
+# =========================================
+# Everything in here is pure game logic: no terminal, no keyboard, no
+# wall clock. The interactive game (mini_adventure.py) and the batch
+# simulator (simulate.py) both drive the same Engine; only the clock and
+# the input policy differ.
+
+# Logical input actions (what a key press means for the game)
+ACTION_UP = "up"
+ACTION_DOWN = "down"
+ACTION_LEFT = "left"
+ACTION_RIGHT = "right"
+ACTION_QUIT = "quit"
+
+MOVES = {
+    ACTION_UP: (0, -1),
+    ACTION_DOWN: (0, 1),
+    ACTION_LEFT: (-1, 0),
+    ACTION_RIGHT: (1, 0),
+}
+
+# Fade-out after the damage phase lasts up to 8 stagger steps (waves 2..9)
+FADE_DURATION = 8 * cfg.WAVE_STAGGER + 1e-6
+
+# ======================
+#     PATTERNS (attacks/)
+# ======================
+def list_attack_files(folder):
+    try:
+        return sorted([
+            f for f in os.listdir(folder)
+            if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith((".txt", ".pat"))
+        ])
+    except FileNotFoundError:
+        return []
+
+def load_free_shape(path):
+    """
+    Lit un pattern ASCII libre. Tout caractère non-espace active une cellule.
+    Les chiffres '1'..'9' indiquent la vague (1 = immédiat, 9 = +8*WAVE_STAGGER).
+    Tout autre caractère => vague 1.
+    Retourne: {"cells": [(x,y,wave), ...], "w": w, "h": h}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = [ln.rstrip("\n") for ln in f.readlines()]
+    # trim empty lines top/bottom
+    while raw and raw[0].strip() == "":
+        raw.pop(0)
+    while raw and raw[-1].strip() == "":
+        raw.pop()
+    if not raw:
+        return None
+
+    # crop horizontal bounds
+    min_c = None; max_c = None
+    for ln in raw:
+        if ln.strip() == "":
+            continue
+        for i, ch in enumerate(ln):
+            if ch != " ":
+                min_c = i if min_c is None else min(min_c, i)
+                max_c = i if max_c is None else max(max_c, i)
+    if min_c is None:
+        return None
+
+    cropped = [ln[min_c:max_c+1] for ln in raw]
+    h = len(cropped)
+    w = max(len(ln) for ln in cropped) if h > 0 else 0
+    cropped = [ln.ljust(w, " ") for ln in cropped]
+
+    cells = []
+    for y, ln in enumerate(cropped):
+        for x, ch in enumerate(ln):
+            if ch == " ":
+                continue
+            if ch in "123456789":
+                wave = int(ch)
+            else:
+                wave = 1
+            cells.append((x, y, wave))
+    return {"cells": cells, "w": w, "h": h}
+
+def compile_pattern(path):
+    """Un fichier pattern prêt pour build_attack_table (orientations incluses), ou None s'il est vide."""
+    shp = load_free_shape(path)
+    if shp and shp["cells"]:
+        shp["variants"] = pattern_orientations(shp)
+        return shp
+    return None
+
+def load_attack_patterns(folder):
+    patterns = []
+    for fname in list_attack_files(folder):
+        path = os.path.join(folder, fname)
+        try:
+            shp = compile_pattern(path)
+            if shp:
+                patterns.append(shp)
+        except Exception:
+            pass
+    return patterns
+
+def rotate_cells(cells, w, h, k):
+    """
+    Rotation 0/90/180/270° des cellules (x,y,wave).
+    Retourne (new_cells, new_w, new_h)
+    """
+    k = k % 4
+    if k == 0:
+        return list(cells), w, h
+    out = []
+    if k == 1:
+        for (x, y, wave) in cells:
+            out.append((h - 1 - y, x, wave))
+        return out, h, w
+    if k == 2:
+        for (x, y, wave) in cells:
+            out.append((w - 1 - x, h - 1 - y, wave))
+        return out, w, h
+    # k == 3
+    for (x, y, wave) in cells:
+        out.append((y, w - 1 - x, wave))
+    return out, h, w
+
+def mirror_cells(cells, w, h, mirror_h=False, mirror_v=False):
+    """
+    Retourne la forme horizontalement et/ou verticalement.
+    cells: [(x, y, wave)]
+    Retourne (new_cells, w, h)
+    """
+    if not mirror_h and not mirror_v:
+        return list(cells), w, h
+
+    out = []
+    for (x, y, wave) in cells:
+        nx = (w - 1 - x) if mirror_h else x
+        ny = (h - 1 - y) if mirror_v else y
+        out.append((nx, ny, wave))
+    return out, w, h
+
+
+def pattern_orientations(shp):
+    """
+    Les orientations distinctes d'un pattern (4 rotations x miroirs), calculées
+    une seule fois. Les formes symétriques (cercle, donut...) sont dédoublonnées.
+    Retourne: [(cells_tuple, w, h), ...]
+    """
+    seen = set()
+    variants = []
+    for k in range(4):
+        rot_cells, rw, rh = rotate_cells(shp["cells"], shp["w"], shp["h"], k)
+        for mirror_h in (False, True):
+            for mirror_v in (False, True):
+                cells, mw, mh = mirror_cells(rot_cells, rw, rh, mirror_h, mirror_v)
+                cells = tuple(sorted(cells))
+                if cells in seen:
+                    continue
+                seen.add(cells)
+                variants.append((cells, mw, mh))
+    return variants
+
+def build_attack_table(patterns, grid_w=None, grid_h=None):
+    """
+    Table de placement pour une taille de carte: pour chaque pattern, ses
+    orientations qui tiennent dans la grille avec leur plage d'origines valides.
+    Les patterns qui ne tiennent dans aucune orientation sont écartés.
+    Chaque orientation porte aussi ses masques de vagues (bitboard, origine 0,0):
+    la placer revient à décaler ces masques.
+    Retourne: [[(cells, max_ox, max_oy, masks), ...], ...]  (une liste par pattern)
+    """
+    grid_w = cfg.GRID_W if grid_w is None else grid_w
+    grid_h = cfg.GRID_H if grid_h is None else grid_h
+    table = []
+    for shp in patterns:
+        variants = shp.get("variants") or pattern_orientations(shp)
+        fitting = [(cells, grid_w - w, grid_h - h, wave_masks(cells, grid_w))
+                   for (cells, w, h) in variants
+                   if w <= grid_w and h <= grid_h]
+        if fitting:
+            table.append(fitting)
+    return table
+
+def pick_attack(table, rng=random):
+    """
+    Tire un pattern, une orientation et une origine dans une table précalculée.
+    Toujours réussi si la table n'est pas vide. Retourne: dict[(gx,gy)] = wave
+    """
+    if not table:
+        return {}
+    cells, max_ox, max_oy, _ = rng.choice(rng.choice(table))
+    ox = rng.randint(0, max_ox)
+    oy = rng.randint(0, max_oy)
+    return {(ox + x, oy + y): wave for (x, y, wave) in cells}
+
+def pick_attack_masks(table, grid_w, rng=random):
+    """
+    Comme pick_attack, mais en bitboard: l'attaque placée est un tuple
+    ((wave, mask), ...) trié par vague. Le placement est un simple décalage.
+    """
+    if not table:
+        return ()
+    _, max_ox, max_oy, masks = rng.choice(rng.choice(table))
+    ox = rng.randint(0, max_ox)
+    oy = rng.randint(0, max_oy)
+    shift = oy * grid_w + ox
+    return tuple((wave, mask << shift) for (wave, mask) in masks)
+
+class LocalAttack:
+    """
+    Attaque placée sur une carte en tuiles: ses ((wave, mask), ...) restent
+    dans le repère du pattern (bit ly*w + lx), `rect` = (ox, oy, w, h) la
+    situe dans la carte. Aucun masque n'a la taille de la carte.
+    """
+    __slots__ = ("rect", "masks")
+
+    def __init__(self, rect, masks):
+        self.rect = rect
+        self.masks = masks
+
+    def __iter__(self):
+        return iter(self.masks)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __eq__(self, other):
+        return isinstance(other, LocalAttack) and (self.rect, self.masks) == (other.rect, other.masks)
+
+    def __hash__(self):
+        return hash((self.rect, self.masks))
+
+    def __repr__(self):
+        return f"LocalAttack({self.rect}, {self.masks})"
+
+def pick_local_attack(table, grid_w, grid_h, rng=random):
+    """
+    Comme pick_attack_masks (mêmes tirages, donc même placement à graine
+    égale), pour les cartes en tuiles: retourne une LocalAttack, sans décaler
+    les masques dans la carte.
+    """
+    if not table:
+        return ()
+    cells, max_ox, max_oy, _ = rng.choice(rng.choice(table))
+    ox = rng.randint(0, max_ox)
+    oy = rng.randint(0, max_oy)
+    w, h = grid_w - max_ox, grid_h - max_oy
+    return LocalAttack((ox, oy, w, h), wave_masks(cells, w))
+
+def attack_cells(atk, mask, grid_w):
+    """Index y*grid_w + x des cases d'un masque de l'attaque `atk` (local pour une LocalAttack)."""
+    rect = atk.rect if isinstance(atk, LocalAttack) else None
+    out = []
+    while mask:
+        low = mask & -mask
+        i = low.bit_length() - 1
+        if rect is not None:
+            ox, oy, w, _ = rect
+            i = (oy + i // w) * grid_w + ox + i % w
+        out.append(i)
+        mask ^= low
+    return out
+
+def place_shape_in_grid(cells, w, h, grid_w=None, grid_h=None, rng=random):
+    """
+    Place aléatoirement la forme dans la grille.
+    Retourne: dict[(gx,gy)] = wave
+    """
+    grid_w = cfg.GRID_W if grid_w is None else grid_w
+    grid_h = cfg.GRID_H if grid_h is None else grid_h
+    if w > grid_w or h > grid_h:
+        return None
+    ox = rng.randint(0, grid_w - w)
+    oy = rng.randint(0, grid_h - h)
+    placed = {}
+    for (x, y, wave) in cells:
+        placed[(ox + x, oy + y)] = wave
+    return placed
+
+def choose_attack(patterns, grid_w=None, grid_h=None, rng=random):
+    """
+    Choisit un pattern, une orientation et une position dans la grille.
+    Pour des tirages répétés, construire la table une fois (build_attack_table)
+    et appeler pick_attack directement.
+    """
+    return pick_attack(build_attack_table(patterns, grid_w, grid_h), rng)
+
+
+def merged_cells(attacks):
+    """
+    attacks: list[dict[(x,y)->'!' or 'X']]
+    Fusionne en donnant la priorité au 'X'.
+    """
+    merged = {}
+    for atk in attacks:
+        for pos, ch in atk.items():
+            if ch == cfg.ATTACK_DAMAGE_CHAR:
+                merged[pos] = cfg.ATTACK_DAMAGE_CHAR
+            else:
+                if pos not in merged:
+                    merged[pos] = cfg.ATTACK_WARNING_CHAR
+    return merged
+
+# ======================
+#      WAVE RENDERING
+# ======================
+def attacks_wave_render(current_attacks, phase, phase_elapsed,
+                        fade_attacks=None, fade_elapsed=0.0):
+    """
+    Convertit des attaques stockées comme dict pos->wave (1..9)
+    en couches dict pos->'!'/'X' selon la phase, avec un délai
+    de cfg.WAVE_STAGGER entre vagues successives.
+
+    current_attacks: list[dict[(x,y)->wave]]
+    fade_attacks:    list[dict[(x,y)->wave]] (résidus à faire disparaître pendant idle)
+    Retourne list[dict[(x,y)->'!'/'X']]
+    """
+    to_draw = []
+
+    def draw_warning(atk):
+        d = {}
+        for pos, wave in atk.items():
+            if phase_elapsed >= (wave - 1) * cfg.WAVE_STAGGER:
+                d[pos] = cfg.ATTACK_WARNING_CHAR
+        return d
+
+    def draw_damage(atk):
+        d = {}
+        for pos, wave in atk.items():
+            if phase_elapsed >= (wave - 1) * cfg.WAVE_STAGGER:
+                d[pos] = cfg.ATTACK_DAMAGE_CHAR
+            else:
+                d[pos] = cfg.ATTACK_WARNING_CHAR
+        return d
+
+    def draw_fade(atk):
+        # Pendant l'idle, on efface progressivement: la cellule reste affichée
+        # tant que fade_elapsed < (wave-1)*stagger. Au-delà, elle disparaît.
+        d = {}
+        for pos, wave in atk.items():
+            if fade_elapsed < (wave - 1) * cfg.WAVE_STAGGER:
+                d[pos] = cfg.ATTACK_DAMAGE_CHAR
+        return d
+
+    if phase == 'warning':
+        for atk in current_attacks:
+            to_draw.append(draw_warning(atk))
+    elif phase == 'damage':
+        for atk in current_attacks:
+            to_draw.append(draw_damage(atk))
+    elif phase == 'idle' and fade_attacks:
+        for atk in fade_attacks:
+            to_draw.append(draw_fade(atk))
+
+    return to_draw
+
+def wave_layers(current_attacks, phase, phase_elapsed,
+                fade_attacks=None, fade_elapsed=0.0):
+    """
+    Équivalent bitboard d'attacks_wave_render + merged_cells.
+    Attaques: tuples ((wave, mask), ...) triés par vague.
+    Retourne (par_attaque, warning, damage): le masque visible de chaque attaque
+    (pour le bandeau multi) et les deux plans fusionnés, 'X' prioritaire.
+    """
+    stagger = cfg.WAVE_STAGGER
+    per_attack = []
+    warning = 0
+    damage = 0
+
+    if phase == 'warning':
+        for atk in current_attacks:
+            m = 0
+            for wave, mask in atk:
+                if phase_elapsed < (wave - 1) * stagger:
+                    break
+                m |= mask
+            per_attack.append(m)
+            warning |= m
+    elif phase == 'damage':
+        for atk in current_attacks:
+            full = 0
+            for wave, mask in atk:
+                full |= mask
+                if phase_elapsed >= (wave - 1) * stagger:
+                    damage |= mask
+            per_attack.append(full)
+            warning |= full
+    elif phase == 'idle' and fade_attacks:
+        for atk in fade_attacks:
+            m = 0
+            for wave, mask in atk:
+                if fade_elapsed < (wave - 1) * stagger:
+                    m |= mask
+            per_attack.append(m)
+            damage |= m
+
+    return per_attack, warning & ~damage, damage
+
+class WaveTimeline:
+    """
+    Les attaques d'un tour compilées une seule fois en une chronologie.
+    Les cellules sont groupées par niveau de vague (9 au plus):
+      - appear: [(t, mask)] cellules atteintes au temps t (plus petite vague
+        qui les couvre) -> '!' en warning, 'X' en damage;
+      - vanish: [(t, mask)] cellules qui s'effacent au temps t pendant le
+        fade (plus grande vague qui les couvre).
+    Un curseur n'applique que les niveaux franchis depuis le dernier appel:
+    le coût par tick suit le nombre de niveaux franchis, pas la taille des attaques.
+    """
+
+    def __init__(self, attacks, stagger=None):
+        stagger = cfg.WAVE_STAGGER if stagger is None else stagger
+        levels = {}
+        self.spans = []   # (première apparition, dernière vague) de chaque attaque
+        for atk in attacks:
+            if not atk:
+                continue
+            waves = [wave for wave, _ in atk]
+            self.spans.append(((min(waves) - 1) * stagger, (max(waves) - 1) * stagger))
+            for wave, mask in atk:
+                levels[wave] = levels.get(wave, 0) | mask
+
+        self.appear = []
+        seen = 0
+        for wave in sorted(levels):
+            new = levels[wave] & ~seen
+            seen |= levels[wave]
+            if new:
+                self.appear.append(((wave - 1) * stagger, new))
+        self.full = seen
+
+        self.vanish = []
+        seen = 0
+        for wave in sorted(levels, reverse=True):
+            new = levels[wave] & ~seen
+            seen |= levels[wave]
+            if new:
+                self.vanish.append(((wave - 1) * stagger, new))
+        self.vanish.reverse()
+
+        self.rewind(self.appear)
+
+    def rewind(self, events):
+        """Repart du début d'une liste d'événements (début de phase)."""
+        self._events = events
+        self._i = 0
+        self.acc = 0
+
+    def advance(self, t):
+        """Applique les niveaux franchis jusqu'à t; retourne le masque cumulé."""
+        events = self._events
+        i = self._i
+        n = len(events)
+        while i < n and events[i][0] <= t:
+            self.acc |= events[i][1]
+            i += 1
+        self._i = i
+        return self.acc
+
+    def remaining(self, t):
+        """Fade: cases encore affichées à t (full privé des cases effacées)."""
+        return self.full & ~self.advance(t)
+
+    def visible_attacks(self, phase, t):
+        """Pour chaque attaque: est-elle visible à t dans cette phase ? (bandeau multi)"""
+        if phase == 'warning':
+            return [first <= t for first, _ in self.spans]
+        if phase == 'damage':
+            return [True] * len(self.spans)
+        return [last > t for _, last in self.spans]
+
+class LocalTimeline:
+    """
+    Chronologie des cartes en tuiles, même interface que WaveTimeline: une
+    WaveTimeline par LocalAttack, dans le repère de l'attaque. Les masques
+    retournés (full, advance) sont des plans creux de ChunkedGridState,
+    ((rect, masque local), ...): rien n'a la taille de la carte.
+    """
+
+    def __init__(self, attacks, stagger=None):
+        attacks = [atk for atk in attacks if atk]
+        self.rects = [atk.rect for atk in attacks]
+        self.parts = [WaveTimeline([atk.masks], stagger) for atk in attacks]
+        self.spans = [tl.spans[0] for tl in self.parts]
+        self.appear = [tl.appear for tl in self.parts]
+        self.vanish = [tl.vanish for tl in self.parts]
+        self.full = self._plane([tl.full for tl in self.parts])
+        self.rewind(self.appear)
+
+    def _plane(self, masks):
+        return tuple((rect, m) for rect, m in zip(self.rects, masks) if m)
+
+    def rewind(self, events):
+        """Repart du début d'une phase (`appear` ou `vanish`, une liste par attaque)."""
+        for tl, ev in zip(self.parts, events):
+            tl.rewind(ev)
+        self._masks = [0] * len(self.parts)
+        self.acc = ()
+
+    def advance(self, t):
+        """Plan cumulé à t; reconstruit seulement quand un niveau est franchi."""
+        masks = [tl.advance(t) for tl in self.parts]
+        if masks != self._masks:
+            self._masks = masks
+            self.acc = self._plane(masks)
+        return self.acc
+
+    def remaining(self, t):
+        """Fade, attaque par attaque: une case reste tant qu'une des attaques qui la couvrent l'affiche."""
+        self.advance(t)
+        return self._plane([tl.full & ~m for tl, m in zip(self.parts, self._masks)])
+
+    visible_attacks = WaveTimeline.visible_attacks
+
+def make_timeline(attacks, grid):
+    """
+    Chronologie du tour: LocalTimeline sur les cartes en tuiles, ArrayTimeline
+    (NumPy) sur les grandes cartes quand le backend est disponible,
+    WaveTimeline sinon. Mêmes cases dans tous les cas.
+    """
+    if isinstance(grid, ChunkedGridState):
+        return LocalTimeline(attacks)
+    if npbackend.enabled(grid.size) and grid.size <= cfg.NUMPY_MAX_CELLS:
+        return npbackend.ArrayTimeline(attacks, grid.w, grid.h)
+    return WaveTimeline(attacks)
+
+# ======================
+#     WAVE SCHEDULER
+# ======================
+# Streams of a seeded run: one generator each, so that coins picked
+# during a run never shift the attack sequence.
+STREAM_ATTACKS = "attacks"
+STREAM_MULTI = "multi"
+STREAM_COINS = "coins"
+
+def stream_seed(seed, name):
+    """Graine du flux `name` d'une partie, dérivée de la graine de la partie."""
+    digest = hashlib.sha256(f"{seed}:{name}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+def daily_seed(day=None):
+    """Graine du défi du jour (`day`: date ou "AAAA-MM-JJ", aujourd'hui par défaut): la même pour tous."""
+    if day is None:
+        import datetime
+        day = datetime.date.today()
+    digest = hashlib.sha256(f"daily:{day}".encode()).digest()
+    return int.from_bytes(digest[:8], "little") >> 1   # 63 bits, comme les graines tirées au hasard
+
+
+class Wave:
+    """Un tour d'attaques préparé: attaques placées, multi-attaque, durées et chronologie."""
+    __slots__ = ("index", "attacks", "multi", "timings", "timeline")
+
+    def __init__(self, index, attacks, multi, timings, timeline):
+        self.index = index
+        self.attacks = attacks      # [((wave, mask), ...), ...]
+        self.multi = multi
+        self.timings = timings      # (idle, warning, damage) de timings_for_attack_count(index)
+        self.timeline = timeline
+
+
+class WaveScheduler:
+    """
+    Prépare les tours d'attaques à l'avance. Chaque tour ne dépend que de son
+    numéro et de deux flux aléatoires (placement des attaques, tirage multi),
+    donc le générer plus tôt ne change rien: une graine donne toujours la même
+    suite de tours, quoi que fasse le joueur. Le moteur en ajoute un par pas
+    (fill) hors des changements de phase; au passage idle -> warning, next()
+    ne fait que retirer le premier de la file.
+
+    WaveScheduler.shared(rng): un seul flux pour tout, sans avance (ordre des
+    tirages des enregistrements de version 1).
+    """
+
+    def __init__(self, attack_table, grid, attacks_rng, multi_rng, lookahead=None):
+        self.attack_table = attack_table
+        self.grid = grid
+        self.attacks_rng = attacks_rng
+        self.multi_rng = multi_rng
+        self.lookahead = cfg.WAVE_LOOKAHEAD if lookahead is None else lookahead
+        self.queue = deque()
+        self.generated = 0      # tours préparés (numéro du prochain)
+        self.late = 0           # tours générés au changement de phase (file vide)
+
+    @classmethod
+    def seeded(cls, seed, attack_table, grid, lookahead=None):
+        return cls(attack_table, grid, random.Random(stream_seed(seed, STREAM_ATTACKS)),
+                   random.Random(stream_seed(seed, STREAM_MULTI)), lookahead)
+
+    @classmethod
+    def shared(cls, rng, attack_table, grid):
+        return cls(attack_table, grid, rng, rng, lookahead=0)
+
+    def _pick(self):
+        grid = self.grid
+        if isinstance(grid, ChunkedGridState):
+            return pick_local_attack(self.attack_table, grid.w, grid.h, self.attacks_rng)
+        return pick_attack_masks(self.attack_table, grid.w, self.attacks_rng)
+
+    def _generate(self):
+        index = self.generated
+        self.generated += 1
+        atk1 = self._pick()
+        attacks = [atk1] if atk1 else []
+        multi = False
+        if self.multi_rng.random() < extra_attack_probability(index):
+            atk2 = self._pick()
+            if atk2:
+                attacks.append(atk2)
+                multi = True
+        return Wave(index, attacks, multi, timings_for_attack_count(index),
+                    make_timeline(attacks, self.grid))
+
+    def fill(self, budget=1):
+        """Prépare au plus `budget` tours si la file n'est pas pleine (appelé hors des transitions)."""
+        queue = self.queue
+        while budget > 0 and len(queue) < self.lookahead:
+            queue.append(self._generate())
+            budget -= 1
+
+    def next(self):
+        """Le prochain tour: déjà prêt, sauf si la file est vide (ou sans avance)."""
+        if self.queue:
+            return self.queue.popleft()
+        if self.lookahead:
+            self.late += 1
+        return self._generate()
+
+    def upcoming(self):
+        """Tours déjà préparés, dans l'ordre."""
+        return list(self.queue)
+
+
+# ======================
+#     RULES & TIMINGS
+# ======================
+def random_free_cell(exclude, walls, grid_w=None, grid_h=None, rng=random, max_tries=256):
+    """
+    Case libre aléatoire (API historique, murs en set). Après `max_tries`
+    tirages ratés, tire parmi la liste des cases libres; None si aucune.
+    """
+    grid_w = cfg.GRID_W if grid_w is None else grid_w
+    grid_h = cfg.GRID_H if grid_h is None else grid_h
+    for _ in range(max_tries):
+        pos = (rng.randint(0, grid_w - 1), rng.randint(0, grid_h - 1))
+        if pos not in exclude and pos not in walls:
+            return pos
+    free = [(x, y) for y in range(grid_h) for x in range(grid_w)
+            if (x, y) not in walls and (x, y) not in exclude]
+    return rng.choice(free) if free else None
+
+def timings_for_attack_count(attack_count):
+    steps = attack_count // cfg.ATTACKS_PER_STEP
+    idle = max(cfg.MIN_IDLE, cfg.BASE_IDLE - cfg.STEP_DELTA * steps)
+    warning = max(cfg.MIN_WARNING, cfg.BASE_WARNING - cfg.STEP_DELTA * steps)
+    return idle, warning, cfg.DAMAGE_DUR
+
+def extra_attack_probability(attack_count):
+    steps = attack_count // cfg.EXTRA_ATTACK_STEP
+    return min(cfg.EXTRA_ATTACK_MAX, steps * cfg.EXTRA_ATTACK_GROWTH)
+
+def random_free_bit_cell(grid, exclude, rng=random):
+    """
+    Case libre aléatoire sur un GridState (murs et `exclude` écartés).
+    Retourne None si la carte n'a aucune case libre.
+    """
+    return grid.random_free_cell(exclude, rng)
+
+def apply_move(px, py, action, grid):
+    """Applique une action de déplacement sur un GridState; les murs et les bords bloquent."""
+    d = MOVES.get(action)
+    if d is None:
+        return px, py
+    nx = min(grid.w - 1, max(0, px + d[0]))
+    ny = min(grid.h - 1, max(0, py + d[1]))
+    if not grid.is_wall(nx, ny):
+        return nx, ny
+    return px, py
+
+def spawn_position(start, walls, grid_w, grid_h):
+    """Position de départ: le 'P' de la carte, sinon la première case libre."""
+    if start and start not in walls:
+        return start
+    if (0, 0) not in walls:
+        return (0, 0)
+    for yy in range(grid_h):
+        for xx in range(grid_w):
+            if (xx, yy) not in walls:
+                return (xx, yy)
+    return (0, 0)
+
+# ======================
+#         ENGINE
+# ======================
+class Engine:
+    """
+    Machine à phases idle -> warning -> damage, sans terminal ni horloge.
+
+    Le pilote appelle step(now, action) avec `now` = secondes depuis le début
+    de la partie (horloge réelle ou virtuelle). Avec `seed`, attaques, tirage
+    multi et pièces ont chacun leur flux dérivé de la graine, et les tours sont
+    préparés à l'avance (WaveScheduler): la graine fixe toute la suite des
+    attaques. Avec `rng` (ancien mode), tout le hasard passe par ce seul flux.
+    Dans les deux cas, une graine + une suite d'actions reproduit une partie.
+    """
+
+    def __init__(self, walls, start, grid_w, grid_h, attack_patterns, rng=None, attack_table=None,
+                 free_cells=None, seed=None, lookahead=None):
+        self.walls = walls
+        self.grid_w = grid_w
+        self.grid_h = grid_h
+        self.patterns = attack_patterns
+        if attack_table is None:
+            attack_table = build_attack_table(attack_patterns, grid_w, grid_h)
+        self.attack_table = attack_table
+        if isinstance(walls, TileMap):
+            self.grid = ChunkedGridState(walls)   # murs lus par tuiles, sans plan complet
+        else:
+            self.grid = GridState(grid_w, grid_h, walls)
+        if seed is not None:
+            self.rng = random.Random(stream_seed(seed, STREAM_COINS))
+            self.waves = WaveScheduler.seeded(seed, attack_table, self.grid, lookahead)
+        else:
+            self.rng = rng if rng is not None else random.Random()
+            self.waves = WaveScheduler.shared(self.rng, attack_table, self.grid)
+
+        self.px, self.py = spawn_position(start, walls, grid_w, grid_h)
+        # Cases atteignables depuis le départ (copie: la pièce en retire sa case).
+        # Les cartes en tuiles n'ont pas cet index (il aurait la taille de la carte):
+        # leur couche reach, calculée à la conversion, donne les mêmes cases.
+        if free_cells is None and not isinstance(self.grid, ChunkedGridState):
+            free_cells = FreeCellIndex.reachable(self.grid, (self.px, self.py))
+        self.free_cells = free_cells.copy() if free_cells is not None else None
+        self.score = 0
+        self.coin_pos = None
+        self._spawn_coin()
+
+        self.wave_count = 0
+        self.idle_dur, self.warning_dur, self.damage_dur = timings_for_attack_count(0)
+
+        self.now = 0.0
+        self.phase = 'idle'
+        self.phase_start = 0.0
+        self.phase_elapsed = 0.0
+        self.current_attacks = []   # list of ((wave, mask), ...), LocalAttack sur les cartes en tuiles
+        self.timeline = None        # WaveTimeline (ou ArrayTimeline) du tour en cours
+        self.fade_timeline = None   # tour précédent, en train de s'effacer (idle)
+        self.fade_start = 0.0
+        self.multi_active = False
+
+        self.alive = True
+
+    # ----- phases -----
+    def _start_wave(self):
+        wave = self.waves.next()
+        self.current_attacks = wave.attacks
+        self.multi_active = wave.multi
+        self.timeline = wave.timeline
+        _, self.warning_dur, self.damage_dur = wave.timings
+
+    def _update_phase(self, now):
+        phase_elapsed = now - self.phase_start
+        changed_phase = False
+
+        if self.phase == 'idle':
+            # Nettoyage du fade terminé
+            if self.fade_timeline and (now - self.fade_start) >= FADE_DURATION:
+                self.fade_timeline = None
+            if phase_elapsed >= self.idle_dur:
+                self.phase = 'warning'
+                changed_phase = True
+                self._start_wave()
+
+        elif self.phase == 'warning':
+            if phase_elapsed >= self.warning_dur:
+                self.phase = 'damage'
+                changed_phase = True
+                self.timeline.rewind(self.timeline.appear)
+
+        elif self.phase == 'damage':
+            if phase_elapsed >= self.damage_dur:
+                self.fade_timeline = self.timeline
+                self.fade_timeline.rewind(self.fade_timeline.vanish)
+                self.fade_start = now
+                self.wave_count += 1
+                self.idle_dur, self.warning_dur, self.damage_dur = timings_for_attack_count(self.wave_count)
+                self.phase = 'idle'
+                changed_phase = True
+                self.current_attacks = []
+                self.timeline = None
+                self.multi_active = False
+
+        if changed_phase:
+            self.phase_start = now
+            phase_elapsed = 0.0
+        else:
+            self.waves.fill()   # préparation des tours suivants, jamais sur un changement de phase
+        self.phase_elapsed = phase_elapsed
+
+    # ----- tick -----
+    def move(self, action):
+        """Déplacement + ramassage de la pièce (sans toucher aux phases)."""
+        if action is None or not self.alive:
+            return
+        self.px, self.py = apply_move(self.px, self.py, action, self.grid)
+        if (self.px, self.py) == self.coin_pos:
+            self.score += 1
+            self._spawn_coin()
+
+    def _spawn_coin(self):
+        """Nouvelle pièce sur une case atteignable, hors du joueur: O(1) avec l'index."""
+        player = ((self.px, self.py),)
+        cells = self.free_cells
+        if cells is None:
+            pos = random_free_bit_cell(self.grid, player, self.rng)
+        else:
+            if self.coin_pos is not None:
+                cells.add(self.coin_pos)
+            pos = cells.pick(self.rng, player)
+            if pos is not None:
+                cells.discard(pos)
+        self.coin_pos = pos
+        self.grid.set_coin(pos)
+
+    def step(self, now, action=None):
+        """
+        Un tick de simulation à l'instant `now`: déplacement, phases, collision.
+        Appeler move(a) juste avant step(now) équivaut à step(now, a).
+        Retourne False quand le joueur est touché (partie terminée).
+        """
+        if not self.alive:
+            return False
+        self.move(action)
+        self.now = now
+        self._update_phase(now)
+        if self.phase == 'damage' and self.is_hit():
+            self.alive = False
+        return self.alive
+
+    def is_hit(self):
+        """Le joueur est-il sur une case 'X' ? Un seul test sur le plan des dégâts."""
+        if self.timeline is None:
+            return False
+        damage = self.timeline.advance(self.phase_elapsed)
+        return self.grid.covers(damage, self.px, self.py)
+
+    # ----- rendering data -----
+    def update_layers(self):
+        """
+        Met à jour les plans warning/damage de self.grid pour la frame courante,
+        en n'appliquant que les niveaux de vague franchis depuis la frame précédente.
+        Retourne la visibilité de chaque attaque (bandeau multi de draw_game).
+        """
+        t = self.phase_elapsed
+        warning = damage = self.grid.empty
+        visible = []
+        if self.phase == 'warning' and self.timeline:
+            warning = self.timeline.advance(t)
+            visible = self.timeline.visible_attacks('warning', t)
+        elif self.phase == 'damage' and self.timeline:
+            damage = self.timeline.advance(t)
+            warning = self.timeline.full   # set_layers en retire les X
+            visible = self.timeline.visible_attacks('damage', t)
+        elif self.phase == 'idle' and self.fade_timeline:
+            fade_elapsed = self.now - self.fade_start
+            damage = self.fade_timeline.remaining(fade_elapsed)
+            visible = self.fade_timeline.visible_attacks('idle', fade_elapsed)
+        self.grid.set_layers(warning, damage)
+        return visible
+
+    @property
+    def multi_prob(self):
+        return extra_attack_probability(self.wave_count)
+
+# ======================
+#   HEADLESS SIMULATION
+# ======================
+def idle_policy(engine):
+    """Politique d'entrée: ne bouge jamais."""
+    return None
+
+def make_random_policy(rng, move_chance=0.5):
+    """Politique d'entrée: marche aléatoire (un pas au plus par tick)."""
+    actions = tuple(MOVES)
+
+    def policy(engine):
+        if rng.random() < move_chance:
+            return rng.choice(actions)
+        return None
+    return policy
+
+def simulate_run(walls, start, grid_w, grid_h, attack_patterns, seed,
+                 policy=idle_policy, tick=None, max_time=600.0, attack_table=None, free_cells=None):
+    """
+    Joue une partie complète sur une horloge virtuelle (pas de sleep, pas de rendu).
+    Passer `attack_table` (build_attack_table) et `free_cells` (FreeCellIndex)
+    évite de les reconstruire à chaque partie.
+    Retourne le moteur dans son état final.
+    """
+    tick = cfg.TICK if tick is None else tick
+    engine = Engine(walls, start, grid_w, grid_h, attack_patterns,
+                    seed=seed, attack_table=attack_table, free_cells=free_cells)
+    n = 0
+    step = engine.step
+    while True:
+        now = n * tick
+        if now > max_time:
+            break
+        if not step(now, policy(engine)):
+            break
+        n += 1
+    return engine
@@ -0,0 +1,102 @@
+import time
+
+# =========================================
+#  Fixed-timestep scheduler (monotonic clock)
+# =========================================
+# The simulation advances in fixed steps of `step` seconds. Each loop
+# iteration asks how many steps are due (catching up after a slow frame,
+# up to `max_catchup`), runs them, renders, then sleeps only for the time
+# left until the next deadline. Simulation time is ticks * step, so phase
+# durations and the recorded time do not depend on render cost or on
+# wall-clock jumps.
+
+class FixedStepLoop:
+    def __init__(self, step, max_catchup=5, clock=time.perf_counter, sleep=time.sleep):
+        self.step = step
+        self.max_catchup = max(1, max_catchup)
+        self.clock = clock
+        self.sleep = sleep
+
+        self.ticks = 0           # pas de simulation exécutés
+        self.dropped = 0         # pas abandonnés (retard > max_catchup)
+        self.last_late = 0.0     # retard (s) du premier pas dû lors du dernier due()
+        self.next_deadline = None
+
+    def start(self):
+        self.next_deadline = self.clock()
+        self.ticks = 0
+        self.dropped = 0
+
+    @property
+    def sim_time(self):
+        """Temps simulé du prochain pas (secondes depuis le début)."""
+        return self.ticks * self.step
+
+    def due(self):
+        """
+        Nombre de pas à exécuter maintenant. Au-delà de max_catchup, le
+        retard est abandonné et l'échéancier recale sur l'horloge.
+        """
+        now = self.clock()
+        if now < self.next_deadline:
+            return 0
+        self.last_late = now - self.next_deadline
+        n = int((now - self.next_deadline) // self.step) + 1
+        if n > self.max_catchup:
+            self.dropped += n - self.max_catchup
+            n = self.max_catchup
+            self.next_deadline = now + self.step
+        else:
+            self.next_deadline += n * self.step
+        return n
+
+    def advance(self):
+        """Marque un pas de simulation comme exécuté."""
+        self.ticks += 1
+
+    def time_left(self):
+        return max(0.0, self.next_deadline - self.clock())
+
+    def wait(self, waiter=None):
+        """
+        Attend la prochaine échéance. `waiter(timeout)` peut remplacer le
+        sleep (par ex. pour se réveiller dès qu'une touche arrive).
+        """
+        left = self.time_left()
+        if waiter is not None:
+            waiter(left)
+        elif left > 0:
+            self.sleep(left)
+
+
+class RateMeter:
+    """
+    Événements par seconde sur des fenêtres de `window` secondes (pas de
+    simulation, frames affichées). Sans événement, le taux retombe vers 0.
+    """
+
+    def __init__(self, window=1.0, clock=time.perf_counter):
+        self.window = window
+        self.clock = clock
+        self._start = None
+        self._count = 0
+        self._rate = 0.0
+
+    def add(self, n=1):
+        now = self.clock()
+        if self._start is None:
+            self._start = now
+        self._count += n
+        elapsed = now - self._start
+        if elapsed >= self.window:
+            self._rate = self._count / elapsed
+            self._start = now
+            self._count = 0
+
+    @property
+    def rate(self):
+        if self._start is not None:
+            idle = self.clock() - self._start
+            if idle >= 2 * self.window:   # plus rien depuis deux fenêtres: le taux courant, bas
+                return self._count / idle
+        return self._rate
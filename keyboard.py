@@ -0,0 +1,254 @@
+import os
+import sys
+import time
+
+# =========================================
+#  Keyboard backends (Windows msvcrt / POSIX termios)
+# =========================================
+# Both backends expose the same small interface:
+#   start() / stop()        enter / leave raw input mode
+#   read_keys()             every pending key, decoded, without blocking
+#   wait(timeout)           block until a key is ready or timeout expires
+#   getkey()                block for one key (menus, "press any key")
+#   wait_async()            coroutine: returns once a key is ready (asyncio loop)
+# Keys are decoded to tokens: KEY_UP/DOWN/LEFT/RIGHT, KEY_ENTER, KEY_ESC,
+# or the lowercase character itself ('w', 'q', ...).
+
+KEY_UP = "up"
+KEY_DOWN = "down"
+KEY_LEFT = "left"
+KEY_RIGHT = "right"
+KEY_ENTER = "enter"
+KEY_ESC = "esc"
+KEY_PGUP = "pgup"
+KEY_PGDN = "pgdn"
+
+# Escape sequences sent by terminals for the arrow keys (CSI and SS3 forms)
+ESCAPE_KEYS = {
+    "\x1b[A": KEY_UP, "\x1b[B": KEY_DOWN, "\x1b[C": KEY_RIGHT, "\x1b[D": KEY_LEFT,
+    "\x1bOA": KEY_UP, "\x1bOB": KEY_DOWN, "\x1bOC": KEY_RIGHT, "\x1bOD": KEY_LEFT,
+    "\x1b[5~": KEY_PGUP, "\x1b[6~": KEY_PGDN,
+}
+
+# Windows getch() prefixes arrows with b'\x00' or b'\xe0'
+WINDOWS_ARROWS = {b'H': KEY_UP, b'P': KEY_DOWN, b'K': KEY_LEFT, b'M': KEY_RIGHT,
+                  b'I': KEY_PGUP, b'Q': KEY_PGDN}
+
+
+def decode_keys(data):
+    """
+    Décode un flux de caractères POSIX en touches.
+    Retourne (touches, reste): `reste` est une séquence d'échappement incomplète.
+    """
+    keys = []
+    i, n = 0, len(data)
+    while i < n:
+        ch = data[i]
+        if ch == "\x1b":
+            if i + 1 >= n:
+                return keys, data[i:]          # ESC seul: peut-être le début d'une séquence
+            if data[i + 1] in "[O":
+                # CSI/SS3: on lit jusqu'à l'octet final; séquences inconnues ignorées
+                j = i + 2
+                while j < n and not ("@" <= data[j] <= "~"):
+                    j += 1
+                if j >= n:
+                    return keys, data[i:]
+                key = ESCAPE_KEYS.get(data[i:j + 1])
+                if key:
+                    keys.append(key)
+                i = j + 1
+                continue
+            keys.append(KEY_ESC)
+            i += 1
+        elif ch in "\r\n":
+            keys.append(KEY_ENTER)
+            i += 1
+        else:
+            keys.append(ch.lower())
+            i += 1
+    return keys, ""
+
+
+class LatencyStats:
+    """Latence entrée -> frame (secondes): nombre, moyenne, max."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        return f"input->frame latency: avg {self.mean * 1000:.1f} ms, max {self.max * 1000:.1f} ms ({self.count} inputs)"
+
+
+class _Keyboard:
+    POLL = 0.002   # sondage de wait_async quand le terminal n'a pas de descripteur à surveiller
+
+    def __init__(self):
+        self.last_input_time = None   # perf_counter() de la dernière lecture non vide
+        self.latency = LatencyStats()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def getkey(self):
+        while True:
+            keys = self.read_keys()
+            if keys:
+                return keys[0]
+            self.wait(None)
+
+    async def wait_async(self):
+        """Attend une touche sans bloquer la boucle asyncio (par défaut: sondage)."""
+        import asyncio   # chargé par la boucle asyncio elle-même: importé à la demande
+        while not self.wait(0):
+            await asyncio.sleep(self.POLL)
+
+    def frame_drawn(self):
+        """À appeler après l'écriture d'une frame: mesure la latence de la dernière entrée."""
+        if self.last_input_time is not None:
+            self.latency.add(time.perf_counter() - self.last_input_time)
+            self.last_input_time = None
+
+
+class WindowsKeyboard(_Keyboard):
+    """msvcrt: la console Windows ne se prête pas à select(), on sonde kbhit()."""
+
+    def __init__(self):
+        super().__init__()
+        import msvcrt
+        self.msvcrt = msvcrt
+
+    def read_keys(self):
+        ms = self.msvcrt
+        keys = []
+        while ms.kbhit():
+            key = ms.getch()
+            if key in (b'\x00', b'\xe0'):
+                k = WINDOWS_ARROWS.get(ms.getch())
+                if k:
+                    keys.append(k)
+            elif key in (b'\r', b'\n'):
+                keys.append(KEY_ENTER)
+            elif key == b'\x1b':
+                keys.append(KEY_ESC)
+            else:
+                keys.append(key.decode("latin-1").lower())
+        if keys:
+            self.last_input_time = time.perf_counter()
+        return keys
+
+    def wait(self, timeout):
+        end = None if timeout is None else time.perf_counter() + timeout
+        while not self.msvcrt.kbhit():
+            if end is not None:
+                left = end - time.perf_counter()
+                if left <= 0:
+                    return False
+                time.sleep(min(self.POLL, left))
+            else:
+                time.sleep(self.POLL)
+        return True
+
+
+class PosixKeyboard(_Keyboard):
+    """termios + select: mode cbreak (Ctrl-C reste actif), lecture non bloquante."""
+    ESC_GRACE = 0.01   # délai pour compléter une séquence d'échappement coupée
+
+    def __init__(self, fd=None):
+        super().__init__()
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self._saved = None
+
+    def start(self):
+        import termios
+        import tty
+        if os.isatty(self.fd) and self._saved is None:
+            self._saved = termios.tcgetattr(self.fd)
+            tty.setcbreak(self.fd)
+
+    def stop(self):
+        import termios
+        if self._saved is not None:
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self._saved)
+            self._saved = None
+
+    def _ready(self, timeout):
+        import select
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(r)
+
+    def _drain(self):
+        chunks = []
+        while self._ready(0):
+            data = os.read(self.fd, 1024)
+            if not data:
+                break
+            chunks.append(data)
+        return b"".join(chunks).decode("utf-8", errors="ignore")
+
+    def read_keys(self):
+        data = self._drain()
+        if not data:
+            return []
+        keys, rest = decode_keys(data)
+        if rest:
+            # Séquence coupée entre deux lectures: on laisse un court délai pour la suite
+            if self._ready(self.ESC_GRACE):
+                more, rest = decode_keys(rest + self._drain())
+                keys.extend(more)
+            if rest == "\x1b":
+                keys.append(KEY_ESC)     # vraie touche Échap
+        if keys:
+            self.last_input_time = time.perf_counter()
+        return keys
+
+    def wait(self, timeout):
+        return self._ready(timeout)
+
+    async def wait_async(self):
+        # le descripteur est surveillé par la boucle (add_reader): aucun sondage
+        import asyncio
+        if self._ready(0):
+            return
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+
+        def on_ready():
+            if not ready.done():
+                ready.set_result(None)
+
+        loop.add_reader(self.fd, on_ready)
+        try:
+            await ready
+        finally:
+            loop.remove_reader(self.fd)
+
+
+def open_keyboard():
+    """Le backend adapté à la plateforme."""
+    if os.name == "nt":
+        return WindowsKeyboard()
+    return PosixKeyboard()
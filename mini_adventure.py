@@ -1,14 +1,31 @@
 import os
 import time
 import random
-import msvcrt
 import sys
-import ctypes
-import csv
-from datetime import datetime
+import queue
+import threading
+from functools import lru_cache
 from shutil import get_terminal_size
 
 import options as cfg
+from analytics import format_fields
+from assets import KIND_MAP, PatternLoader, get_pack
+from autopilot import make_autopilot
+from bitgrid import GridState, cells_to_mask
+from gameloop import FixedStepLoop, RateMeter
+from keyboard import (
+    KEY_UP, KEY_DOWN, KEY_LEFT, KEY_RIGHT, KEY_ENTER, KEY_PGUP, KEY_PGDN, open_keyboard,
+)
+import npbackend
+from profiler import make_profiler
+from render import DiffRenderer, FrameWriter, Viewport
+from replay import OUTCOME_HIT, OUTCOME_QUIT, RunRecorder, prune_replays, replay_path
+from scores import get_store, parse_row, rank_key
+from tilemap import TILEMAP_EXT, TileMap
+from engine import (
+    ACTION_UP, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT, ACTION_QUIT, Engine,
+    load_attack_patterns, merged_cells, daily_seed,
+)
 
 # (These two variables are modular: fallback from options, then fixed by the map)
 GRID_W, GRID_H = cfg.GRID_W, cfg.GRID_H
@@ -18,6 +35,7 @@ GRID_W, GRID_H = cfg.GRID_W, cfg.GRID_H
 # =========================
 def enable_vt_mode():
     if os.name == 'nt':
+        import ctypes
         kernel32 = ctypes.windll.kernel32
         handle = kernel32.GetStdHandle(-11)
         mode = ctypes.c_uint()
@@ -38,7 +56,9 @@ def exit_alt_screen():
 
 
 def clear():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # séquences ANSI plutôt que os.system('clear'): pas de sous-processus
+    sys.stdout.write("\x1b[H\x1b[2J\x1b[3J")
+    sys.stdout.flush()
 
 def header_line(left, right=""):
     try:
@@ -61,45 +81,28 @@ def visible_len(s: str) -> int:
     return len(strip_ansi(s))
 
 def load_high_scores(path):
+    """Toutes les parties du fichier, triées (lecture complète: pour le classement, voir get_store)."""
     rows = []
     if not os.path.exists(path):
         return rows
+    import csv
     try:
-        import csv
         with open(path, "r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for r in reader:
-                try:
-                    rows.append({
-                        "map": r.get("map", "Empty map"),
-                        "score": int(r["score"]),
-                        "time_sec": float(r["time_sec"]),
-                        "datetime": r["datetime"],
-                    })
-                except Exception:
-                    continue
+            for r in csv.DictReader(f):
+                row = parse_row(r)
+                if row is not None:
+                    rows.append(row)
     except Exception:
         return []
-    rows.sort(key=lambda r: (-r["score"], r["time_sec"]))  # global sort
+    rows.sort(key=rank_key)  # global sort
     return rows
 
 def save_high_score(path, map_label, score, time_sec):
-    rows = load_high_scores(path)
-    rows.append({
-        "map": map_label,
-        "score": int(score),
-        "time_sec": float(time_sec),
-        "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    })
-    rows.sort(key=lambda r: (-r["score"], r["time_sec"]))
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    import csv
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["map", "score", "time_sec", "datetime"])
-        writer.writeheader()
-        writer.writerows(rows)
+    """Ajoute la partie en fin de fichier (pas de réécriture) et met à jour l'index top-N."""
+    get_store(path).add(map_label, score, time_sec)
 
-def build_scoreboard_lines(rows, current_map, limit=10):
+def build_scoreboard_lines(rows, current_map, limit=10, stats=None):
+    """Top `limit` de la carte; avec `stats` (MapStats), une ligne de résumé (MENU_STATS) en dessous."""
     lines = []
     display_name = current_map[:-4] if isinstance(current_map, str) and current_map.lower().endswith(".map") else current_map
     header = f"{cfg.COLOR_HUD_LABEL}Top {limit} — {display_name}{cfg.COLOR_RESET}"
@@ -114,6 +117,8 @@ def build_scoreboard_lines(rows, current_map, limit=10):
         t = int(round(r["time_sec"]))
         dt = r["datetime"]
         lines.append(f"{i:>2}) {score:>4} pts — {t:>3}s — {dt}")
+    if stats is not None and stats.count and cfg.MENU_STATS:
+        lines.append(f"\x1b[90m{format_fields(stats, cfg.MENU_STATS)}{cfg.COLOR_RESET}")
     return lines
 
 def pad_visible(s: str, width: int) -> str:
@@ -135,357 +140,251 @@ def side_by_side(left_lines, right_lines, gap=4):
 #        MAP MENU
 # ======================
 def list_maps(folder):
+    """Un seul parcours du dossier (os.scandir: pas de stat() par entrée sur la plupart des systèmes)."""
     try:
-        return sorted([
-            f for f in os.listdir(folder)
-            if os.path.isfile(os.path.join(folder, f)) and (f.lower().endswith(".map") or f.lower().endswith(".txt"))
-        ])
+        with os.scandir(folder) as it:
+            return sorted(
+                e.name for e in it
+                if e.is_file() and e.name.lower().endswith((".map", ".txt", TILEMAP_EXT))
+            )
     except FileNotFoundError:
         return []
 
+def menu_page_size(reserved):
+    """Nombre d'entrées de la liste qui tiennent à l'écran."""
+    try:
+        rows = get_terminal_size().lines
+    except Exception:
+        rows = 24
+    return max(3, min(cfg.MENU_PAGE_SIZE, rows - reserved))
+
 def draw_menu(options, idx, preview_grid=None):
-    clear()
+    """
+    Redessine le menu sur place (curseur en haut, fin de ligne effacée): pas de clear().
+    Retourne la taille de page utilisée.
+    """
+    lines = []
     title_bar = f"{cfg.COLOR_TITLE}{cfg.TITLE_TEXT}{cfg.COLOR_RESET}"
     underline = f"{cfg.COLOR_TITLE_ACCENT}{'═'*len(cfg.TITLE_TEXT)}{cfg.COLOR_RESET}"
-    print(title_bar)
-    print(underline)
-    hint  = f"{cfg.COLOR_HUD_LABEL}↑/↓ or W/S: select  |  Enter: confirm  |  Q: quit{cfg.COLOR_RESET}"
-    print(hint)
-    print()
-    for i, name in enumerate(options):
-        cursor = f"{cfg.COLOR_TITLE_ACCENT}>{cfg.COLOR_RESET}" if i == idx else " "
-        display = name[:-4] if name.lower().endswith(".map") else name
-        print(f"{cursor} {display}")
-
-    print()
+    lines.append(title_bar)
+    lines.append(underline)
+    hint  = f"{cfg.COLOR_HUD_LABEL}↑/↓ or W/S: select  |  ←/→ or PgUp/PgDn: page  |  Enter: confirm  |  Q: quit{cfg.COLOR_RESET}"
+    lines.append(hint)
+    lines.append("")
 
     # Right column: Top 10 highscores (per current map)
     current_map = "Empty map" if idx == 0 else options[idx]
-    highs = load_high_scores(cfg.HIGH_SCORE_FILE)
-    right_col = build_scoreboard_lines(highs, current_map, limit=10)
+    store = get_store(cfg.HIGH_SCORE_FILE)
+    highs = store.top(current_map, 10)
+    right_col = build_scoreboard_lines(highs, current_map, limit=10, stats=store.stats(current_map))
 
     if preview_grid:
         # Render preview + scoreboard side by side
-        combined = side_by_side([f"{cfg.COLOR_HUD_LABEL}Preview:{cfg.COLOR_RESET}"] + preview_grid, right_col, gap=6)
-        for line in combined:
-            print(line)
+        bottom = side_by_side([f"{cfg.COLOR_HUD_LABEL}Preview:{cfg.COLOR_RESET}"] + preview_grid, right_col, gap=6)
     else:
         # Fallback: just print the scoreboard
-        for line in right_col:
-            print(line)
+        bottom = right_col
+
+    # Liste paginée: seule la page de l'entrée courante est dessinée
+    page = menu_page_size(len(lines) + len(bottom) + 3)
+    first = (idx // page) * page
+    for i in range(first, min(len(options), first + page)):
+        name = options[i]
+        cursor = f"{cfg.COLOR_TITLE_ACCENT}>{cfg.COLOR_RESET}" if i == idx else " "
+        display = name[:-4] if name.lower().endswith(".map") else name
+        lines.append(f"{cursor} {display}")
+    for _ in range(first + page - max(first, len(options))):
+        lines.append("")   # garde la hauteur de la page constante
+    pages = (len(options) + page - 1) // page
+    lines.append(f"\x1b[90m({idx + 1}/{len(options)} — page {first // page + 1}/{pages}){cfg.COLOR_RESET}")
+    lines.append("")
+    lines.extend(bottom)
+
+    sys.stdout.write("\x1b[H" + "\x1b[K\n".join(lines) + "\x1b[K\x1b[J")
+    sys.stdout.flush()
+    return page
 
 def read_map_file(path):
+    """
+    Carte ASCII de taille quelconque: une ligne par rangée.
+    La largeur est celle de la plus longue ligne; les lignes plus courtes
+    sont complétées par du sol.
+    Une carte .tmap (tuiles paginées) n'est pas lue: `walls` est alors la
+    TileMap elle-même, interrogée tuile par tuile.
+    """
+    if path.lower().endswith(TILEMAP_EXT):
+        tiles = TileMap(path)
+        return tiles, tiles.start, tiles.w, tiles.h
     with open(path, "r", encoding="utf-8") as f:
-        raw_lines = [line.rstrip("\n") for line in f.readlines()]
-    lines = [ln for ln in raw_lines if ln != ""]
-    if len(lines) != 10 or any(len(ln) != 10 for ln in lines):
-        raise ValueError("The map must have 10 lines of 10 characters.")
+        lines = [ln for ln in f.read().splitlines() if ln != ""]
+    if not lines:
+        raise ValueError("The map is empty.")
+    w, h = max(len(ln) for ln in lines), len(lines)
     walls = set()
     start = None
     for y, row in enumerate(lines):
-        for x, ch in enumerate(row):
-            if ch == '#':
-                walls.add((x, y))
-            elif ch == 'P':
+        x = row.find('#')
+        while x != -1:
+            walls.add((x, y))
+            x = row.find('#', x + 1)
+        if start is None:
+            x = row.find('P')
+            if x != -1:
                 start = (x, y)
-    return walls, start, 10, 10
+    return walls, start, w, h
 
 def build_preview_from_map(walls, start, w, h):
+    """
+    Aperçu du menu. Au-delà de PREVIEW_MAX_W × PREVIEW_MAX_H, la carte est
+    échantillonnée (une case sur n) et sa taille est indiquée sous l'aperçu.
+    """
+    pw, ph = min(w, cfg.PREVIEW_MAX_W), min(h, cfg.PREVIEW_MAX_H)
+    sx = [x * w // pw for x in range(pw)]
+    sy = [y * h // ph for y in range(ph)]
+    if start is not None:
+        start = (start[0] * pw // w, start[1] * ph // h)
     grid = []
-    for y in range(h):
+    for j, y in enumerate(sy):
         row = []
-        for x in range(w):
-            if start == (x, y):
+        for i, x in enumerate(sx):
+            if start == (i, j):
                 row.append(f"{cfg.COLOR_PLAYER}{cfg.PLAYER_CHAR}{cfg.COLOR_RESET}")
             elif (x, y) in walls:
                 row.append(f"{cfg.COLOR_WALL}{cfg.WALL_CHAR}{cfg.COLOR_RESET}")
             else:
                 row.append(".")
         grid.append(" ".join(row))
+    if (pw, ph) != (w, h):
+        grid.append(f"\x1b[90m({w}×{h}, scaled){cfg.COLOR_RESET}")
     return grid
 
-def select_map():
-    maps = list_maps(cfg.MAPS_DIR)
-    options = ["(Empty default map)"] + maps
-    idx = 0
+EMPTY_PREVIEW = [" ".join("." for _ in range(10)) for _ in range(10)]
 
-    def preview(i):
-        if i == 0:
-            return [" ".join("." for _ in range(10)) for _ in range(10)]
-        else:
-            fname = maps[i - 1]
-            try:
-                walls, start, w, h = read_map_file(os.path.join(cfg.MAPS_DIR, fname))
-                return build_preview_from_map(walls, start, w, h)
-            except Exception as e:
-                return [f"Read error: {e}"]
+def read_map_compiled(path):
+    """read_map_file via le pack d'assets (carte ASCII déjà parsée si le fichier n'a pas changé)."""
+    if not cfg.ASSET_CACHE or path.lower().endswith(TILEMAP_EXT):
+        return read_map_file(path)
+    return get_pack().get(KIND_MAP, path, read_map_file)
 
-    prev = preview(idx)
+@lru_cache(maxsize=cfg.MAP_CACHE_SIZE)
+def _load_map_cached(path, mtime_ns):
+    walls, start, w, h = read_map_compiled(path)
+    return walls, start, w, h, build_preview_from_map(walls, start, w, h)
 
-    while True:
-        draw_menu(options, idx, prev)
-        key = msvcrt.getch()
-        if key in (b'\x00', b'\xe0'):
-            k = msvcrt.getch()
-            if k == b'H':
-                idx = (idx - 1) % len(options); prev = preview(idx)
-            elif k == b'P':
-                idx = (idx + 1) % len(options); prev = preview(idx)
-        else:
-            ch = key.lower()
-            if ch == b'q':
-                clear(); print("Goodbye!"); sys.exit(0)
-            elif ch == b'w':
-                idx = (idx - 1) % len(options); prev = preview(idx)
-            elif ch == b's':
-                idx = (idx + 1) % len(options); prev = preview(idx)
-            elif ch in (b'\r', b'\n'):
-                if idx == 0:
-                    return set(), None, 10, 10, "Empty map"
-                fname = maps[idx - 1]
-                walls, start, w, h = read_map_file(os.path.join(cfg.MAPS_DIR, fname))
-                return walls, start, w, h, fname
+def load_map_entry(path):
+    """Carte + aperçu depuis le cache LRU (clé: chemin + mtime, donc relu si le fichier change)."""
+    return _load_map_cached(path, os.stat(path).st_mtime_ns)
 
-# ======================
-#     PATTERNS (attacks/)
-# ======================
-def list_attack_files(folder):
-    try:
-        return sorted([
-            f for f in os.listdir(folder)
-            if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith((".txt", ".pat"))
-        ])
-    except FileNotFoundError:
-        return []
+class MapPreloader:
+    """Thread de fond qui parse à l'avance les cartes voisines de la sélection."""
 
-def load_free_shape(path):
-    """
-    Lit un pattern ASCII libre. Tout caractère non-espace active une cellule.
-    Les chiffres '1'..'9' indiquent la vague (1 = immédiat, 9 = +8*WAVE_STAGGER).
-    Tout autre caractère => vague 1.
-    Retourne: {"cells": [(x,y,wave), ...], "w": w, "h": h}
-    """
-    with open(path, "r", encoding="utf-8") as f:
-        raw = [ln.rstrip("\n") for ln in f.readlines()]
-    # trim empty lines top/bottom
-    while raw and raw[0].strip() == "":
-        raw.pop(0)
-    while raw and raw[-1].strip() == "":
-        raw.pop()
-    if not raw:
-        return None
-
-    # crop horizontal bounds
-    min_c = None; max_c = None
-    for ln in raw:
-        if ln.strip() == "":
-            continue
-        for i, ch in enumerate(ln):
-            if ch != " ":
-                min_c = i if min_c is None else min(min_c, i)
-                max_c = i if max_c is None else max(max_c, i)
-    if min_c is None:
-        return None
-
-    cropped = [ln[min_c:max_c+1] for ln in raw]
-    h = len(cropped)
-    w = max(len(ln) for ln in cropped) if h > 0 else 0
-    cropped = [ln.ljust(w, " ") for ln in cropped]
-
-    cells = []
-    for y, ln in enumerate(cropped):
-        for x, ch in enumerate(ln):
-            if ch == " ":
-                continue
-            if ch in "123456789":
-                wave = int(ch)
-            else:
-                wave = 1
-            cells.append((x, y, wave))
-    return {"cells": cells, "w": w, "h": h}
-
-def load_attack_patterns(folder):
-    patterns = []
-    for fname in list_attack_files(folder):
-        path = os.path.join(folder, fname)
-        try:
-            shp = load_free_shape(path)
-            if shp and shp["cells"]:
-                patterns.append(shp)
-        except Exception:
-            pass
-    return patterns
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
 
-def rotate_cells(cells, w, h, k):
-    """
-    Rotation 0/90/180/270° des cellules (x,y,wave).
-    Retourne (new_cells, new_w, new_h)
-    """
-    k = k % 4
-    if k == 0:
-        return list(cells), w, h
-    out = []
-    if k == 1:
-        for (x, y, wave) in cells:
-            out.append((h - 1 - y, x, wave))
-        return out, h, w
-    if k == 2:
-        for (x, y, wave) in cells:
-            out.append((w - 1 - x, h - 1 - y, wave))
-        return out, w, h
-    # k == 3
-    for (x, y, wave) in cells:
-        out.append((y, w - 1 - x, wave))
-    return out, h, w
-
-def mirror_cells(cells, w, h, mirror_h=False, mirror_v=False):
-    """
-    Retourne la forme horizontalement et/ou verticalement.
-    cells: [(x, y, wave)]
-    Retourne (new_cells, w, h)
-    """
-    if not mirror_h and not mirror_v:
-        return list(cells), w, h
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                load_map_entry(path)
+            except Exception:
+                pass
 
-    out = []
-    for (x, y, wave) in cells:
-        nx = (w - 1 - x) if mirror_h else x
-        ny = (h - 1 - y) if mirror_v else y
-        out.append((nx, ny, wave))
-    return out, w, h
+    def request(self, paths):
+        for p in paths:
+            self._queue.put(p)
 
+def select_map(kb):
+    maps = list_maps(cfg.MAPS_DIR)
+    if cfg.ASSET_CACHE:
+        get_pack().prune(KIND_MAP, cfg.MAPS_DIR, [os.path.join(cfg.MAPS_DIR, m) for m in maps])
+    options = ["(Empty default map)"] + maps
+    idx = 0
+    preloader = MapPreloader()
 
-def place_shape_in_grid(cells, w, h):
-    """
-    Place aléatoirement la forme dans la grille.
-    Retourne: dict[(gx,gy)] = wave
-    """
-    if w > GRID_W or h > GRID_H:
-        return None
-    ox = random.randint(0, GRID_W - w)
-    oy = random.randint(0, GRID_H - h)
-    placed = {}
-    for (x, y, wave) in cells:
-        placed[(ox + x, oy + y)] = wave
-    return placed
-
-def choose_attack(patterns):
-    """Choisit un pattern, applique une rotation et un miroir aléatoires, puis le place dans la grille."""
-    if not patterns:
-        return {}
-    for _ in range(40):
-        shp = random.choice(patterns)
-
-        # Rotation aléatoire (0, 90, 180, 270°)
-        k = random.randint(0, 3)
-        rot_cells, rw, rh = rotate_cells(shp["cells"], shp["w"], shp["h"], k)
-
-        # Miroir aléatoire
-        mirror_h = random.choice([False, True])
-        mirror_v = random.choice([False, True])
-        mirrored_cells, mw, mh = mirror_cells(rot_cells, rw, rh, mirror_h, mirror_v)
-
-        # Placement aléatoire
-        placed = place_shape_in_grid(mirrored_cells, mw, mh)
-        if placed is not None:
-            return placed  # dict[(x,y)] = wave
-    return {}
-
-
-def merged_cells(attacks):
-    """
-    attacks: list[dict[(x,y)->'!' or 'X']]
-    Fusionne en donnant la priorité au 'X'.
-    """
-    merged = {}
-    for atk in attacks:
-        for pos, ch in atk.items():
-            if ch == cfg.ATTACK_DAMAGE_CHAR:
-                merged[pos] = cfg.ATTACK_DAMAGE_CHAR
-            else:
-                if pos not in merged:
-                    merged[pos] = cfg.ATTACK_WARNING_CHAR
-    return merged
+    def path_of(i):
+        return os.path.join(cfg.MAPS_DIR, maps[i - 1])
 
-# ======================
-#      WAVE RENDERING
-# ======================
-def attacks_wave_render(current_attacks, phase, phase_elapsed,
-                        fade_attacks=None, fade_elapsed=0.0):
-    """
-    Convertit des attaques stockées comme dict pos->wave (1..9)
-    en couches dict pos->'!'/'X' selon la phase, avec un délai
-    de cfg.WAVE_STAGGER entre vagues successives.
+    def preview(i):
+        if i == 0:
+            return EMPTY_PREVIEW
+        try:
+            return load_map_entry(path_of(i))[4]
+        except Exception as e:
+            return [f"Read error: {e}"]
+
+    def move_to(i):
+        nonlocal idx, prev
+        idx = i % len(options)
+        prev = preview(idx)
+        n = cfg.MENU_PRELOAD
+        preloader.request(path_of(j % len(options)) for j in range(idx - n, idx + n + 1)
+                          if j % len(options) != 0 and j != idx)
+
+    prev = None
+    move_to(0)
+    clear()
 
-    current_attacks: list[dict[(x,y)->wave]]
-    fade_attacks:    list[dict[(x,y)->wave]] (résidus à faire disparaître pendant idle)
-    Retourne list[dict[(x,y)->'!'/'X']]
-    """
-    to_draw = []
-
-    def draw_warning(atk):
-        d = {}
-        for pos, wave in atk.items():
-            if phase_elapsed >= (wave - 1) * cfg.WAVE_STAGGER:
-                d[pos] = cfg.ATTACK_WARNING_CHAR
-        return d
-
-    def draw_damage(atk):
-        d = {}
-        for pos, wave in atk.items():
-            if phase_elapsed >= (wave - 1) * cfg.WAVE_STAGGER:
-                d[pos] = cfg.ATTACK_DAMAGE_CHAR
-            else:
-                d[pos] = cfg.ATTACK_WARNING_CHAR
-        return d
-
-    def draw_fade(atk):
-        # Pendant l'idle, on efface progressivement: la cellule reste affichée
-        # tant que fade_elapsed < (wave-1)*stagger. Au-delà, elle disparaît.
-        d = {}
-        for pos, wave in atk.items():
-            if fade_elapsed < (wave - 1) * cfg.WAVE_STAGGER:
-                d[pos] = cfg.ATTACK_DAMAGE_CHAR
-        return d
-
-    if phase == 'warning':
-        for atk in current_attacks:
-            to_draw.append(draw_warning(atk))
-    elif phase == 'damage':
-        for atk in current_attacks:
-            to_draw.append(draw_damage(atk))
-    elif phase == 'idle' and fade_attacks:
-        for atk in fade_attacks:
-            to_draw.append(draw_fade(atk))
-
-    return to_draw
+    while True:
+        page = draw_menu(options, idx, prev)
+        key = kb.getkey()
+        if key in (KEY_UP, 'w'):
+            move_to(idx - 1)
+        elif key in (KEY_DOWN, 's'):
+            move_to(idx + 1)
+        elif key in (KEY_PGUP, KEY_LEFT, 'a'):
+            move_to(max(0, idx - page))
+        elif key in (KEY_PGDN, KEY_RIGHT, 'd'):
+            move_to(min(len(options) - 1, idx + page))
+        elif key == 'q':
+            quit_game()
+        elif key == KEY_ENTER:
+            if idx == 0:
+                return set(), None, 10, 10, "Empty map"
+            fname = maps[idx - 1]
+            walls, start, w, h, _ = load_map_entry(path_of(idx))
+            return walls, start, w, h, fname
 
 # ======================
 #           GAME
 # ======================
 def fmt_sec(s): return f"{s:.1f}s"
 
-def draw_game(px, py, attacks, score, elapsed, coin_pos, walls,
-              idle_dur, warning_dur, damage_dur, multi_prob, multi_active):
-    # clear()  # ENLEVER ceci
-
-    lines = []
-
+# Glyphes pré-colorés (construits une fois, pas à chaque frame)
+CELL_EMPTY   = "."
+CELL_WALL    = f"{cfg.COLOR_WALL}{cfg.WALL_CHAR}{cfg.COLOR_RESET}"
+CELL_BORDER  = f"{cfg.COLOR_WALL}{cfg.BORDER_CHAR}{cfg.COLOR_RESET}"
+CELL_PLAYER  = f"{cfg.COLOR_PLAYER}{cfg.PLAYER_CHAR}{cfg.COLOR_RESET}"
+CELL_COIN    = f"{cfg.COLOR_COIN}{cfg.COIN_CHAR}{cfg.COLOR_RESET}"
+CELL_WARNING = f"{cfg.COLOR_WARNING}{cfg.ATTACK_WARNING_CHAR}{cfg.COLOR_RESET}"
+CELL_DAMAGE  = f"{cfg.COLOR_DAMAGE}{cfg.ATTACK_DAMAGE_CHAR}{cfg.COLOR_RESET}"
+CELL_VIEW_EDGE = f"{cfg.COLOR_VIEW_EDGE}{cfg.VIEW_EDGE_CHAR}{cfg.COLOR_RESET}"
+# Attaque sur le joueur / sur la pièce: le symbole d'attaque prend leur couleur
+PLAYER_WARNING = f"{cfg.COLOR_PLAYER}{cfg.ATTACK_WARNING_CHAR}{cfg.COLOR_RESET}"
+PLAYER_DAMAGE  = f"{cfg.COLOR_PLAYER}{cfg.ATTACK_DAMAGE_CHAR}{cfg.COLOR_RESET}"
+COIN_WARNING   = f"{cfg.COLOR_COIN}{cfg.ATTACK_WARNING_CHAR}{cfg.COLOR_RESET}"
+COIN_DAMAGE    = f"{cfg.COLOR_COIN}{cfg.ATTACK_DAMAGE_CHAR}{cfg.COLOR_RESET}"
+# Table du backend NumPy, indexée par npbackend.CODE_*
+NP_GLYPHS = (CELL_EMPTY, CELL_WALL, CELL_WARNING, CELL_DAMAGE, CELL_COIN, COIN_WARNING, COIN_DAMAGE)
+PLAYER_OVER = {CELL_WARNING: PLAYER_WARNING, COIN_WARNING: PLAYER_WARNING,
+               CELL_DAMAGE: PLAYER_DAMAGE, COIN_DAMAGE: PLAYER_DAMAGE}
+
+_renderer = DiffRenderer(field_col_gap=cfg.SIDE_GAP_SPACES)
+_viewport = Viewport(cfg.VIEW_MARGIN)
+# Largeur réservée aux champs latéraux ("Score: 123456"): fixe, pour que la vue ne bouge pas avec le score
+SIDE_FIELD_COLS = max(len(cfg.SCORE_LABEL), len(cfg.TIME_LABEL)) + 9
+
+def build_hud_lines(attacks, idle_dur, warning_dur, damage_dur, multi_prob, rates=None):
     title_bar = f"{cfg.COLOR_TITLE}{cfg.TITLE_TEXT}{cfg.COLOR_RESET}"
     underline = f"{cfg.COLOR_TITLE_ACCENT}{'═'*len(cfg.TITLE_TEXT)}{cfg.COLOR_RESET}"
     hint = f"{cfg.COLOR_HUD_LABEL}{cfg.CONTROL_HINT}{cfg.COLOR_RESET}"
 
-    # On remplit la liste 'lines' au lieu de print()
-    lines.append(title_bar)
-    lines.append(underline)
-    lines.append(hint)
-
     speed = (f"{cfg.COLOR_HUD_LABEL}{cfg.SPEED_LABEL}:{cfg.COLOR_RESET} "
              f"idle {cfg.COLOR_HUD_VALUE}{fmt_sec(idle_dur)}{cfg.COLOR_RESET} • "
              f"warning {cfg.COLOR_HUD_VALUE}{fmt_sec(warning_dur)}{cfg.COLOR_RESET} • "
              f"damage {cfg.COLOR_HUD_VALUE}{fmt_sec(damage_dur)}{cfg.COLOR_RESET}")
     prob  = f"{cfg.COLOR_HUD_LABEL}{cfg.MULTI_LABEL}:{cfg.COLOR_RESET} {cfg.COLOR_HUD_VALUE}{int(multi_prob*100)}%{cfg.COLOR_RESET}"
-    lines.append(header_line(speed, prob))
 
     # ===== Bandeau d’état de l’attaque =====
     # Calcule sur la frame courante : nb d'attaques non vides dans `attacks`
@@ -498,291 +397,612 @@ def draw_game(px, py, attacks, score, elapsed, coin_pos, walls,
         dim = "\x1b[90m"  # gris (ANSI)
         normal_text = getattr(cfg, "NORMAL_BANNER_TEXT", "----------")
         banner = f"{dim}{normal_text}{cfg.COLOR_RESET}"
-    lines.append(banner)
-    # =======================================
-
-    view_w = GRID_W + (2 if cfg.BORDER_ENABLED else 0)
-    view_h = GRID_H + (2 if cfg.BORDER_ENABLED else 0)
-    layer = merged_cells(attacks)
-
-    side_gap = cfg.SIDE_GAP_SPACES
-    side_row_score = (1 if cfg.BORDER_ENABLED else 0) + cfg.SIDE_ROW_SCORE_INDEX
-    side_row_time  = (1 if cfg.BORDER_ENABLED else 0) + cfg.SIDE_ROW_TIME_INDEX
+    if rates:
+        # cadence de simulation et fps réellement affichées (SHOW_RATES)
+        banner += f"   \x1b[90m{rates}{cfg.COLOR_RESET}"
 
-    for ry in range(view_h):
-        row_cells = []
+    return [title_bar, underline, hint, header_line(speed, prob), banner]
 
-        if cfg.BORDER_ENABLED and (ry == 0 or ry == view_h - 1):
-            row_cells = [f"{cfg.COLOR_WALL}{cfg.BORDER_CHAR}{cfg.COLOR_RESET}"] * view_w
-            row_text = " ".join(row_cells)
-        else:
-            y = ry - (1 if cfg.BORDER_ENABLED else 0)
-            for rx in range(view_w):
-                if cfg.BORDER_ENABLED and (rx == 0 or rx == view_h - 1):
-                    row_cells.append(f"{cfg.COLOR_WALL}{cfg.BORDER_CHAR}{cfg.COLOR_RESET}")
+def build_grid_cells(px, py, grid, view=None):
+    """
+    Une liste de lignes de glyphes (bordure incluse) pour le renderer, lue depuis les plans de bits.
+    `view` = (x0, y0, w, h): seule cette fenêtre de la carte est construite (toute la carte par défaut).
+    Un bord de fenêtre au-delà duquel la carte continue est dessiné avec VIEW_EDGE_CHAR.
+    Les grandes fenêtres passent par le backend NumPy s'il est disponible (mêmes glyphes).
+    """
+    border = cfg.BORDER_ENABLED
+    off = 1 if border else 0
+    x0, y0, w, h = view if view is not None else (0, 0, grid.w, grid.h)
+    if npbackend.enabled(w * h):
+        rows = npbackend.glyph_rows(grid, (x0, y0, w, h), NP_GLYPHS)
+        if 0 <= px - x0 < w and 0 <= py - y0 < h:
+            row = rows[py - y0]
+            cell = row[px - x0]
+            if cell != CELL_WALL:
+                row[px - x0] = PLAYER_OVER.get(cell, CELL_PLAYER)
+    else:
+        rows = _grid_rows(px, py, grid, x0, y0, w, h)
+    if border:
+        left = CELL_BORDER if x0 == 0 else CELL_VIEW_EDGE
+        right = CELL_BORDER if x0 + w == grid.w else CELL_VIEW_EDGE
+        for row in rows:
+            row.insert(0, left)
+            row.append(right)
+        top = CELL_BORDER if y0 == 0 else CELL_VIEW_EDGE
+        bottom = CELL_BORDER if y0 + h == grid.h else CELL_VIEW_EDGE
+        rows.insert(0, [CELL_BORDER] + [top] * w + [CELL_BORDER])
+        rows.append([CELL_BORDER] + [bottom] * w + [CELL_BORDER])
+    return rows, off
+
+def _grid_rows(px, py, grid, x0, y0, w, h):
+    """Chemin pur Python de build_grid_cells: une cellule à la fois, sans bordure."""
+    wall_rows = grid.window_walls(x0, y0, w, h)
+    warn_rows = grid.window_bits(grid.warning, x0, y0, w, h)
+    dmg_rows = grid.window_bits(grid.damage, x0, y0, w, h)
+    coin_rows = grid.window_bits(grid.coin, x0, y0, w, h)
+    rows = []
+    for r in range(h):
+        wall_bits, warn_bits, dmg_bits, coin_bits = wall_rows[r], warn_rows[r], dmg_rows[r], coin_rows[r]
+        player_i = px - x0 if py - y0 == r else -1
+        row = []
+        for i in range(w):
+            if wall_bits[i] == "1":
+                row.append(CELL_WALL)
+            elif dmg_bits[i] == "1":
+                if i == player_i:
+                    row.append(PLAYER_DAMAGE)
+                elif coin_bits[i] == "1":
+                    row.append(COIN_DAMAGE)
                 else:
-                    x = rx - (1 if cfg.BORDER_ENABLED else 0)
-                    here = (x, y)
-
-                    if here in walls:
-                        row_cells.append(f"{cfg.COLOR_WALL}{cfg.WALL_CHAR}{cfg.COLOR_RESET}")
-                        continue
-
-                    in_attack = here in layer
-                    if in_attack:
-                        ch = layer[here]
-                        if here == (px, py):
-                            row_cells.append(f"{cfg.COLOR_PLAYER}{ch}{cfg.COLOR_RESET}")
-                        elif here == coin_pos:
-                            row_cells.append(f"{cfg.COLOR_COIN}{ch}{cfg.COLOR_RESET}")
-                        else:
-                            row_cells.append(
-                                f"{cfg.COLOR_WARNING}{cfg.ATTACK_WARNING_CHAR}{cfg.COLOR_RESET}"
-                                if ch == cfg.ATTACK_WARNING_CHAR else
-                                f"{cfg.COLOR_DAMAGE}{cfg.ATTACK_DAMAGE_CHAR}{cfg.COLOR_RESET}"
-                            )
-                    else:
-                        if here == (px, py):
-                            row_cells.append(f"{cfg.COLOR_PLAYER}{cfg.PLAYER_CHAR}{cfg.COLOR_RESET}")
-                        elif here == coin_pos:
-                            row_cells.append(f"{cfg.COLOR_COIN}{cfg.COIN_CHAR}{cfg.COLOR_RESET}")
-                        else:
-                            row_cells.append(".")
-
-            row_text = " ".join(row_cells)
-
-        if ry == side_row_score:
-            row_text += " " * side_gap + f"{cfg.COLOR_HUD_VALUE}{cfg.SCORE_LABEL}:{cfg.COLOR_RESET} {cfg.COLOR_COIN}{score}{cfg.COLOR_RESET}"
-        elif ry == side_row_time:
-            row_text += " " * side_gap + f"{cfg.COLOR_HUD_VALUE}{cfg.TIME_LABEL}:{cfg.COLOR_RESET} {int(elapsed)}s"
-
-        lines.append(row_text)
-
-    lines.append("")  # print() final blank line
-
-    # ==== ÉCRITURE ATOMIQUE DE LA FRAME ====
-    frame = "\n".join(lines)
-
-    # Curseur en haut puis écrire la frame, puis nettoyer le reste de l'écran
-    sys.stdout.write("\x1b[H")
-    sys.stdout.write(frame)
-    sys.stdout.write("\x1b[J")
-    sys.stdout.flush()
-
-
-def handle_input(px, py, walls):
-    if msvcrt.kbhit():
-        key = msvcrt.getch()
-        nx, ny = px, py
-        if key in (b'\x00', b'\xe0'):
-            k = msvcrt.getch()
-            if   k == b'H': ny = max(0, py - 1)
-            elif k == b'P': ny = min(GRID_H - 1, py + 1)
-            elif k == b'K': nx = max(0, px - 1)
-            elif k == b'M': nx = min(GRID_W - 1, px + 1)
-        else:
-            ch = key.lower()
-            if ch == b'q':
-                clear(); print("Goodbye!"); sys.exit(0)
-            elif ch == b'w': ny = max(0, py - 1)
-            elif ch == b's': ny = min(GRID_H - 1, py + 1)
-            elif ch == b'a': nx = max(0, px - 1)
-            elif ch == b'd': nx = min(GRID_W - 1, px + 1)
-        if (nx, ny) not in walls:
-            px, py = nx, ny
-    return px, py
-
-def random_free_cell(exclude, walls):
-    while True:
-        pos = (random.randint(0, GRID_W - 1), random.randint(0, GRID_H - 1))
-        if pos not in exclude and pos not in walls:
-            return pos
+                    row.append(CELL_DAMAGE)
+            elif warn_bits[i] == "1":
+                if i == player_i:
+                    row.append(PLAYER_WARNING)
+                elif coin_bits[i] == "1":
+                    row.append(COIN_WARNING)
+                else:
+                    row.append(CELL_WARNING)
+            elif i == player_i:
+                row.append(CELL_PLAYER)
+            elif coin_bits[i] == "1":
+                row.append(CELL_COIN)
+            else:
+                row.append(CELL_EMPTY)
+        rows.append(row)
+    return rows
 
-def timings_for_attack_count(attack_count):
-    steps = attack_count // cfg.ATTACKS_PER_STEP
-    idle = max(cfg.MIN_IDLE, cfg.BASE_IDLE - cfg.STEP_DELTA * steps)
-    warning = max(cfg.MIN_WARNING, cfg.BASE_WARNING - cfg.STEP_DELTA * steps)
-    return idle, warning, cfg.DAMAGE_DUR
+def viewport_size(hud_rows, side_cols, size=None):
+    """
+    Cases visibles (largeur, hauteur) pour la taille du terminal (`size` =
+    (colonnes, lignes), celui du processus par défaut): place laissée par le
+    HUD au-dessus et les champs latéraux à droite.
+    """
+    if size is None:
+        try:
+            size = get_terminal_size()
+        except Exception:
+            size = (80, 24)
+    cols, lines = size
+    border = 2 if cfg.BORDER_ENABLED else 0
+    view_w = (cols - side_cols - cfg.SIDE_GAP_SPACES + 1) // 2 - border
+    view_h = lines - hud_rows - border - 1   # dernière ligne: curseur
+    min_h = max(cfg.VIEW_MIN_H, cfg.SIDE_ROW_TIME_INDEX + 1, cfg.SIDE_ROW_SCORE_INDEX + 1)
+    return max(cfg.VIEW_MIN_W, view_w), max(min_h, view_h)
+
+def grid_from_layers(attacks, coin_pos, walls):
+    """GridState construit depuis des couches dict pos->'!'/'X' (appelants historiques)."""
+    grid = GridState(GRID_W, GRID_H, walls)
+    layer = merged_cells(attacks)
+    warning = cells_to_mask((p for p, ch in layer.items() if ch == cfg.ATTACK_WARNING_CHAR), GRID_W)
+    damage = cells_to_mask((p for p, ch in layer.items() if ch == cfg.ATTACK_DAMAGE_CHAR), GRID_W)
+    grid.set_layers(warning, damage)
+    grid.set_coin(coin_pos)
+    return grid
 
-def extra_attack_probability(attack_count):
-    steps = attack_count // cfg.EXTRA_ATTACK_STEP
-    return min(cfg.EXTRA_ATTACK_MAX, steps * cfg.EXTRA_ATTACK_GROWTH)
+def draw_game(px, py, attacks, score, elapsed, coin_pos, walls,
+              idle_dur, warning_dur, damage_dur, multi_prob, multi_active,
+              renderer=None, grid=None, overlay=None, viewport=None, rates=None):
+    """
+    Construit la frame (HUD + grille + champs latéraux) et la confie au
+    renderer différentiel, qui n'envoie que ce qui a changé.
+    `grid` (GridState) fournit murs/attaques/pièce en bitboard; sans lui,
+    `attacks` est une liste de couches dict pos->'!'/'X'.
+    `overlay`: ligne optionnelle sous le bandeau (profileur).
+    `viewport` (Viewport): seule la fenêtre autour du joueur qui tient dans
+    le terminal est dessinée; les champs latéraux suivent les rangées visibles.
+    `renderer` peut aussi être un FrameWriter (écriture dans un thread).
+    `rates`: texte optionnel ajouté au bandeau (cadence simulation / affichage).
+    Retourne le nombre d'octets écrits (0 si l'écriture est confiée à un thread).
+    """
+    renderer = renderer if renderer is not None else _renderer
+    viewport = viewport if viewport is not None else _viewport
+    if grid is None:
+        grid = grid_from_layers(attacks, coin_pos, walls)
+    lines = build_hud_lines(attacks, idle_dur, warning_dur, damage_dur, multi_prob, rates)
+    if overlay is not None:
+        lines.append(overlay)
+
+    fields = {
+        cfg.SIDE_ROW_SCORE_INDEX:
+            f"{cfg.COLOR_HUD_VALUE}{cfg.SCORE_LABEL}:{cfg.COLOR_RESET} {cfg.COLOR_COIN}{score}{cfg.COLOR_RESET}",
+        cfg.SIDE_ROW_TIME_INDEX:
+            f"{cfg.COLOR_HUD_VALUE}{cfg.TIME_LABEL}:{cfg.COLOR_RESET} {int(elapsed)}s",
+    }
+    view_w, view_h = viewport_size(len(lines), SIDE_FIELD_COLS, renderer.terminal_size())
+    view = viewport.follow(px, py, grid.w, grid.h, view_w, view_h)
+    rows, off = build_grid_cells(px, py, grid, view)
+    fields = {off + row: text for row, text in fields.items()}
+    return renderer.render(lines, rows, fields)
+
+
+# Touches -> actions du moteur
+KEY_ACTIONS = {
+    KEY_UP: ACTION_UP, 'w': ACTION_UP,
+    KEY_DOWN: ACTION_DOWN, 's': ACTION_DOWN,
+    KEY_LEFT: ACTION_LEFT, 'a': ACTION_LEFT,
+    KEY_RIGHT: ACTION_RIGHT, 'd': ACTION_RIGHT,
+    'q': ACTION_QUIT,
+}
+
+def keys_to_action(keys):
+    """
+    Fusionne toutes les touches lues pendant un tick en une action:
+    la dernière direction l'emporte (pas de file d'attente qui traîne), Q quitte.
+    """
+    action = None
+    for k in keys:
+        a = KEY_ACTIONS.get(k)
+        if a == ACTION_QUIT:
+            return ACTION_QUIT
+        if a is not None:
+            action = a
+    return action
+
+def quit_game():
+    clear(); print("Goodbye!"); sys.exit(0)
 
 # ======================
 #         RUN
 # ======================
-def run_game(walls, start, attack_patterns, map_label):
-    # initial position
-    if start and start not in walls:
-        px, py = start
-    else:
-        px, py = (0, 0)
-        if (px, py) in walls:
-            for yy in range(GRID_H):
-                for xx in range(GRID_W):
-                    if (xx, yy) not in walls:
-                        px, py = xx, yy
-                        break
-                else:
-                    continue
-                break
-
-    score = 0
-    coin_pos = random_free_cell({(px, py)}, walls)
+def frame_state(engine, per_attack):
+    """Tout ce que la frame affiche: si rien n'a changé, on ne redessine pas."""
+    grid = engine.grid
+    return (engine.px, engine.py, engine.coin_pos, engine.score, int(engine.now),
+            grid.warning, grid.damage, sum(1 for a in per_attack if a),
+            engine.idle_dur, engine.warning_dur, engine.damage_dur, engine.multi_prob)
+
+class GameSession:
+    """
+    Une partie interactive, partagée par la boucle synchrone et la boucle asyncio:
+    moteur, enregistrement, renderer, caméra, échéancier et entrée en attente.
+    Sans `policy`, le joueur est le clavier `kb`: la dernière direction reçue
+    est appliquée au prochain pas, ou tout de suite par early_move() (au plus
+    un déplacement par pas).
+    Le serveur (server.py) en fait tourner des centaines: taille de carte,
+    table d'attaques et cases libres partagées sont alors passées explicitement,
+    et `size` donne la taille du terminal du client.
+    Avec RENDER_THREAD (et hors mode différé), les frames partent dans un
+    FrameWriter: la boucle ne bloque jamais sur le terminal.
+    """
 
-    wave_count = 0
-    idle_dur, warning_dur, damage_dur = timings_for_attack_count(wave_count)
+    def __init__(self, walls, start, attack_patterns, map_label, kb, policy=None, seed=None,
+                 prof=None, defer=False, grid_w=None, grid_h=None, attack_table=None,
+                 free_cells=None, size=None, record=None, threaded=None, daily=None):
+        if seed is None:
+            seed = random.getrandbits(63)
+        grid_w = GRID_W if grid_w is None else grid_w
+        grid_h = GRID_H if grid_h is None else grid_h
+        self.walls = walls
+        self.map_label = map_label
+        self.kb = kb
+        self.policy = policy
+        self.prof = prof
+        self.seed = seed
+        self.daily = daily     # date du défi du jour (seed = daily_seed(daily)), sinon None
+        self.engine = Engine(walls, start, grid_w, grid_h, attack_patterns, seed=seed,
+                             attack_table=attack_table, free_cells=free_cells)
+        self.recorder = None
+        if cfg.RECORD_RUNS if record is None else record:
+            try:
+                self.recorder = RunRecorder(replay_path(seed), seed, map_label, cfg.ATTACKS_DIR,
+                                            grid_w=grid_w, grid_h=grid_h)
+            except OSError:
+                self.recorder = None
+            prune_replays()   # le dossier ne grandit pas sans fin (REPLAY_KEEP)
+        self.renderer = DiffRenderer(field_col_gap=cfg.SIDE_GAP_SPACES, defer=defer, size=size)
+        self.writer = None
+        self.fps = RateMeter()       # frames affichées (mesurées par le FrameWriter s'il y en a un)
+        if (cfg.RENDER_THREAD if threaded is None else threaded) and not defer:
+            self.writer = FrameWriter(self.renderer, self._shown)
+            self.fps = self.writer.fps
+        self.sim_rate = RateMeter()  # pas de simulation exécutés
+        self.viewport = Viewport(cfg.VIEW_MARGIN)
+        self.loop = FixedStepLoop(cfg.TICK, max_catchup=cfg.MAX_CATCHUP_TICKS)
+        self.broadcast = None  # FrameBroadcaster: spectateurs de cette partie (broadcast.py)
+        self.last_state = None
+        self.pending = None   # dernière direction reçue, pas encore appliquée
+        self.moved = False    # un déplacement anticipé a déjà pris le créneau du prochain tick
+        kb.last_input_time = None   # la touche Entrée du menu ne compte pas comme entrée de jeu
+
+    def poll(self, on_quit=None):
+        """Lit les touches en attente; Q appelle `on_quit` (quit_game par défaut), une direction devient l'entrée en attente."""
+        t0 = time.perf_counter()
+        action = keys_to_action(self.kb.read_keys())
+        if self.prof:
+            self.prof.record("input", t0)
+        if action == ACTION_QUIT:
+            if on_quit is not None:
+                on_quit()
+            else:
+                self.flush()   # plus aucune frame après le "Goodbye!"
+                quit_game()
+        elif action is not None:
+            self.pending = action
+
+    def run_steps(self, steps, poll=True):
+        """Exécute les pas dus; s'arrête au coup fatal. `poll`: lire le clavier à chaque pas."""
+        engine, loop, prof, recorder = self.engine, self.loop, self.prof, self.recorder
+        for _ in range(steps):
+            if self.policy is not None:
+                action = self.policy(engine)
+            else:
+                if poll:
+                    self.poll()
+                action = None if self.moved else self.pending
+                if action is not None:
+                    self.pending = None
+                self.moved = False
+            if recorder and action is not None:
+                recorder.record(loop.ticks, action)
+            t0 = time.perf_counter()
+            engine.step(loop.sim_time, action)
+            if prof:
+                prof.record("sim", t0)
+            loop.advance()
+            self.sim_rate.add()
+            if not engine.alive:
+                break
 
-    phase = 'idle'
-    phase_start = time.time()
-    current_attacks = []      # list of dict[(x,y)->wave]
-    fade_attacks = None       # attaques à faire disparaître en idle
-    fade_start = 0.0
+    def early_move(self):
+        """Touche reçue entre deux pas: équivaut à step(prochain pas, pending), enregistré sur ce pas."""
+        if self.pending is None or self.moved or self.policy is not None or not self.engine.alive:
+            return False
+        if self.recorder:
+            self.recorder.record(self.loop.ticks, self.pending)
+        self.engine.move(self.pending)
+        self.pending = None
+        self.moved = True
+        return True
+
+    def render(self):
+        """
+        Construit la frame si quelque chose a changé: écrite tout de suite, déposée
+        pour le FrameWriter, ou gardée pour take() en mode différé.
+        """
+        engine, prof = self.engine, self.prof
+        out = self.writer or self.renderer
+        t0 = time.perf_counter()
+        per_attack = engine.update_layers()
+        overlay = None
+        if prof:
+            prof.record("layers", t0)
+            overlay = prof.overlay()
+        # Les cadences ne font pas partie de l'état: leur texte change tout seul
+        # (RateMeter retombe quand rien n'est dessiné), ce qui redessinerait les
+        # phases calmes. Il est rafraîchi avec la frame, au moins une fois par
+        # seconde (le chrono fait partie de frame_state).
+        state = (frame_state(engine, per_attack), overlay)
+        if state == self.last_state:
+            return
+        rates = None
+        if cfg.SHOW_RATES:
+            rates = f"sim {self.sim_rate.rate:.0f} Hz • display {self.fps.rate:.0f} fps"
+        t1 = time.perf_counter()
+        n = self.draw(out, self.viewport, per_attack, overlay, rates)
+        if self.writer is None:
+            self.fps.add()
+        if prof:
+            write = 0.0 if out.defer else out.last_write_time
+            prof.times["build"].add(int((time.perf_counter() - t1 - write) * 1e6))
+            if not out.defer:
+                prof.times["write"].add(int(write * 1e6))
+            prof.record("frame", t0)
+            if self.writer is None:
+                prof.record_bytes(n)
+        if self.broadcast is not None:
+            # une seule construction pour tous les spectateurs, sans la ligne du profileur
+            self.broadcast.publish(lambda r, v: self.draw(r, v, per_attack))
+        self.last_state = state
+
+    def draw(self, renderer, viewport, per_attack, overlay=None, rates=None):
+        """La frame courante dans `renderer`, vue par `viewport` (joueur ou spectateurs)."""
+        engine = self.engine
+        return draw_game(engine.px, engine.py, per_attack, engine.score, engine.now,
+                         engine.coin_pos, self.walls, engine.idle_dur, engine.warning_dur,
+                         engine.damage_dur, engine.multi_prob, engine.multi_active,
+                         renderer=renderer, grid=engine.grid, overlay=overlay,
+                         viewport=viewport, rates=rates)
+
+    def _shown(self, n, write_time):
+        """Frame écrite par le FrameWriter (dans son thread): latence d'entrée, stats d'écriture."""
+        self.kb.frame_drawn()
+        prof = self.prof
+        if prof:
+            prof.times["write"].add(int(write_time * 1e6))
+            prof.record_bytes(n)
+
+    def flush(self):
+        """Attend l'écriture de la dernière frame (FrameWriter) puis arrête le thread."""
+        if self.writer is not None:
+            self.writer.close()
+
+    def save(self):
+        """Score et fin d'enregistrement (partie perdue). Peut tourner hors de la boucle."""
+        engine = self.engine
+        if self.policy is None:   # les parties de l'autopilote n'entrent pas au classement
+            try:
+                save_high_score(cfg.HIGH_SCORE_FILE, self.map_label, engine.score, engine.now)
+            except Exception:
+                pass
+        if self.recorder:
+            self.recorder.finish(OUTCOME_HIT, engine.score, self.loop.ticks, engine.now)
+
+    def print_game_over(self):
+        engine, kb = self.engine, self.kb
+        self.flush()
+        self.renderer.park_cursor()
+        print(f"{cfg.COLOR_DAMAGE}You were hit! GAME OVER.{cfg.COLOR_RESET}")
+        print(f"Final score: {engine.score} | Time: {int(engine.now)}s")
+        if self.daily is not None:
+            print(f"{cfg.COLOR_HUD_LABEL}Daily challenge {self.daily}{cfg.COLOR_RESET}")
+        print(f"\x1b[90mseed: {self.seed}{cfg.COLOR_RESET}")
+        if kb.latency.count:
+            print(f"\x1b[90m{kb.latency.summary()}{cfg.COLOR_RESET}")
+        if self.broadcast is not None:
+            print(f"\x1b[90m{self.broadcast.summary()}{cfg.COLOR_RESET}")
+        if self.writer is not None and self.writer.dropped:
+            print(f"\x1b[90mdisplay: {self.writer.shown} frames shown, "
+                  f"{self.writer.dropped} stale frames skipped{cfg.COLOR_RESET}")
+        if self.prof:
+            path = self.prof.dump()
+            self.prof = None
+            if path:
+                print(f"\x1b[90mprofile report: {path}{cfg.COLOR_RESET}")
+        print("Press any key to quit...")
+
+    def close(self):
+        """Sortie sans coup fatal (Q, Ctrl-C): enregistrement marqué abandonné, rapport écrit."""
+        self.flush()
+        if self.recorder:
+            self.recorder.finish(OUTCOME_QUIT, self.engine.score, self.loop.ticks, self.engine.now)
+        if self.prof:
+            self.prof.dump()
+
+
+def run_game(walls, start, attack_patterns, map_label, kb, policy=None, seed=None, daily=None):
+    """
+    Boucle interactive synchrone. Toutes les touches en attente sont lues à
+    chaque tick, et une touche reçue entre deux ticks réveille la boucle et
+    déplace le joueur tout de suite (voir GameSession).
+    Avec le profileur (PROFILE / MINIADV_PROFILE), chaque section du tick est
+    chronométrée, une ligne de mesures s'ajoute au HUD et un rapport est écrit
+    à la sortie.
+    Avec RECORD_RUNS, la graine et les entrées sont enregistrées (replays/)
+    pour que replay.py puisse revérifier le score.
+    Une même graine (`seed`, ou celle du défi du jour) donne la même suite d'attaques.
+    """
+    game = GameSession(walls, start, attack_patterns, map_label, kb, policy, seed, make_profiler(),
+                       daily=daily)
+    engine, loop = game.engine, game.loop
 
-    multi_active = False
-    game_start = phase_start
+    def render():
+        game.render()
+        if game.writer is None:   # sinon mesurée par le thread d'écriture
+            kb.frame_drawn()
 
+    loop.start()
     try:
         while True:
-            now = time.time()
-            elapsed = now - game_start
-            phase_elapsed = now - phase_start
-            changed_phase = False  # NEW : pour éviter le flash au switch
-
-            # =======================
-            #       PHASE IDLE
-            # =======================
-            if phase == 'idle':
-                # Nettoyage du fade terminé
-                if fade_attacks and (now - fade_start) >= (8 * cfg.WAVE_STAGGER + 1e-6):
-                    fade_attacks = None
-
-                # Passage en phase warning
-                if phase_elapsed >= idle_dur:
-                    phase = 'warning'
-                    phase_start = now
-                    changed_phase = True
-
-                    atk1 = choose_attack(attack_patterns)
-                    current_attacks = [atk1] if atk1 else []
-                    prob = extra_attack_probability(wave_count)
-                    multi_active = False
-                    if random.random() < prob:
-                        atk2 = choose_attack(attack_patterns)
-                        if atk2:
-                            current_attacks.append(atk2)
-                            multi_active = True
-
-            # =======================
-            #      PHASE WARNING
-            # =======================
-            elif phase == 'warning':
-                if phase_elapsed >= warning_dur:
-                    phase = 'damage'
-                    phase_start = now
-                    changed_phase = True
-                    # On garde current_attacks (rendu géré par attacks_wave_render)
-
             # =======================
-            #       PHASE DAMAGE
+            #   SIMULATION (pas fixes)
             # =======================
-            elif phase == 'damage':
-                if phase_elapsed >= damage_dur:
-                    # Passage en idle avec fade
-                    fade_attacks = current_attacks
-                    fade_start = now
-
-                    wave_count += 1
-                    idle_dur, warning_dur, damage_dur = timings_for_attack_count(wave_count)
-                    phase = 'idle'
-                    phase_start = now
-                    changed_phase = True
-                    current_attacks = []
-                    multi_active = False
-
-            # Si on vient de changer de phase, reset phase_elapsed
-            if changed_phase:
-                phase_elapsed = 0.0
+            steps = loop.due()
+            if game.prof and steps:
+                game.prof.record_jitter(loop.last_late)
+            game.run_steps(steps)
 
             # =======================
-            #        INPUT
-            # =======================
-            px, py = handle_input(px, py, walls)
-
-            # =======================
-            #        COINS
-            # =======================
-            if (px, py) == coin_pos:
-                score += 1
-                coin_pos = random_free_cell({(px, py)}, walls)
-
-            # =======================
-            #        HUD DATA
+            #        RENDU
             # =======================
-            multi_prob = extra_attack_probability(wave_count)
+            render()
 
             # =======================
-            #        RENDU
+            #       COLLISIONS
             # =======================
-            if phase == 'idle' and fade_attacks:
-                to_draw = attacks_wave_render(current_attacks, phase, phase_elapsed,
-                                              fade_attacks=fade_attacks,
-                                              fade_elapsed=(now - fade_start))
-            else:
-                to_draw = attacks_wave_render(current_attacks, phase, phase_elapsed)
-
-            # (On peut laisser multi_active tel quel; l'affichage est basé sur `attacks` dans draw_game)
-            draw_game(px, py, to_draw, score, elapsed, coin_pos, walls,
-                      idle_dur, warning_dur, damage_dur, multi_prob, multi_active)
+            if not engine.alive:
+                game.save()
+                game.print_game_over()
+                kb.read_keys()   # ignore keys typed before the hit
+                kb.getkey()
+                return
 
             # =======================
-            #       COLLISIONS
+            #   ATTENTE (réveil sur touche)
             # =======================
-            if phase == 'damage':
-                merged = merged_cells(to_draw)
-                if (px, py) in merged and merged[(px, py)] == cfg.ATTACK_DAMAGE_CHAR:
-                    try:
-                        save_high_score(cfg.HIGH_SCORE_FILE, map_label, score, elapsed)
-                    except Exception:
-                        pass
-                    print(f"{cfg.COLOR_DAMAGE}You were hit! GAME OVER.{cfg.COLOR_RESET}")
-                    print(f"Final score: {score} | Time: {int(elapsed)}s")
-                    print("Press any key to quit...")
-                    msvcrt.getch()
-                    return
-
-            time.sleep(cfg.TICK)
+            # avec une politique (autopilote), le clavier ne sert plus qu'à quitter
+            while True:
+                left = loop.time_left()
+                if left <= 0 or not kb.wait(left):
+                    break
+                game.poll()
+                if game.early_move():
+                    render()
 
     except KeyboardInterrupt:
+        game.flush()
         clear()
         print("Interrupted. Goodbye!")
+    finally:
+        game.close()
 
 
+async def run_game_async(walls, start, attack_patterns, map_label, kb, policy=None, seed=None,
+                         daily=None):
+    """
+    Même partie que run_game, en trois tâches asyncio:
+      - timer: échéancier à pas fixes + machine à phases (jamais bloqué par l'affichage);
+      - input: attend le clavier (add_reader en POSIX) au lieu de le sonder;
+      - render: construit la dernière frame et la confie au FrameWriter (RENDER_THREAD),
+        ou l'écrit dans un exécuteur; les frames produites pendant une écriture
+        lente sont abandonnées (ou fusionnées), jamais attendues par le timer.
+    L'enregistrement du score en fin de partie part aussi dans un exécuteur.
+    Avec SPECTATE_PORT, des spectateurs peuvent suivre la partie (broadcast.py).
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    aloop = asyncio.get_running_loop()
+    game = GameSession(walls, start, attack_patterns, map_label, kb, policy, seed,
+                       make_profiler(), defer=not cfg.RENDER_THREAD, daily=daily)
+    engine, loop, renderer = game.engine, game.loop, game.renderer
+    if cfg.SPECTATE_PORT:
+        from broadcast import FrameBroadcaster
+        game.broadcast = FrameBroadcaster()
+        try:
+            await game.broadcast.serve()
+        except OSError:
+            game.broadcast = None   # port occupé: partie sans spectateurs
+    dirty = asyncio.Event()
+    quit_requested = asyncio.Event()
+    writer = ThreadPoolExecutor(max_workers=1)   # un seul écrivain: l'ordre des octets est garanti
+
+    async def timer():
+        while engine.alive:
+            await asyncio.sleep(loop.time_left())
+            steps = loop.due()
+            if not steps:
+                continue
+            if game.prof:
+                game.prof.record_jitter(loop.last_late)
+            game.run_steps(steps, poll=False)
+            dirty.set()
+
+    async def keyboard():
+        while True:
+            await kb.wait_async()
+            game.poll(on_quit=quit_requested.set)
+            if game.early_move():
+                dirty.set()
+
+    async def render():
+        while True:
+            await dirty.wait()
+            dirty.clear()
+            game.render()
+            if game.writer is not None:
+                continue
+            data = renderer.take()
+            if data:
+                await aloop.run_in_executor(writer, renderer.write, data)
+                if game.prof:
+                    game.prof.times["write"].add(int(renderer.last_write_time * 1e6))
+            kb.frame_drawn()
+
+    loop.start()
+    dirty.set()
+    tasks = [asyncio.ensure_future(render()), asyncio.ensure_future(keyboard())]
+    quitting = asyncio.ensure_future(quit_requested.wait())
+    ticking = asyncio.ensure_future(timer())
+    tasks += [quitting, ticking]
+    try:
+        await asyncio.wait([ticking, quitting], return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if quit_requested.is_set():
+            game.flush()
+            quit_game()
+        saving = aloop.run_in_executor(None, game.save)
+        game.render()   # la frame du coup fatal
+        if game.writer is not None:
+            await aloop.run_in_executor(None, game.flush)
+        else:
+            await aloop.run_in_executor(writer, renderer.write, renderer.take())
+        game.print_game_over()
+        await saving
+        kb.read_keys()   # ignore keys typed before the hit
+        await kb.wait_async()
+        kb.read_keys()
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer.shutdown(wait=True)
+        if game.broadcast is not None:
+            game.broadcast.close()
+        game.close()
+
 # ======================
 #         MAIN
 # ======================
+def run_seed():
+    """
+    (graine, jour) de la partie: défi du jour (DAILY_CHALLENGE, ou MINIADV_DAILY=1
+    / MINIADV_DAILY=AAAA-MM-JJ), graine imposée (MINIADV_SEED), sinon (None, None).
+    """
+    daily = os.environ.get("MINIADV_DAILY", "")
+    if daily in ("", "0") and cfg.DAILY_CHALLENGE:
+        daily = "1"
+    if daily not in ("", "0"):
+        import datetime
+        day = datetime.date.today() if daily == "1" else datetime.date.fromisoformat(daily)
+        return daily_seed(day), day
+    seed = os.environ.get("MINIADV_SEED", "")
+    return (int(seed, 0) if seed else None), None
+
 def main():
     global GRID_W, GRID_H
 
     if os.name == "nt":
         enable_vt_mode()
 
-    walls, start, w, h, label = select_map()
-    GRID_W, GRID_H = w, h
+    with open_keyboard() as kb:
+        # patterns chargés (depuis le pack) pendant que le menu est affiché
+        if cfg.ASSET_CACHE:
+            patterns = PatternLoader(cfg.ATTACKS_DIR)
+        walls, start, w, h, label = select_map(kb)
+        GRID_W, GRID_H = w, h
 
-    attack_patterns = load_attack_patterns(cfg.ATTACKS_DIR)
-    if not attack_patterns:
-        clear()
-        print(f"{cfg.COLOR_ERROR}Aucune attaque trouvée dans '{cfg.ATTACKS_DIR}'.{cfg.COLOR_RESET}")
-        print(f"{cfg.COLOR_HINT}Ajoute au moins un fichier .txt avec une forme d'attaque.{cfg.COLOR_RESET}")
-        input(f"\n{cfg.COLOR_HINT}Appuie sur Entrée pour quitter...{cfg.COLOR_RESET}")
-        return
-
-    try:
-        enter_alt_screen()
-        run_game(walls, start, attack_patterns, label)
-    finally:
-        exit_alt_screen()
+        if cfg.ASSET_CACHE:
+            attack_patterns = patterns.result()
+            get_pack().save()
+        else:
+            attack_patterns = load_attack_patterns(cfg.ATTACKS_DIR)
+        if not attack_patterns:
+            clear()
+            print(f"{cfg.COLOR_ERROR}Aucune attaque trouvée dans '{cfg.ATTACKS_DIR}'.{cfg.COLOR_RESET}")
+            print(f"{cfg.COLOR_HINT}Ajoute au moins un fichier .txt avec une forme d'attaque.{cfg.COLOR_RESET}")
+            print(f"\n{cfg.COLOR_HINT}Appuie sur une touche pour quitter...{cfg.COLOR_RESET}")
+            kb.getkey()
+            return
+
+        policy = None
+        if cfg.AUTOPILOT or os.environ.get("MINIADV_AUTOPILOT", "") not in ("", "0"):
+            policy = make_autopilot()
+        seed, daily = run_seed()
+        try:
+            enter_alt_screen()
+            if cfg.ASYNC_LOOP:
+                import asyncio   # ~40 ms d'import: seulement une fois la carte choisie
+                try:
+                    asyncio.run(run_game_async(walls, start, attack_patterns, label, kb, policy,
+                                               seed, daily))
+                except KeyboardInterrupt:
+                    clear()
+                    print("Interrupted. Goodbye!")
+            else:
+                run_game(walls, start, attack_patterns, label, kb, policy, seed, daily)
+        finally:
+            exit_alt_screen()
+            get_store(cfg.HIGH_SCORE_FILE).close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+"""
+Optional NumPy backend for large grids.
+
+Used only when NumPy is importable (and cfg.NUMPY_BACKEND is not False):
+
+  - ArrayTimeline: drop-in replacement for engine.WaveTimeline. Each attack
+    of the round is stored as a 2D array of wave activation times; the
+    attacks are combined once (np.minimum for the first appearance of a
+    cell, np.maximum for its last wave, used by the fade). A tick's
+    warning/damage/fade layer is then one vectorized comparison against
+    phase_elapsed, packed back into the bitboard the engine expects.
+  - glyph_rows: turns a window of the grid planes into glyph rows in bulk
+    (one code per cell, then one lookup into a glyph table).
+
+Both produce exactly the same masks and glyphs as the pure-Python path,
+which stays the fallback (and the faster one on small maps).
+"""
+import options as cfg
+from tilemap import ChunkedGridState
+
+try:
+    import numpy as np
+except ImportError:   # backend optionnel
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# Codes de cellule de glyph_rows (index dans la table de glyphes)
+CODE_EMPTY, CODE_WALL, CODE_WARNING, CODE_DAMAGE, CODE_COIN = 0, 1, 2, 3, 4
+CODE_COIN_WARNING, CODE_COIN_DAMAGE = 5, 6
+
+
+def enabled(cells):
+    """Le backend NumPy doit-il servir pour `cells` cases ?"""
+    if not HAVE_NUMPY or cfg.NUMPY_BACKEND is False:
+        return False
+    return cells >= cfg.NUMPY_MIN_CELLS
+
+
+# ======================
+#   bitboards <-> arrays
+# ======================
+def mask_to_array(mask, size):
+    """Plan de bits (bit y*w+x) -> tableau booléen à plat de `size` cases."""
+    raw = mask.to_bytes((size + 7) // 8, "little")
+    bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), bitorder="little")
+    return bits[:size].astype(bool)
+
+def array_to_mask(arr):
+    """Tableau booléen (toute forme, ordre ligne par ligne) -> plan de bits."""
+    return int.from_bytes(np.packbits(arr.ravel(), bitorder="little").tobytes(), "little")
+
+
+# ======================
+#   Wave timeline
+# ======================
+class ArrayTimeline:
+    """
+    Même interface que engine.WaveTimeline (rewind/advance/remaining/full/visible_attacks),
+    avec les temps d'activation des attaques en tableaux 2D (h, w):
+      - appear[y, x]: plus petit temps de vague qui couvre la case (inf sinon);
+      - vanish[y, x]: plus grand, la case s'efface au fade à ce temps (inf sinon).
+    advance(t) ne recalcule le masque que quand t franchit un niveau de vague.
+    """
+
+    def __init__(self, attacks, w, h, stagger=None):
+        stagger = cfg.WAVE_STAGGER if stagger is None else stagger
+        size = w * h
+        inf = np.inf
+        self.spans = []
+        appear = np.full((h, w), inf)
+        vanish = np.full((h, w), -inf)
+        levels = set()
+        for atk in attacks:
+            if not atk:
+                continue
+            waves = [wave for wave, _ in atk]
+            self.spans.append(((min(waves) - 1) * stagger, (max(waves) - 1) * stagger))
+            # un tableau de temps d'activation par attaque
+            act = np.full(size, inf)
+            last = np.full(size, -inf)
+            for wave, mask in atk:
+                t = (wave - 1) * stagger
+                levels.add(t)
+                cells = mask_to_array(mask, size)
+                act[cells & (act == inf)] = t   # vagues triées: la première gagne
+                last[cells] = t                 # ... et la dernière pour le fade
+            appear = np.minimum(appear, act.reshape(h, w))
+            vanish = np.maximum(vanish, last.reshape(h, w))
+        vanish[vanish == -inf] = inf
+
+        self.appear = appear
+        self.vanish = vanish
+        self.levels = sorted(levels)
+        self.full = array_to_mask(appear != inf)
+        self.rewind(self.appear)
+
+    def rewind(self, times):
+        """Repart du début d'une phase, sur `appear` ou `vanish`."""
+        self._times = times
+        self._level = 0
+        self.acc = 0
+
+    def advance(self, t):
+        """Cases dont le temps d'activation est <= t: une comparaison vectorisée."""
+        levels = self.levels
+        i = self._level
+        while i < len(levels) and levels[i] <= t:
+            i += 1
+        if i != self._level:
+            self._level = i
+            self.acc = array_to_mask(self._times <= t)
+        return self.acc
+
+    def remaining(self, t):
+        return self.full & ~self.advance(t)
+
+    def visible_attacks(self, phase, t):
+        if phase == 'warning':
+            return [first <= t for first, _ in self.spans]
+        if phase == 'damage':
+            return [True] * len(self.spans)
+        return [last > t for _, last in self.spans]
+
+
+# ======================
+#   Glyphs
+# ======================
+def _rows_array(rows, vw, vh):
+    """Rangées '0'/'1' -> tableau booléen (vh, vw)."""
+    return (np.frombuffer("".join(rows).encode("ascii"), dtype=np.uint8) == 49).reshape(vh, vw)
+
+def window_array(grid, mask, x0, y0, vw, vh):
+    """Fenêtre (vh, vw) d'un plan de bits (plan creux sur les cartes en tuiles), en tableau booléen."""
+    if isinstance(grid, ChunkedGridState):
+        return _rows_array(grid.window_bits(mask, x0, y0, vw, vh), vw, vh)
+    w = grid.w
+    band = mask >> (y0 * w)
+    arr = mask_to_array(band & ((1 << (vh * w)) - 1), vh * w)
+    return arr.reshape(vh, w)[:, x0:x0 + vw]
+
+def wall_array(grid, x0, y0, vw, vh):
+    """Murs de la fenêtre; via window_walls pour les cartes en tuiles (pas de plan)."""
+    if not isinstance(grid, ChunkedGridState):
+        return window_array(grid, grid.walls, x0, y0, vw, vh)
+    return _rows_array(grid.window_walls(x0, y0, vw, vh), vw, vh)
+
+def glyph_rows(grid, view, glyphs):
+    """
+    Rangées de glyphes de la fenêtre `view` = (x0, y0, w, h), sans bordure ni joueur.
+    `glyphs` est indexé par les CODE_*; 'X' prioritaire sur '!', mur sur tout.
+    """
+    x0, y0, vw, vh = view
+    warn = window_array(grid, grid.warning, x0, y0, vw, vh)
+    dmg = window_array(grid, grid.damage, x0, y0, vw, vh)
+    coin = window_array(grid, grid.coin, x0, y0, vw, vh)
+    code = np.zeros((vh, vw), dtype=np.uint8)
+    code[coin] = CODE_COIN
+    code[warn] = CODE_WARNING
+    code[dmg] = CODE_DAMAGE
+    code[coin & warn] = CODE_COIN_WARNING
+    code[coin & dmg] = CODE_COIN_DAMAGE
+    code[wall_array(grid, x0, y0, vw, vh)] = CODE_WALL
+    table = np.array(glyphs, dtype=object)
+    return table[code].tolist()
@@ -6,10 +6,32 @@
 MAPS_DIR = "maps"
 ATTACKS_DIR = "attacks"
 HIGH_SCORE_FILE = "high_scores.csv"
+REPLAY_DIR = "replays"   # one binary recording per run (see replay.py)
+RECORD_RUNS = True
+REPLAY_KEEP = 200        # newest recordings kept in REPLAY_DIR, older ones deleted; 0 = keep all
 
-# --- Default dimensions (fallback; maps are 10x10) ---
+# --- Map menu ---
+MENU_PAGE_SIZE = 15    # max map entries shown per page
+MAP_CACHE_SIZE = 256   # parsed maps + previews kept in memory (LRU)
+MENU_PRELOAD   = 2     # neighbours parsed ahead in the background
+MENU_STATS     = ("runs", "score.p50", "score.p90", "time.p50")   # under the Top 10; () = none
+STATS_ACCURACY = 0.01  # relative error of score/time quantiles (analytics.py sketches)
+
+# --- Default dimensions (empty default map; map files can be any size) ---
 GRID_W, GRID_H = 10, 10
 
+# --- Viewport (maps larger than the terminal scroll around the player) ---
+VIEW_MARGIN    = 3     # cells kept between the player and a scrolled edge
+VIEW_MIN_W, VIEW_MIN_H = 10, 8   # smallest viewport, even on a tiny terminal
+PREVIEW_MAX_W, PREVIEW_MAX_H = 20, 12   # larger maps are downsampled in the menu preview
+ASSET_CACHE    = True   # parsed patterns/maps kept in ASSET_PACK, reparsed only when a file changes
+ASSET_PACK     = "assets.pack"
+ANALYZE_CACHE  = "analyze_cache.json"   # analyze.py results, keyed by map/pattern/timing hashes
+CHUNK_CACHE_SIZE = 256 # decoded 64x64 tiles kept per .tmap map (LRU)
+NUMPY_BACKEND  = "auto"   # vectorized attack layers/glyphs when NumPy is installed; False = never
+NUMPY_MIN_CELLS = 4096    # below this many cells the pure-Python path is faster
+NUMPY_MAX_CELLS = 4_000_000   # no per-cell time arrays above this (32 MB each)
+
 # --- ANSI Colors ---
 COLOR_RESET        = "\x1b[0m"
 COLOR_PLAYER       = "\x1b[38;5;21m"    # royal blue
@@ -22,12 +44,14 @@ COLOR_HUD_VALUE    = "\x1b[38;5;220m"   # yellow
 COLOR_TITLE        = "\x1b[38;5;51m"    # light blue
 COLOR_TITLE_ACCENT = "\x1b[38;5;199m"   # accent
 COLOR_MULTI_BANNER = "\x1b[38;5;201m"   # magenta
+COLOR_VIEW_EDGE    = "\x1b[90m"         # dim gray
 
 # --- ASCII Characters ---
 PLAYER_CHAR         = "@"
 COIN_CHAR           = "o"
 WALL_CHAR           = "H"   # internal walls
 BORDER_CHAR         = "H"   # inner border
+VIEW_EDGE_CHAR      = ":"   # viewport edge where the map continues (scrolling)
 ATTACK_WARNING_CHAR = "!"
 ATTACK_DAMAGE_CHAR  = "X"
 
@@ -50,7 +74,15 @@ SIDE_ROW_SCORE_INDEX = 4   # 5th row (index 0)
 SIDE_ROW_TIME_INDEX  = 5   # 6th row (index 0)
 
 # --- Timings & acceleration ---
-TICK           = 0.05
+TICK           = 0.05  # fixed simulation step (seconds)
+MAX_CATCHUP_TICKS = 5  # max steps replayed after a slow frame before dropping the backlog
+AUTOPILOT      = False # the built-in bot plays (attract mode, load tests); also MINIADV_AUTOPILOT=1
+AUTOPILOT_FIELD_CACHE = 64   # coin distance fields kept per map (one BFS each)
+ASYNC_LOOP     = True  # asyncio runner (timer / input / render tasks); False = single synchronous loop
+RENDER_THREAD  = True  # terminal writes in their own thread, newest frame wins; False = written in the loop
+SHOW_RATES     = True  # simulation tick rate and displayed fps in the HUD banner
+PROFILE        = False # tick profiler (also MINIADV_PROFILE=1 in the environment)
+PROFILE_REPORT = "profile_report.json"  # report written on exit (.json or .csv)
 BASE_IDLE      = 1.5
 BASE_WARNING   = 1.0
 DAMAGE_DUR     = 0.5
@@ -70,3 +102,21 @@ EXTRA_ATTACK_MAX    = 1.0   # capped at 100%
 # son ordre d'apparition/disparition. Le délai entre niveaux de vague
 # est défini ici (en secondes).
 WAVE_STAGGER = 0.1
+
+# --- Seeds & lookahead ---
+WAVE_LOOKAHEAD  = 4      # attack waves generated ahead (one per tick) so a wave start only dequeues
+DAILY_CHALLENGE = False  # everyone gets today's seed (same attacks and coins); also MINIADV_DAILY=1 or a date
+
+# --- Multi-session server (server.py) ---
+SERVER_HOST    = "127.0.0.1"
+SERVER_PORT    = 4000
+SERVER_MAX_SESSIONS = 2000   # connections beyond this are refused with a message
+SERVER_SEND_BUFFER = 64 * 1024   # bytes queued to a client before its frames are skipped
+SERVER_RECORD  = False   # record server runs in REPLAY_DIR (one open file per live session)
+SERVER_STATS_EVERY = 5.0 # seconds between stats lines (sessions, tick cost, memory); 0 = never
+
+# --- Spectators (broadcast.py) ---
+SPECTATE_HOST  = "127.0.0.1"
+SPECTATE_PORT  = 0       # viewers of the local game connect here (asyncio loop only); 0 = off
+SPECTATE_SIZE  = (100, 30)   # spectator terminal (columns, lines): one frame for every viewer
+SPECTATE_SEND_BUFFER = 256 * 1024   # bytes queued to a viewer before its frames are dropped
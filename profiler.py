@@ -0,0 +1,149 @@
+import json
+import os
+import time
+
+import options as cfg
+
+# =========================================
+#  Tick profiler (opt-in)
+# =========================================
+# Enabled with PROFILE = True in options.py or MINIADV_PROFILE=1 in the
+# environment. Each section of the tick (input, simulation, layers, frame
+# building, terminal write) is timed with perf_counter() into a
+# log2-bucketed histogram: recording is one bit_length() and a few
+# additions, no allocation. Also tracked: tick jitter (how late each step
+# ran against its TICK deadline) and bytes written per frame.
+# A compact overlay line is shown in the HUD, and a JSON or CSV report is
+# written when the game ends (MINIADV_PROFILE_OUT or PROFILE_REPORT).
+
+HIST_BUCKETS = 24   # bucket i: valeurs < 2**i (µs ou octets)
+
+
+class Histogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * HIST_BUCKETS
+
+    def add(self, value):
+        """value: entier (microsecondes ou octets)."""
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        b = value.bit_length()
+        self.buckets[b if b < HIST_BUCKETS else HIST_BUCKETS - 1] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Borne haute du bucket qui contient le p-ième percentile."""
+        if not self.count:
+            return 0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.max, (1 << i) - 1) if i else 0
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Profiler:
+    SECTIONS = ("input", "sim", "layers", "build", "write", "frame")
+
+    def __init__(self, tick=None, report_path=None):
+        self.tick = cfg.TICK if tick is None else tick
+        self.report_path = report_path
+        self.times = {name: Histogram() for name in self.SECTIONS}   # µs
+        self.jitter = Histogram()                                    # µs
+        self.frame_bytes = Histogram()                               # octets
+        self.missed_ticks = 0
+        self._overlay = ""
+        self._overlay_at = 0.0
+
+    # ----- recording -----
+    def record(self, section, t0):
+        """Temps écoulé depuis t0 (perf_counter) dans la section."""
+        self.times[section].add(int((time.perf_counter() - t0) * 1e6))
+
+    def record_jitter(self, late_seconds):
+        self.jitter.add(int(max(0.0, late_seconds) * 1e6))
+        if late_seconds > self.tick:
+            self.missed_ticks += 1
+
+    def record_bytes(self, n):
+        self.frame_bytes.add(n)
+
+    # ----- overlay -----
+    def overlay(self, every=0.5):
+        """Ligne compacte pour le HUD (recalculée toutes les `every` secondes)."""
+        now = time.perf_counter()
+        if now - self._overlay_at >= every:
+            self._overlay_at = now
+            t = self.times
+            self._overlay = (
+                f"\x1b[90mprof sim {t['sim'].mean:.0f}µs  layers {t['layers'].mean:.0f}µs  "
+                f"build {t['build'].mean:.0f}µs  write {t['write'].mean:.0f}µs  "
+                f"frame p99 {t['frame'].percentile(99)}µs  jitter p99 {self.jitter.percentile(99) / 1000:.1f}ms  "
+                f"{self.frame_bytes.mean:.0f}B/frame  missed {self.missed_ticks}{cfg.COLOR_RESET}"
+            )
+        return self._overlay
+
+    # ----- report -----
+    def report(self):
+        out = {"tick_budget_us": int(self.tick * 1e6), "missed_ticks": self.missed_ticks}
+        out["sections_us"] = {name: h.summary() for name, h in self.times.items()}
+        out["jitter_us"] = self.jitter.summary()
+        out["frame_bytes"] = self.frame_bytes.summary()
+        return out
+
+    def dump(self, path=None):
+        """Écrit le rapport en JSON (ou CSV si le chemin finit par .csv)."""
+        path = path or self.report_path
+        if not path:
+            return None
+        rep = self.report()
+        if path.lower().endswith(".csv"):
+            rows = [("section", name, h) for name, h in self.times.items()]
+            rows.append(("jitter", "jitter_us", self.jitter))
+            rows.append(("bytes", "frame_bytes", self.frame_bytes))
+            import csv
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(["kind", "name", "count", "mean", "p50", "p90", "p99", "max"])
+                for kind, name, h in rows:
+                    s = h.summary()
+                    w.writerow([kind, name, s["count"], s["mean"], s["p50"], s["p90"], s["p99"], s["max"]])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(rep, f, indent=2)
+        return path
+
+
+def make_profiler():
+    """Un Profiler si le profilage est activé (options ou environnement), sinon None."""
+    enabled = os.environ.get("MINIADV_PROFILE", "")
+    if enabled:
+        on = enabled not in ("0", "false", "no")
+    else:
+        on = getattr(cfg, "PROFILE", False)
+    if not on:
+        return None
+    path = os.environ.get("MINIADV_PROFILE_OUT") or getattr(cfg, "PROFILE_REPORT", "profile_report.json")
+    return Profiler(report_path=path)
@@ -0,0 +1,296 @@
+import sys
+import threading
+import time
+from shutil import get_terminal_size
+
+from gameloop import RateMeter
+
+# =========================================
+#  Differential terminal renderer
+# =========================================
+# Keeps the last frame that was written (front buffer) and compares it to
+# the new one (back buffer). Only the cells and HUD fields that changed
+# are sent, each prefixed by a cursor move. The first frame, and any frame
+# after a terminal resize or a layout change, is a full repaint.
+#
+# A frame is made of:
+#   - lines:  list[str]        free text rows at the top (title, HUD, banner)
+#   - grid:   list[list[str]]  one glyph per cell (ANSI colored), drawn with
+#                              a one-space gap: cell (rx, ry) sits at column 2*rx
+#   - fields: dict[row -> str] text written to the right of a grid row
+#                              (score, time...), row is the grid row index
+#
+# Maps larger than the terminal are drawn through a Viewport: only the
+# window around the player becomes the grid, so the frame size and the
+# diff cost depend on the terminal, not on the map.
+
+def cursor_to(row, col):
+    """Séquence ANSI de positionnement (row/col à partir de 0)."""
+    return f"\x1b[{row + 1};{col + 1}H"
+
+
+class Viewport:
+    """
+    Caméra d'une grande carte: fenêtre (x0, y0, w, h) qui suit le joueur.
+    La fenêtre ne défile que quand le joueur approche d'un bord (à moins de
+    `margin` cases), donc la plupart des déplacements ne changent que deux
+    cellules au lieu de décaler toute la vue.
+    """
+
+    def __init__(self, margin=3):
+        self.margin = margin
+        self.x0 = self.y0 = 0
+        self.w = self.h = 0
+
+    def _axis(self, start, size, pos, total):
+        if size >= total:
+            return 0
+        m = min(self.margin, (size - 1) // 2)
+        if pos < start + m:
+            start = pos - m
+        elif pos > start + size - 1 - m:
+            start = pos - size + 1 + m
+        return max(0, min(start, total - size))
+
+    def follow(self, px, py, map_w, map_h, view_w, view_h):
+        """Recadre la fenêtre autour de (px, py). Retourne (x0, y0, w, h)."""
+        view_w, view_h = min(view_w, map_w), min(view_h, map_h)
+        if (view_w, view_h) != (self.w, self.h):
+            # taille changée (carte ou terminal): on recentre
+            self.x0, self.y0 = px - view_w // 2, py - view_h // 2
+            self.w, self.h = view_w, view_h
+        self.x0 = self._axis(self.x0, view_w, px, map_w)
+        self.y0 = self._axis(self.y0, view_h, py, map_h)
+        return self.x0, self.y0, view_w, view_h
+
+
+class DiffRenderer:
+    def __init__(self, out=None, field_col_gap=4, defer=False, size=None):
+        self.out = out if out is not None else sys.stdout
+        self.field_col_gap = field_col_gap
+        # defer=True: render() n'écrit pas, les octets attendent take() + write()
+        # (boucle asyncio: l'écriture part dans un exécuteur)
+        self.defer = defer
+        # size(): (colonnes, lignes) du terminal de sortie; par défaut celui du processus
+        # (serveur: la taille annoncée par le client telnet)
+        self.size = size if size is not None else get_terminal_size
+        self.pending = []
+
+        self.front_lines = None
+        self.front_grid = None
+        self.front_fields = None
+        self.term_size = None
+
+        # Stats
+        self.last_bytes = 0
+        self.last_write_time = 0.0   # secondes passées dans write()+flush()
+        self.total_bytes = 0
+        self.frames = 0
+        self.full_repaints = 0
+
+    def invalidate(self):
+        """Force une repeinte complète à la prochaine frame."""
+        self.front_lines = None
+
+    def _layout_changed(self, lines, grid):
+        if self.front_lines is None:
+            return True
+        if len(lines) != len(self.front_lines) or len(grid) != len(self.front_grid):
+            return True
+        if grid and len(grid[0]) != len(self.front_grid[0]):
+            return True
+        return False
+
+    def _field_col(self, grid):
+        width = len(grid[0]) * 2 - 1 if grid else 0
+        return width + self.field_col_gap
+
+    def _full(self, lines, grid, fields):
+        parts = ["\x1b[H\x1b[2J"]
+        parts.append("\n".join(lines))
+        gap = " " * self.field_col_gap
+        for ry, row in enumerate(grid):
+            parts.append("\n")
+            parts.append(" ".join(row))
+            text = fields.get(ry)
+            if text:
+                parts.append(gap + text)
+        return "".join(parts)
+
+    def _diff(self, lines, grid, fields):
+        parts = []
+        for row, (new, old) in enumerate(zip(lines, self.front_lines)):
+            if new != old:
+                parts.append(cursor_to(row, 0) + new + "\x1b[K")
+
+        top = len(lines)
+        for ry, (new_row, old_row) in enumerate(zip(grid, self.front_grid)):
+            if new_row == old_row:
+                continue
+            last = -2
+            for rx, cell in enumerate(new_row):
+                if cell == old_row[rx]:
+                    continue
+                if rx == last + 1:
+                    # cellule voisine: le curseur est déjà à la bonne place
+                    parts.append(" " + cell)
+                else:
+                    parts.append(cursor_to(top + ry, rx * 2) + cell)
+                last = rx
+
+        col = self._field_col(grid)
+        old_fields = self.front_fields
+        for ry in set(fields) | set(old_fields):
+            new = fields.get(ry, "")
+            if new != old_fields.get(ry, ""):
+                parts.append(cursor_to(top + ry, col) + new + "\x1b[K")
+        return "".join(parts)
+
+    def terminal_size(self):
+        """(colonnes, lignes) de la sortie, None si inconnue."""
+        try:
+            return tuple(self.size())
+        except Exception:
+            return None
+
+    def render(self, lines, grid, fields=None):
+        """Écrit la frame (complète ou différentielle). Retourne le nombre d'octets envoyés."""
+        fields = fields or {}
+        size = self.terminal_size()
+
+        if size != self.term_size or self._layout_changed(lines, grid):
+            data = self._full(lines, grid, fields)
+            self.full_repaints += 1
+        else:
+            data = self._diff(lines, grid, fields)
+
+        self.term_size = size
+        self.front_lines = list(lines)
+        self.front_grid = [list(row) for row in grid]
+        self.front_fields = dict(fields)
+
+        if self.defer:
+            if data:
+                self.pending.append(data)
+        else:
+            self.write(data)
+        n = len(data.encode("utf-8"))
+        self.last_bytes = n
+        self.total_bytes += n
+        self.frames += 1
+        return n
+
+    def keyframe(self):
+        """Repeinte complète de la dernière frame rendue (spectateur qui arrive ou rattrape)."""
+        if self.front_lines is None:
+            return ""
+        return self._full(self.front_lines, self.front_grid, self.front_fields)
+
+    def take(self):
+        """Octets des frames différées pas encore écrites (dans l'ordre), puis on vide."""
+        data = "".join(self.pending)
+        self.pending.clear()
+        return data
+
+    def write(self, data):
+        """Envoie `data` au terminal; mesure le temps passé dans write()+flush()."""
+        if not data:
+            self.last_write_time = 0.0
+            return
+        t0 = time.perf_counter()
+        self.out.write(data)
+        self.out.flush()
+        self.last_write_time = time.perf_counter() - t0
+
+    def park_cursor(self):
+        """Place le curseur sous la dernière frame (avant d'imprimer du texte libre)."""
+        if self.front_lines is None:
+            return
+        row = len(self.front_lines) + len(self.front_grid) + 1
+        self.out.write(cursor_to(row, 0) + "\x1b[J")
+        self.out.flush()
+
+    def stats(self):
+        avg = self.total_bytes / self.frames if self.frames else 0.0
+        return {
+            "frames": self.frames,
+            "full_repaints": self.full_repaints,
+            "last_bytes": self.last_bytes,
+            "avg_bytes": avg,
+            "total_bytes": self.total_bytes,
+        }
+
+
+class FrameWriter:
+    """
+    Thread d'écriture, "la dernière frame gagne": render() dépose la frame dans
+    une case unique et rend la main tout de suite. Le thread prend la plus
+    récente, la diffe contre ce que le terminal affiche vraiment (le front
+    buffer de `renderer`) et l'écrit. Les frames remplacées avant d'être
+    prises sont abandonnées, jamais diffées: un terminal lent fait baisser
+    les fps affichées, pas la cadence de la simulation.
+    Même interface que DiffRenderer pour draw_game (render, terminal_size).
+    """
+    defer = True   # les octets ne sont pas écrits par l'appelant (voir GameSession.render)
+
+    def __init__(self, renderer, on_shown=None):
+        self.renderer = renderer
+        self.on_shown = on_shown   # on_shown(octets, secondes d'écriture), dans le thread d'écriture
+        self.fps = RateMeter()
+        self.submitted = 0
+        self.shown = 0
+        self.dropped = 0           # frames remplacées avant d'être écrites
+        self._cond = threading.Condition()
+        self._frame = None
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self._thread.start()
+
+    def terminal_size(self):
+        return self.renderer.terminal_size()
+
+    def render(self, lines, grid, fields=None):
+        """Dépose la frame (les listes ne doivent plus être modifiées par l'appelant)."""
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = (lines, grid, fields)
+            self.submitted += 1
+            self._cond.notify_all()
+        return 0
+
+    def _run(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while self._frame is None and not self._closed:
+                    cond.wait()
+                if self._frame is None:
+                    return
+                frame, self._frame = self._frame, None
+                self._busy = True
+            try:
+                n = self.renderer.render(*frame)
+            except (OSError, ValueError):   # sortie fermée
+                n = 0
+            self.fps.add()
+            if self.on_shown is not None:
+                self.on_shown(n, self.renderer.last_write_time)
+            with cond:
+                self._busy = False
+                self.shown += 1
+                cond.notify_all()
+
+    def drain(self, timeout=None):
+        """Attend que la dernière frame déposée soit écrite. Retourne False si `timeout` expire."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._frame is None and not self._busy, timeout)
+
+    def close(self, timeout=1.0):
+        """Écrit la frame en attente puis arrête le thread."""
+        self.drain(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
@@ -0,0 +1,397 @@
+"""
+Run recordings (.mrp) and replay verification.
+
+    python replay.py info replays/20250101-120000_1a2b3c.mrp
+    python replay.py verify replays/                     # every .mrp, in parallel
+    python replay.py verify run.mrp --maps maps --attacks attacks --workers 4
+
+A recording holds what is needed to replay a run exactly: the RNG seed,
+the map and pattern-set hashes, the simulation step, and the inputs. Each
+input is a tick number and an action. The engine is deterministic given
+these, so the verifier replays the inputs on a virtual clock, with no
+sleep and no rendering. It then checks the final score and time_sec
+against the footer that was written when the run ended.
+
+Version 2 recordings come from seeded engines: attacks, multi-attack
+rolls and coins each draw from their own stream derived from the seed
+(engine.WaveScheduler). Version 1 recordings, where a single generator
+served everything, still replay with that single stream.
+
+File layout (little-endian):
+    header   magic "MARP", version u8, tick f64, seed u64,
+             map hash (16 bytes), patterns hash (16 bytes), rules hash (8 bytes),
+             map label and pattern folder (u16 length + UTF-8 each)
+    events   varint((tick_delta << 3) | code); code 0..3 = up/down/left/right,
+             code 7 = end of events
+    footer   outcome u8 (1 = hit, 0 = quit), score varint, ticks varint, time_sec f64
+
+Events are buffered in a small bytearray and flushed every FLUSH_BYTES,
+so memory stays bounded however long the run lasts.
+"""
+import argparse
+import hashlib
+import os
+import random
+import struct
+import sys
+import time
+
+import options as cfg
+from bitgrid import FreeCellIndex, GridState
+from engine import (
+    ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT, ACTION_UP, Engine, build_attack_table,
+    list_attack_files, load_attack_patterns, spawn_position,
+)
+from tilemap import TileMap
+
+MAGIC = b"MARP"
+VERSION = 2
+VERSIONS = (1, 2)   # 1: un seul flux aléatoire (rng=Random(seed)); 2: flux séparés (Engine(seed=...))
+REPLAY_EXT = ".mrp"
+FLUSH_BYTES = 4096
+EMPTY_MAP = "Empty map"
+
+HEADER = struct.Struct("<4sBdQ16s16s8s")
+FOOTER_TIME = struct.Struct("<d")
+ACTIONS = (ACTION_UP, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT)
+ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+CODE_END = 7
+
+OUTCOME_QUIT = 0
+OUTCOME_HIT = 1
+
+# Réglages qui changent la simulation: une partie n'est rejouable qu'avec les mêmes
+RULES = ("TICK", "BASE_IDLE", "BASE_WARNING", "DAMAGE_DUR", "ATTACKS_PER_STEP", "STEP_DELTA",
+         "MIN_IDLE", "MIN_WARNING", "EXTRA_ATTACK_STEP", "EXTRA_ATTACK_GROWTH",
+         "EXTRA_ATTACK_MAX", "WAVE_STAGGER")
+
+
+# ======================
+#   HASHES
+# ======================
+def _file_digest(h, path):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+def map_hash(map_label, maps_dir=None, grid_w=None, grid_h=None):
+    """Empreinte de la carte: contenu du fichier, ou dimensions pour la carte vide."""
+    h = hashlib.sha256()
+    if map_label == EMPTY_MAP:
+        w = cfg.GRID_W if grid_w is None else grid_w
+        hh = cfg.GRID_H if grid_h is None else grid_h
+        h.update(f"{EMPTY_MAP}:{w}x{hh}".encode())
+    else:
+        _file_digest(h, os.path.join(maps_dir or cfg.MAPS_DIR, map_label))
+    return h.digest()[:16]
+
+def patterns_hash(folder):
+    """Empreinte du jeu de patterns: noms et contenus, dans l'ordre de chargement."""
+    h = hashlib.sha256()
+    for fname in list_attack_files(folder):
+        h.update(fname.encode() + b"\0")
+        _file_digest(h, os.path.join(folder, fname))
+        h.update(b"\0")
+    return h.digest()[:16]
+
+def rules_hash():
+    h = hashlib.sha256(repr([(name, getattr(cfg, name)) for name in RULES]).encode())
+    return h.digest()[:8]
+
+
+# ======================
+#   VARINTS
+# ======================
+def _varint(n, out):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated recording.")
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+# ======================
+#   RECORDING
+# ======================
+class RunRecorder:
+    """Écrit une partie au fil de l'eau: en-tête à l'ouverture, entrées par petits blocs, pied à la fin."""
+
+    def __init__(self, path, seed, map_label, pattern_dir, tick=None, grid_w=None, grid_h=None,
+                 maps_dir=None):
+        self.path = path
+        self.tick = cfg.TICK if tick is None else tick
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(path, "wb")
+        head = bytearray(HEADER.pack(MAGIC, VERSION, self.tick, seed,
+                                     map_hash(map_label, maps_dir, grid_w, grid_h),
+                                     patterns_hash(pattern_dir), rules_hash()))
+        for text in (map_label, pattern_dir):
+            raw = text.encode("utf-8")
+            head += struct.pack("<H", len(raw)) + raw
+        self._f.write(head)
+        self._buf = bytearray()
+        self._last_tick = 0
+        self.events = 0
+
+    def record(self, tick, action):
+        """Action appliquée au pas `tick` (numéro du pas de simulation, à partir de 0)."""
+        code = ACTION_CODES.get(action)
+        if code is None or self._f is None:
+            return
+        _varint(((tick - self._last_tick) << 3) | code, self._buf)
+        self._last_tick = tick
+        self.events += 1
+        if len(self._buf) >= FLUSH_BYTES:
+            self._f.write(self._buf)
+            self._buf.clear()
+
+    def finish(self, outcome, score, ticks, time_sec):
+        """Termine le fichier: marqueur de fin puis résultat déclaré."""
+        if self._f is None:
+            return
+        buf = self._buf
+        _varint(CODE_END, buf)
+        buf.append(outcome)
+        _varint(score, buf)
+        _varint(ticks, buf)
+        buf += FOOTER_TIME.pack(time_sec)
+        self._f.write(buf)
+        self._f.close()
+        self._f = None
+
+def replay_path(seed, folder=None):
+    name = time.strftime("%Y%m%d-%H%M%S") + f"_{seed:016x}{REPLAY_EXT}"
+    return os.path.join(folder or cfg.REPLAY_DIR, name)
+
+def prune_replays(folder=None, keep=None):
+    """
+    Garde les `keep` enregistrements les plus récents du dossier (REPLAY_KEEP, 0 = tous).
+    Les noms commencent par la date: l'ordre alphabétique est l'ordre chronologique.
+    Retourne le nombre de fichiers supprimés.
+    """
+    keep = cfg.REPLAY_KEEP if keep is None else keep
+    folder = folder or cfg.REPLAY_DIR
+    if keep <= 0:
+        return 0
+    try:
+        names = sorted(f for f in os.listdir(folder) if f.endswith(REPLAY_EXT))
+    except OSError:
+        return 0
+    removed = 0
+    for name in names[:-keep]:
+        try:
+            os.remove(os.path.join(folder, name))
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+# ======================
+#   READING
+# ======================
+def read_recording(path):
+    """Retourne un dict: en-tête, liste d'événements (tick, action) et pied (None si incomplet)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size or data[:4] != MAGIC:
+        raise ValueError("Not a run recording.")
+    magic, version, tick, seed, mh, ph, rh = HEADER.unpack_from(data, 0)
+    if version not in VERSIONS:
+        raise ValueError(f"Unsupported recording version {version}.")
+    pos = HEADER.size
+    labels = []
+    for _ in range(2):
+        (n,) = struct.unpack_from("<H", data, pos)
+        labels.append(data[pos + 2:pos + 2 + n].decode("utf-8"))
+        pos += 2 + n
+
+    events = []
+    t = 0
+    footer = None
+    while pos < len(data):
+        v, pos = _read_varint(data, pos)
+        code = v & 7
+        if code == CODE_END:
+            outcome = data[pos]
+            score, pos = _read_varint(data, pos + 1)
+            ticks, pos = _read_varint(data, pos)
+            (time_sec,) = FOOTER_TIME.unpack_from(data, pos)
+            footer = {"outcome": outcome, "score": score, "ticks": ticks, "time_sec": time_sec}
+            break
+        t += v >> 3
+        events.append((t, ACTIONS[code]))
+    return {"version": version, "tick": tick, "seed": seed, "map_hash": mh, "patterns_hash": ph, "rules_hash": rh,
+            "map": labels[0], "patterns": labels[1], "events": events, "footer": footer}
+
+
+# ======================
+#   VERIFICATION
+# ======================
+# Caches par processus (remplis à la demande dans chaque worker)
+_MAPS = {}
+_PATTERNS = {}
+_TABLES = {}
+
+def _load_map(label, maps_dir):
+    key = (label, maps_dir)
+    if key not in _MAPS:
+        if label == EMPTY_MAP:
+            walls, start, w, h = set(), None, cfg.GRID_W, cfg.GRID_H
+        else:
+            # import tardif: mini_adventure importe ce module
+            from mini_adventure import read_map_file
+            walls, start, w, h = read_map_file(os.path.join(maps_dir, label))
+        free = None
+        if not isinstance(walls, TileMap):
+            free = FreeCellIndex.reachable(GridState(w, h, walls), spawn_position(start, walls, w, h))
+        _MAPS[key] = (walls, start, w, h, free, map_hash(label, maps_dir, w, h))
+    return _MAPS[key]
+
+def _load_patterns(folder):
+    if folder not in _PATTERNS:
+        _PATTERNS[folder] = (load_attack_patterns(folder), patterns_hash(folder))
+    return _PATTERNS[folder]
+
+def _load_table(folder, w, h):
+    key = (folder, w, h)
+    if key not in _TABLES:
+        _TABLES[key] = build_attack_table(_load_patterns(folder)[0], w, h)
+    return _TABLES[key]
+
+def resimulate(rec, walls, start, w, h, patterns, attack_table=None, free_cells=None):
+    """
+    Rejoue les entrées d'un enregistrement terminé sur une horloge virtuelle,
+    pendant le nombre de pas déclaré (ou jusqu'au coup fatal). Retourne (moteur, pas joués).
+    """
+    if rec["version"] == 1:
+        seeding = {"rng": random.Random(rec["seed"])}
+    else:
+        seeding = {"seed": rec["seed"]}
+    engine = Engine(walls, start, w, h, patterns, attack_table=attack_table,
+                    free_cells=free_cells, **seeding)
+    tick = rec["tick"]
+    actions = dict(rec["events"])
+    get = actions.get
+    step = engine.step
+    n = 0
+    for n in range(rec["footer"]["ticks"]):
+        if not step(n * tick, get(n)):
+            return engine, n + 1
+    return engine, rec["footer"]["ticks"]
+
+def verify(path, maps_dir=None, attacks_dir=None):
+    """Vérifie un enregistrement. Retourne un dict (ok, raison, score, temps...)."""
+    maps_dir = maps_dir or cfg.MAPS_DIR
+    t0 = time.perf_counter()
+    result = {"path": path, "ok": False}
+    try:
+        rec = read_recording(path)
+        result.update(map=rec["map"], seed=rec["seed"])
+        footer = rec["footer"]
+        if footer is None:
+            result["reason"] = "incomplete recording (no footer)"
+            return result
+        if rec["rules_hash"] != rules_hash():
+            result["reason"] = "game rules differ (options.py)"
+            return result
+        walls, start, w, h, free, mh = _load_map(rec["map"], maps_dir)
+        if mh != rec["map_hash"]:
+            result["reason"] = "map file differs"
+            return result
+        folder = attacks_dir or rec["patterns"]
+        patterns, ph = _load_patterns(folder)
+        if ph != rec["patterns_hash"]:
+            result["reason"] = "attack patterns differ"
+            return result
+
+        engine, ticks = resimulate(rec, walls, start, w, h, patterns, _load_table(folder, w, h), free)
+        hit = not engine.alive
+        result.update(score=engine.score, time_sec=engine.now, ticks=ticks)
+        if engine.score != footer["score"]:
+            result["reason"] = f"score {footer['score']} claimed, {engine.score} replayed"
+        elif engine.now != footer["time_sec"]:
+            result["reason"] = f"time {footer['time_sec']:.2f}s claimed, {engine.now:.2f}s replayed"
+        elif hit != (footer["outcome"] == OUTCOME_HIT):
+            result["reason"] = "outcome differs"
+        else:
+            result["ok"] = True
+    except (OSError, ValueError, struct.error) as e:
+        result["reason"] = str(e)
+    finally:
+        result["ms"] = (time.perf_counter() - t0) * 1000
+    return result
+
+def _verify_chunk(args):
+    paths, maps_dir, attacks_dir = args
+    return [verify(p, maps_dir, attacks_dir) for p in paths]
+
+def collect(paths):
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(os.path.join(p, f) for f in os.listdir(p) if f.endswith(REPLAY_EXT)))
+        else:
+            out.append(p)
+    return out
+
+def verify_many(paths, maps_dir=None, attacks_dir=None, workers=None, chunk_size=16):
+    """Vérifie une liste d'enregistrements sur un pool de processus (workers=1: en local)."""
+    if workers == 1 or len(paths) <= chunk_size:
+        return _verify_chunk((paths, maps_dir, attacks_dir))
+    from concurrent.futures import ProcessPoolExecutor   # tardif: coûteux au démarrage du jeu
+    jobs = [(paths[i:i + chunk_size], maps_dir, attacks_dir) for i in range(0, len(paths), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_verify_chunk, jobs):
+            results.extend(part)
+    return results
+
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Mini-Adventure run recordings")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ver = sub.add_parser("verify", help="replay recordings and check their score and time")
+    ver.add_argument("paths", nargs="+", help=".mrp files or folders")
+    ver.add_argument("--maps", default=cfg.MAPS_DIR)
+    ver.add_argument("--attacks", default=None, help="pattern folder (default: the recorded one)")
+    ver.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    info = sub.add_parser("info", help="print a recording's header and result")
+    info.add_argument("path")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.cmd == "info":
+        rec = read_recording(args.path)
+        print(f"map: {rec['map']}  patterns: {rec['patterns']}  seed: {rec['seed']}  tick: {rec['tick']}")
+        print(f"inputs: {len(rec['events'])}  result: {rec['footer']}  format: v{rec['version']}")
+        return 0
+
+    paths = collect(args.paths)
+    t0 = time.perf_counter()
+    results = verify_many(paths, args.maps, args.attacks, args.workers)
+    dt = time.perf_counter() - t0
+    failed = 0
+    for r in results:
+        if r["ok"]:
+            print(f"OK    {r['path']}  score={r['score']} time={r['time_sec']:.2f}s ({r['ms']:.0f} ms)")
+        else:
+            failed += 1
+            print(f"FAIL  {r['path']}  {r.get('reason', '?')}")
+    print(f"{len(results) - failed}/{len(results)} verified in {dt:.2f}s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
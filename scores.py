@@ -0,0 +1,286 @@
+import csv
+import heapq
+import io
+import json
+import os
+import threading
+
+from analytics import MapStats
+
+# =========================================
+#  High-score store: append-only CSV + per-map top-N index
+# =========================================
+# New runs are appended to the CSV as one line (one write() on an
+# O_APPEND descriptor), never by rewriting the file. An in-memory index
+# keeps the best `top_n` runs per map in a min-heap, so a save is
+# O(log N) and the menu reads a ready-made top 10.
+#
+# The index is loaded once. On each read the file is stat()ed: if it only
+# grew (another process appended), just the new tail is parsed; if it was
+# replaced or truncated, the index is rebuilt. A snapshot of the index
+# (the `.idx` sidecar) is written by a background thread, so the next
+# start only parses the rows appended since the snapshot.
+#
+# The CSV itself is never compacted: every run stays in it, because
+# analytics.py reports over the whole history. What is compacted is the
+# index: the snapshot holds only the top N per map and the per-map
+# statistics, however long the file gets. A full rebuild (no snapshot,
+# or the file was replaced) reads the CSV in PARSE_BLOCK blocks.
+#
+# Alongside the top N, each map has a MapStats (analytics.py): run count,
+# score/time quantile sketches and runs per day, updated row by row and
+# saved in the snapshot. The menu shows MENU_STATS from it without
+# reading the whole file.
+
+FIELDS = ["map", "score", "time_sec", "datetime"]
+SNAPSHOT_SUFFIX = ".idx"
+SNAPSHOT_EVERY = 1000   # rows parsed/appended before a new snapshot is written
+PARSE_BLOCK = 4 << 20   # bytes read at a time when (re)indexing the CSV
+
+
+def rank_key(row):
+    """Ordre du classement: meilleur score, puis temps le plus court."""
+    return (-row["score"], row["time_sec"])
+
+def parse_row(r):
+    """Ligne CSV (dict) -> ligne typée, ou None si elle est invalide."""
+    try:
+        return {
+            "map": r.get("map", "Empty map"),
+            "score": int(r["score"]),
+            "time_sec": float(r["time_sec"]),
+            "datetime": r["datetime"],
+        }
+    except Exception:
+        return None
+
+
+class ScoreStore:
+    def __init__(self, path, top_n=10):
+        self.path = path
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._heaps = {}       # map -> min-heap de (score, -time_sec, seq, row)
+        self._stats = {}       # map -> MapStats (toutes les parties)
+        self._seq = 0
+        self._offset = 0       # octets du CSV déjà indexés
+        self._ino = None
+        self._since_snapshot = 0
+        self._loaded = False
+        self._snapshot_thread = None
+
+    # ----- index -----
+    def _push(self, row):
+        self._seq += 1
+        item = (row["score"], -row["time_sec"], self._seq, row)
+        heap = self._heaps.setdefault(row["map"], [])
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def _count(self, row):
+        st = self._stats.get(row["map"])
+        if st is None:
+            st = self._stats[row["map"]] = MapStats()
+        st.add(row["score"], row["time_sec"], row["datetime"])
+
+    def _reset(self):
+        self._heaps = {}
+        self._stats = {}
+        self._seq = 0
+        self._offset = 0
+        self._since_snapshot = 0
+
+    def _parse_from(self, offset):
+        """
+        Indexe les lignes complètes à partir de `offset`, par blocs de PARSE_BLOCK
+        octets (mémoire bornée même pour une reconstruction complète).
+        Retourne le nombre de lignes.
+        """
+        n = 0
+        header = offset == 0
+        push, count = self._push, self._count
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            rest = b""
+            while True:
+                block = f.read(PARSE_BLOCK)
+                if not block:
+                    break
+                data = rest + block
+                end = data.rfind(b"\n") + 1   # ligne partielle: complétée par le bloc suivant
+                if end == 0:
+                    rest = data
+                    continue
+                rest = data[end:]
+                lines = data[:end].decode("utf-8", errors="replace").splitlines()
+                if header and lines and lines[0].startswith("map,"):
+                    lines = lines[1:]
+                header = False
+                for rec in csv.reader(lines):
+                    try:
+                        row = {"map": rec[0], "score": int(rec[1]), "time_sec": float(rec[2]),
+                               "datetime": rec[3]}
+                    except (IndexError, ValueError):
+                        continue
+                    push(row)
+                    count(row)
+                    n += 1
+                offset += end
+        self._offset = offset   # une ligne partielle en fin de fichier (écriture en cours): plus tard
+        return n
+
+    def _stat(self):
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        st = self._stat()
+        if st is None:
+            self._reset()
+            self._ino = None
+            self._loaded = True
+            return
+        if not self._loaded:
+            self._loaded = True
+            if not self._load_snapshot(st):
+                self._reset()
+            self._ino = st.st_ino
+        elif st.st_ino != self._ino or st.st_size < self._offset:
+            # fichier remplacé ou tronqué: reconstruction complète
+            self._reset()
+            self._ino = st.st_ino
+        if st.st_size > self._offset:
+            self._since_snapshot += self._parse_from(self._offset)
+            if self._since_snapshot >= SNAPSHOT_EVERY:
+                self.snapshot_async()
+
+    # ----- snapshot (.idx) -----
+    def _snapshot_path(self):
+        return self.path + SNAPSHOT_SUFFIX
+
+    def _load_snapshot(self, st):
+        try:
+            with open(self._snapshot_path(), "r", encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            return False
+        offset = snap.get("offset", 0)
+        if snap.get("ino") != st.st_ino or offset > st.st_size or snap.get("top_n") != self.top_n:
+            return False
+        if "stats" not in snap:
+            return False   # snapshot d'avant les statistiques: reconstruction
+        if snap.get("tail") != self._tail(offset):
+            return False   # même fichier, mais réécrit depuis le snapshot
+        self._reset()
+        for row in snap.get("rows", []):
+            self._push(row)
+        self._stats = {label: MapStats.from_dict(d) for label, d in snap["stats"].items()}
+        self._offset = snap["offset"]
+        return True
+
+    def _tail(self, offset, n=64):
+        """Les derniers octets indexés: vérifie que le début du fichier n'a pas changé."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(max(0, offset - n))
+                return f.read(min(n, offset)).hex()
+        except OSError:
+            return None
+
+    def _snapshot_data(self):
+        rows = [item[3] for heap in self._heaps.values() for item in heap]
+        return {"ino": self._ino, "offset": self._offset, "top_n": self.top_n,
+                "tail": self._tail(self._offset), "rows": rows,
+                "stats": {label: st.to_dict() for label, st in self._stats.items()}}
+
+    def _write_snapshot(self, snap):
+        tmp = self._snapshot_path() + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snap, f)
+            os.replace(tmp, self._snapshot_path())
+        except OSError:
+            pass
+
+    def snapshot_async(self):
+        """Écrit l'index compacté en arrière-plan (thread daemon)."""
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        self._since_snapshot = 0
+        snap = self._snapshot_data()
+        self._snapshot_thread = threading.Thread(target=self._write_snapshot, args=(snap,), daemon=True)
+        self._snapshot_thread.start()
+
+    # ----- API -----
+    def top(self, map_label, limit=None):
+        """Les meilleures parties d'une carte, triées (au plus top_n)."""
+        with self._lock:
+            self._refresh()
+            heap = self._heaps.get(map_label, [])
+            rows = [item[3] for item in heap]
+        rows.sort(key=rank_key)
+        return rows[:limit] if limit is not None else rows
+
+    def stats(self, map_label):
+        """MapStats de toutes les parties d'une carte (None si aucune)."""
+        with self._lock:
+            self._refresh()
+            return self._stats.get(map_label)
+
+    def add(self, map_label, score, time_sec, when=None):
+        """Ajoute une partie: une ligne écrite en append, index mis à jour en O(log N)."""
+        from datetime import datetime   # seulement à l'écriture: pas au démarrage
+        row = {
+            "map": map_label,
+            "score": int(score),
+            "time_sec": float(time_sec),
+            "datetime": (when or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow([row[k] for k in FIELDS])
+        line = buf.getvalue().encode("utf-8")
+
+        with self._lock:
+            self._refresh()   # se mettre à jour avant d'écrire, pour que l'offset reste exact
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    line = (",".join(FIELDS) + "\n").encode("utf-8") + line
+                os.write(fd, line)
+                st = os.fstat(fd)
+            finally:
+                os.close(fd)
+            if st.st_ino != self._ino or st.st_size != self._offset + len(line):
+                # quelqu'un d'autre a écrit en même temps: relecture de la fin
+                self._ino = st.st_ino
+                self._parse_from(self._offset)
+            else:
+                self._push(row)
+                self._count(row)
+                self._offset = st.st_size
+            self._since_snapshot += 1
+            if self._since_snapshot >= SNAPSHOT_EVERY:
+                self.snapshot_async()
+        return row
+
+    def close(self):
+        """Écrit un dernier snapshot (synchrone) si des lignes ont été indexées depuis."""
+        with self._lock:
+            if self._loaded and self._since_snapshot:
+                self._since_snapshot = 0
+                self._write_snapshot(self._snapshot_data())
+
+
+_STORES = {}
+
+def get_store(path):
+    """Un ScoreStore partagé par fichier."""
+    store = _STORES.get(path)
+    if store is None:
+        store = _STORES[path] = ScoreStore(path)
+    return store
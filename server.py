@@ -0,0 +1,667 @@
+"""
+Multi-session game server: many players over TCP/telnet in one process.
+
+    python server.py                          # listen on SERVER_HOST:SERVER_PORT
+    telnet 127.0.0.1 4000                     # play: arrows/WASD, Enter, Q quits
+    python server.py --procs 4                # one event loop per core (SO_REUSEPORT, Linux)
+    python server.py bots --clients 1000      # load test against a running server
+
+Each connection is a GameSession (engine, renderer, camera) with its own
+terminal size, negotiated with telnet NAWS. Everything read-only is loaded
+once per process and shared by all sessions: parsed maps, attack patterns,
+the attack table and the reachable-cell index of each map size.
+
+One scheduler task ticks every session on the same fixed-step clock: per
+tick it reads each session's pending keys, runs its steps and sends the
+frame diff. A client whose socket is not draining (more than
+SERVER_SEND_BUFFER bytes queued) is skipped for rendering until it catches
+up; the next frame is then a diff against what it actually received.
+Saving a score runs in an executor. A stats line reports the sessions, the
+tick cost (whole tick and per session) and the memory per session.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import options as cfg
+from bitgrid import FreeCellIndex, GridState
+from engine import build_attack_table, load_attack_patterns, spawn_position
+from gameloop import FixedStepLoop
+from keyboard import KEY_DOWN, KEY_ENTER, KEY_UP, _Keyboard, decode_keys
+from mini_adventure import (
+    EMPTY_PREVIEW, GameSession, _load_map_cached, build_scoreboard_lines, list_maps, side_by_side,
+)
+from profiler import Histogram
+from render import cursor_to
+from replay import EMPTY_MAP
+from scores import get_store
+from tilemap import TileMap
+
+# Telnet (RFC 854): commandes et options utilisées
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+OPT_ECHO, OPT_SGA, OPT_NAWS = 1, 3, 31
+# le serveur fait l'écho (donc pas le client), mode caractère, taille de fenêtre demandée
+NEGOTIATE = bytes([IAC, WILL, OPT_ECHO, IAC, WILL, OPT_SGA, IAC, DO, OPT_NAWS])
+DEFAULT_SIZE = (80, 24)
+
+
+# ======================
+#   TELNET INPUT
+# ======================
+class TelnetInput(_Keyboard):
+    """
+    Clavier d'une connexion: les octets reçus sont débarrassés des commandes
+    telnet (NAWS donne la taille du terminal) puis décodés en touches, comme
+    PosixKeyboard. read_keys() rend les touches reçues depuis le dernier appel.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.size = DEFAULT_SIZE
+        self._keys = []
+        self._raw = b""    # commande telnet coupée entre deux lectures
+        self._rest = ""    # séquence d'échappement coupée
+        self._cr = False   # la lecture précédente finissait par "\r" (suite "\n"/"\0" à ignorer)
+
+    def feed(self, data):
+        data = self._raw + data
+        self._raw = b""
+        out = bytearray()
+        i, n = 0, len(data)
+        while i < n:
+            b = data[i]
+            if b != IAC:
+                out.append(b)
+                i += 1
+                continue
+            if i + 1 >= n:
+                self._raw = data[i:]
+                break
+            cmd = data[i + 1]
+            if cmd == IAC:
+                out.append(IAC)
+                i += 2
+            elif cmd in (WILL, WONT, DO, DONT):
+                if i + 2 >= n:
+                    self._raw = data[i:]
+                    break
+                i += 3
+            elif cmd == SB:
+                end = data.find(bytes([IAC, SE]), i + 2)
+                if end < 0:
+                    self._raw = data[i:]
+                    break
+                self._subnegotiation(data[i + 2:end].replace(bytes([IAC, IAC]), bytes([IAC])))
+                i = end + 2
+            else:
+                i += 2
+        # Entrée telnet: "\r\n" ou "\r\0" -> une seule touche, même coupé entre deux lectures
+        text = out.decode("utf-8", errors="ignore")
+        if self._cr and text[:1] in ("\n", "\0"):
+            text = text[1:]
+        if text:
+            self._cr = text.endswith("\r")
+        text = text.replace("\r\n", "\r").replace("\r\0", "\r")
+        keys, self._rest = decode_keys(self._rest + text)
+        if keys:
+            self._keys.extend(keys)
+            self.last_input_time = time.perf_counter()
+        return keys
+
+    def _subnegotiation(self, sub):
+        if len(sub) == 5 and sub[0] == OPT_NAWS:
+            cols, lines = (sub[1] << 8) | sub[2], (sub[3] << 8) | sub[4]
+            if cols and lines:
+                self.size = (cols, lines)
+
+    def read_keys(self):
+        keys, self._keys = self._keys, []
+        return keys
+
+    def wait(self, timeout):
+        return bool(self._keys)
+
+
+# ======================
+#   SHARED ASSETS
+# ======================
+# Per-process caches, read-only once filled: every session shares them.
+# Per-map entries are keyed like the map cache, by (path, mtime_ns): a map
+# edited while the server runs gets a new entry, and the oldest entries are
+# dropped past MAP_CACHE_SIZE.
+_PATTERNS = []
+_TABLES = {}
+_FREE = {}
+
+def load_assets():
+    """Patterns d'attaque (une fois par processus, via le pack si activé)."""
+    if not _PATTERNS:
+        if cfg.ASSET_CACHE:
+            from assets import get_pack, load_attack_patterns as load_packed
+            _PATTERNS.extend(load_packed(cfg.ATTACKS_DIR))
+            get_pack().save()
+        else:
+            _PATTERNS.extend(load_attack_patterns(cfg.ATTACKS_DIR))
+    return _PATTERNS
+
+def map_choices():
+    return [EMPTY_MAP] + list_maps(cfg.MAPS_DIR)
+
+def map_key(label):
+    """Clé des caches par carte: (chemin, mtime_ns), None pour la carte vide."""
+    if label == EMPTY_MAP:
+        return None
+    path = os.path.join(cfg.MAPS_DIR, label)
+    return path, os.stat(path).st_mtime_ns
+
+def load_map(label, key=None):
+    """(walls, start, w, h, aperçu) d'une carte, depuis le cache LRU du jeu (`key`: voir map_key)."""
+    if label == EMPTY_MAP:
+        return set(), None, cfg.GRID_W, cfg.GRID_H, EMPTY_PREVIEW
+    return _load_map_cached(*(key or map_key(label)))
+
+def _cached(cache, key, build):
+    """Entrée `key` de `cache`, construite au premier appel; les plus anciennes partent au-delà de MAP_CACHE_SIZE."""
+    if key not in cache:
+        while len(cache) >= cfg.MAP_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[key] = build()
+    return cache[key]
+
+def _load_table(w, h):
+    if (w, h) not in _TABLES:
+        _TABLES[w, h] = build_attack_table(load_assets(), w, h)
+    return _TABLES[w, h]
+
+def _load_free_cells(key, walls, start, w, h):
+    def build():
+        if isinstance(walls, TileMap):
+            return None
+        return FreeCellIndex.reachable(GridState(w, h, walls), spawn_position(start, walls, w, h))
+    return _cached(_FREE, key, build)
+
+
+# ======================
+#   CLIENT
+# ======================
+MENU, PLAYING, OVER = "menu", "playing", "over"
+
+class Client:
+    """Une connexion: menu des cartes, partie (tickée par le Scheduler), écran de fin."""
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.transport = writer.transport
+        self.input = TelnetInput()
+        self.state = MENU
+        self.idx = 0
+        self.maps = server.maps
+        self.game = None
+        self.bytes_out = 0
+        self.skipped = 0     # frames non construites (client en retard)
+        self.closed = False
+
+    # ----- sortie -----
+    def send(self, text):
+        if self.closed:
+            return
+        data = text.replace("\n", "\r\n").encode("utf-8")
+        self.writer.write(data)
+        self.bytes_out += len(data)
+
+    def backed_up(self):
+        return self.transport.get_write_buffer_size() > cfg.SERVER_SEND_BUFFER
+
+    # ----- connexion -----
+    async def run(self):
+        self.writer.write(NEGOTIATE)
+        self.draw_menu()
+        try:
+            while not self.closed:
+                data = await self.reader.read(4096)
+                if not data:
+                    break
+                keys = self.input.feed(data)
+                if self.state == MENU:
+                    self.on_menu_keys(self.input.read_keys())
+                elif self.state == OVER and keys:
+                    self.input.read_keys()
+                    if 'q' in keys:
+                        break
+                    self.state = MENU
+                    self.draw_menu()
+                # PLAYING: les touches attendent le prochain tick (GameSession.poll)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.state == PLAYING:
+            self.server.scheduler.remove(self)
+            self.game.close()
+        self.closed = True
+        self.writer.close()
+        self.server.clients.discard(self)
+
+    # ----- menu -----
+    def draw_menu(self):
+        """Menu des cartes (liste centrée sur la sélection, aperçu et Top 10 de la carte)."""
+        label = self.maps[self.idx]
+        try:
+            preview = load_map(label)[4]
+        except Exception as e:
+            preview = [f"Read error: {e}"]
+        store = get_store(cfg.HIGH_SCORE_FILE)
+        right = build_scoreboard_lines(store.top(label, 10), label, limit=10, stats=store.stats(label))
+        bottom = side_by_side([f"{cfg.COLOR_HUD_LABEL}Preview:{cfg.COLOR_RESET}"] + preview, right, gap=6)
+        page = max(3, min(cfg.MENU_PAGE_SIZE, self.input.size[1] - len(bottom) - 6))
+        first = max(0, min(self.idx - page // 2, len(self.maps) - page))
+        lines = [f"{cfg.COLOR_TITLE}{cfg.TITLE_TEXT}{cfg.COLOR_RESET}",
+                 f"{cfg.COLOR_HUD_LABEL}↑/↓ or W/S: select  |  Enter: play  |  Q: quit{cfg.COLOR_RESET}", ""]
+        for i in range(first, min(len(self.maps), first + page)):
+            cursor = f"{cfg.COLOR_TITLE_ACCENT}>{cfg.COLOR_RESET}" if i == self.idx else " "
+            lines.append(f"{cursor} {self.maps[i]}")
+        lines.append("")
+        lines.extend(bottom)
+        self.send("\x1b[H\x1b[2J" + "\n".join(lines) + "\n")
+
+    def on_menu_keys(self, keys):
+        for key in keys:
+            if key in (KEY_UP, 'w'):
+                self.idx = (self.idx - 1) % len(self.maps)
+            elif key in (KEY_DOWN, 's'):
+                self.idx = (self.idx + 1) % len(self.maps)
+            elif key == 'q':
+                self.send("\x1b[H\x1b[2JGoodbye!\n")
+                self.close()
+                return
+            elif key == KEY_ENTER:
+                self.start_game()
+                return
+        if keys:
+            self.draw_menu()
+
+    # ----- partie -----
+    def start_game(self):
+        label = self.maps[self.idx]
+        try:
+            key = map_key(label)   # un seul stat(): carte, index et champs de la même version
+            walls, start, w, h, _ = load_map(label, key)
+        except Exception as e:
+            self.send(f"{cfg.COLOR_DAMAGE}Read error: {e}{cfg.COLOR_RESET}\n")
+            return
+        policy = self.server.make_policy(key, walls, w, h)
+        self.game = GameSession(walls, start, load_assets(), label, self.input, policy,
+                                defer=True, grid_w=w, grid_h=h, attack_table=_load_table(w, h),
+                                free_cells=_load_free_cells(key, walls, start, w, h),
+                                size=lambda: self.input.size, record=cfg.SERVER_RECORD)
+        self.game.loop.start()
+        self.state = PLAYING
+        self.server.scheduler.add(self)
+
+    def tick(self, steps):
+        """Un passage du Scheduler: entrées, pas de simulation, frame (si le client suit)."""
+        game = self.game
+        game.poll(on_quit=self.quit)
+        if self.state != PLAYING:
+            return
+        game.run_steps(steps, poll=False)
+        if self.backed_up():
+            self.skipped += 1
+        else:
+            game.render()
+            data = game.renderer.take()
+            if data:
+                self.send(data)
+            self.input.frame_drawn()
+        if not game.engine.alive:
+            self.game_over()
+
+    def quit(self):
+        self.server.scheduler.remove(self)
+        self.game.close()
+        self.state = MENU
+        self.draw_menu()
+
+    def game_over(self):
+        game = self.game
+        engine = game.engine
+        self.server.scheduler.remove(self)
+        self.state = OVER
+        game.render()   # la frame du coup fatal, même pour un client en retard
+        renderer = game.renderer
+        data = renderer.take()
+        row = len(renderer.front_lines or ()) + len(renderer.front_grid or ()) + 1
+        self.send(data + cursor_to(row, 0) + "\x1b[J"
+                  f"{cfg.COLOR_DAMAGE}You were hit! GAME OVER.{cfg.COLOR_RESET}\n"
+                  f"Final score: {engine.score} | Time: {int(engine.now)}s\n"
+                  "Press any key to play again, Q to quit...\n")
+        asyncio.get_running_loop().run_in_executor(self.server.saver, game.save)
+
+
+# ======================
+#   SCHEDULER
+# ======================
+def rss_bytes():
+    """Mémoire résidente du processus (Linux: /proc, sinon pic via resource, 0 si inconnue)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+class Scheduler:
+    """
+    Une seule tâche à pas fixes pour toutes les parties en cours du processus.
+    Avec un FrameBroadcaster (`hub`), la plus ancienne partie en cours est diffusée
+    aux spectateurs; quand elle se termine, la suivante prend sa place.
+    """
+
+    def __init__(self, tick=None, hub=None):
+        self.loop = FixedStepLoop(cfg.TICK if tick is None else tick, max_catchup=cfg.MAX_CATCHUP_TICKS)
+        self.playing = {}           # Client -> None (ordre d'insertion, retrait en O(1))
+        self.hub = hub
+        self.featured = None
+        self.tick_cost = Histogram()      # µs par passage (toutes les parties)
+        self.session_cost = Histogram()   # µs par partie et par passage
+        self.passes = 0
+
+    def add(self, client):
+        self.playing[client] = None
+
+    def remove(self, client):
+        self.playing.pop(client, None)
+
+    async def run(self):
+        loop = self.loop
+        loop.start()
+        while True:
+            await asyncio.sleep(loop.time_left())
+            steps = loop.due()
+            if not steps:
+                continue
+            t0 = time.perf_counter()
+            for client in list(self.playing):
+                try:
+                    client.tick(steps)
+                except Exception as e:   # une partie cassée ne doit pas arrêter les autres
+                    print(f"session error: {e!r}", file=sys.stderr)
+                    client.close()
+            self._feature()
+            n = len(self.playing)
+            dt = int((time.perf_counter() - t0) * 1e6)
+            self.tick_cost.add(dt)
+            if n:
+                self.session_cost.add(dt // n)
+            self.passes += 1
+
+    def _feature(self):
+        if self.hub is None or self.featured in self.playing:
+            return
+        self.featured = next(iter(self.playing), None)
+        if self.featured is not None:
+            self.hub.restart()
+            self.featured.game.broadcast = self.hub
+
+    def reset_stats(self):
+        self.tick_cost = Histogram()
+        self.session_cost = Histogram()
+
+
+# ======================
+#   SERVER
+# ======================
+class GameServer:
+    def __init__(self, autopilot=False, watch_port=0):
+        self.clients = set()
+        self.watch_port = watch_port
+        self.hub = None
+        if watch_port:
+            from broadcast import FrameBroadcaster
+            self.hub = FrameBroadcaster()
+        self.scheduler = Scheduler(hub=self.hub)
+        self.maps = map_choices()
+        self.autopilot = autopilot
+        self._fields = {}
+        self.base_rss = 0
+        self.saver = ThreadPoolExecutor(max_workers=1)   # scores et fins d'enregistrement, hors du tick
+
+    def make_policy(self, key, walls, w, h):
+        """Autopilote côté serveur (tests de charge sans client qui joue), champs partagés par carte (map_key)."""
+        if not self.autopilot:
+            return None
+        from autopilot import DistanceFields, make_autopilot
+        fields = _cached(self._fields, key,
+                         lambda: None if isinstance(walls, TileMap) else DistanceFields(GridState(w, h, walls)))
+        return make_autopilot(fields)
+
+    async def handle(self, reader, writer):
+        if len(self.clients) >= cfg.SERVER_MAX_SESSIONS:
+            writer.write(b"Server full, try again later.\r\n")
+            writer.close()
+            return
+        client = Client(self, reader, writer)
+        self.clients.add(client)
+        await client.run()
+
+    def stats_line(self):
+        sched = self.scheduler
+        n, playing = len(self.clients), len(sched.playing)
+        tick, per = sched.tick_cost, sched.session_cost
+        rss = rss_bytes()
+        per_kb = (rss - self.base_rss) / n / 1024 if n and self.base_rss else 0.0
+        budget = sched.loop.step * 1e6
+        line = (f"[{os.getpid()}] {n} sessions ({playing} playing) | tick mean {tick.mean:.0f} µs, "
+                f"p99 {tick.percentile(99)} µs ({tick.mean / budget:.0%} of {budget / 1000:.0f} ms), "
+                f"{per.mean:.1f} µs/session | dropped {sched.loop.dropped} | "
+                f"rss {rss / 2**20:.1f} MB, {per_kb:.1f} KB/session")
+        if self.hub is not None:
+            line += " | " + self.hub.summary()
+        return line
+
+    async def report(self, every):
+        while True:
+            await asyncio.sleep(every)
+            print(self.stats_line(), flush=True)
+            self.scheduler.reset_stats()
+
+    async def serve(self, host, port, reuse_port=False):
+        load_assets()
+        self.base_rss = rss_bytes()
+        server = await asyncio.start_server(self.handle, host, port, reuse_port=reuse_port or None,
+                                            backlog=1024)
+        if self.hub is not None:
+            await self.hub.serve(host, self.watch_port)
+            print(f"[{os.getpid()}] spectators on {host}:{self.watch_port}", flush=True)
+        tasks = [asyncio.ensure_future(self.scheduler.run())]
+        if cfg.SERVER_STATS_EVERY:
+            tasks.append(asyncio.ensure_future(self.report(cfg.SERVER_STATS_EVERY)))
+        print(f"[{os.getpid()}] listening on {host}:{port}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.hub is not None:
+                self.hub.close()
+
+
+def raise_fd_limit():
+    """Autant de sockets que le système le permet (limite douce -> limite dure)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else 65536, hard))
+        except (ValueError, OSError):
+            pass
+
+def _serve_process(host, port, autopilot, reuse_port, watch_port=0):
+    try:
+        asyncio.run(GameServer(autopilot, watch_port).serve(host, port, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+# ======================
+#   LOAD TEST CLIENTS
+# ======================
+async def bot_client(host, port, stats, until, rng):
+    """Un joueur factice: annonce 80x24, choisit la première carte, appuie sur des touches au hasard."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats["failed"] += 1
+        return
+    stats["connected"] += 1
+    writer.write(bytes([IAC, SB, OPT_NAWS, 0, 80, 0, 24, IAC, SE]) + b"\r")
+    tail = b""
+
+    async def typing():
+        while True:
+            await asyncio.sleep(rng.uniform(0.1, 0.4))
+            writer.write(rng.choice((b"w", b"a", b"s", b"d")))
+
+    keys = asyncio.ensure_future(typing())
+    try:
+        while time.monotonic() < until:
+            try:
+                data = await asyncio.wait_for(reader.read(65536), until - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            stats["bytes"] += len(data)
+            if b"GAME OVER" in tail + data:
+                stats["games"] += 1
+                writer.write(b" \r")   # rejouer: n'importe quelle touche, puis Entrée au menu
+            tail = data[-16:]
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        keys.cancel()
+        writer.close()
+        stats["connected"] -= 1
+
+async def bot_watcher(host, port, stats, until, slow):
+    """Un spectateur factice; `slow`: lit 1 Ko toutes les 0,5 s (le serveur doit lui abandonner des frames)."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port, limit=1024)
+    except OSError:
+        stats["failed"] += 1
+        return
+    stats["watching"] += 1
+    try:
+        while time.monotonic() < until:
+            try:
+                data = await asyncio.wait_for(reader.read(1024 if slow else 65536), until - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            stats["watch_bytes"] += len(data)
+            if slow:
+                await asyncio.sleep(0.5)
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+        stats["watching"] -= 1
+
+async def run_bots(host, port, clients, seconds, ramp, watch_port=0, watchers=0):
+    stats = {"connected": 0, "failed": 0, "bytes": 0, "games": 0, "watching": 0, "watch_bytes": 0}
+    until = time.monotonic() + seconds
+    rng = random.Random()
+    tasks = []
+    for i in range(clients):
+        tasks.append(asyncio.ensure_future(bot_client(host, port, stats, until, random.Random(rng.getrandbits(32)))))
+        if ramp:
+            await asyncio.sleep(ramp / clients)
+    for i in range(watchers if watch_port else 0):
+        # un spectateur sur dix est lent
+        tasks.append(asyncio.ensure_future(bot_watcher(host, watch_port, stats, until, slow=i % 10 == 9)))
+    last, last_bytes = time.monotonic(), 0
+    while time.monotonic() < until:
+        await asyncio.sleep(min(5.0, max(0.1, until - time.monotonic())))
+        now = time.monotonic()
+        rate = (stats["bytes"] - last_bytes) / (now - last) / 1024
+        last, last_bytes = now, stats["bytes"]
+        line = (f"{stats['connected']} connected, {stats['failed']} failed | "
+                f"{rate:.0f} KB/s received | {stats['games']} games over")
+        if watchers:
+            line += f" | {stats['watching']} watching, {stats['watch_bytes'] // 1024} KB watched"
+        print(line, flush=True)
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ======================
+#   CLI
+# ======================
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Mini-Adventure multi-session TCP/telnet server")
+    ap.add_argument("cmd", nargs="?", choices=("serve", "bots"), default="serve")
+    ap.add_argument("--host", default=cfg.SERVER_HOST)
+    ap.add_argument("--port", type=int, default=cfg.SERVER_PORT)
+    ap.add_argument("--procs", type=int, default=1,
+                    help="serve: processes sharing the port (SO_REUSEPORT), one event loop each")
+    ap.add_argument("--autopilot", action="store_true",
+                    help="serve: sessions are played by the autopilot (load tests)")
+    ap.add_argument("--watch-port", type=int, default=0,
+                    help="spectator port: serve follows the oldest live session there, bots watch it (0 = off)")
+    ap.add_argument("--watchers", type=int, default=0, help="bots: also open this many spectator connections")
+    ap.add_argument("--clients", type=int, default=100, help="bots: connections to open")
+    ap.add_argument("--seconds", type=float, default=30.0, help="bots: test duration")
+    ap.add_argument("--ramp", type=float, default=2.0, help="bots: seconds to open all connections")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    raise_fd_limit()
+    if args.cmd == "bots":
+        try:
+            asyncio.run(run_bots(args.host, args.port, args.clients, args.seconds, args.ramp,
+                                 args.watch_port, args.watchers))
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.procs <= 1:
+        _serve_process(args.host, args.port, args.autopilot, False, args.watch_port)
+        return
+    if args.watch_port:
+        print("--watch-port needs a single process (--procs 1)", file=sys.stderr)
+        sys.exit(2)
+    # Patterns chargés avant fork: les processus partagent ces pages (copie à l'écriture)
+    import multiprocessing
+    load_assets()
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_serve_process, args=(args.host, args.port, args.autopilot, True))
+             for _ in range(args.procs)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Batch simulator: plays thousands of headless runs to balance maps and
+attack patterns.
+
+    python simulate.py --seeds 1000 --maps all --attacks attacks --out sim_runs.csv
+
+Every (seed, map, pattern set) combination is one run. Runs are spread
+across a process pool; each worker parses maps and patterns once and
+caches them. One CSV row per run is written, then a per-map summary is
+printed.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import options as cfg
+from bitgrid import FreeCellIndex, GridState
+from engine import (
+    load_attack_patterns, build_attack_table, simulate_run, idle_policy, make_random_policy,
+    spawn_position,
+)
+from autopilot import Autopilot, DistanceFields
+from tilemap import TileMap
+from mini_adventure import list_maps, read_map_file
+
+EMPTY_MAP = "Empty map"
+
+FIELDS = ["map", "patterns", "seed", "policy", "score", "time_sec", "waves", "hit"]
+
+# Per-process caches (filled lazily in each worker)
+_MAPS = {}
+_PATTERNS = {}
+_TABLES = {}
+_FREE = {}
+_FIELDS = {}
+
+def _load_map(name):
+    if name not in _MAPS:
+        if name == EMPTY_MAP:
+            _MAPS[name] = (set(), None, cfg.GRID_W, cfg.GRID_H)
+        else:
+            _MAPS[name] = read_map_file(os.path.join(cfg.MAPS_DIR, name))
+    return _MAPS[name]
+
+def _load_patterns(folder):
+    if folder not in _PATTERNS:
+        _PATTERNS[folder] = load_attack_patterns(folder)
+    return _PATTERNS[folder]
+
+def _load_table(folder, w, h):
+    key = (folder, w, h)
+    if key not in _TABLES:
+        _TABLES[key] = build_attack_table(_load_patterns(folder), w, h)
+    return _TABLES[key]
+
+def _load_free_cells(name):
+    """Index des cases atteignables d'une carte (None pour une carte en tuiles)."""
+    if name not in _FREE:
+        walls, start, w, h = _load_map(name)
+        if isinstance(walls, TileMap):
+            _FREE[name] = None
+        else:
+            spawn = spawn_position(start, walls, w, h)
+            _FREE[name] = FreeCellIndex.reachable(GridState(w, h, walls), spawn)
+    return _FREE[name]
+
+def _load_fields(name):
+    """Champs de distance de l'autopilote, partagés par toutes les parties d'une carte."""
+    if name not in _FIELDS:
+        walls, start, w, h = _load_map(name)
+        _FIELDS[name] = None if isinstance(walls, TileMap) else DistanceFields(GridState(w, h, walls))
+    return _FIELDS[name]
+
+def _make_policy(name, seed, map_name=None):
+    if name == "idle":
+        return idle_policy
+    if name == "random":
+        return make_random_policy(random.Random(seed ^ 0x5EED))
+    if name == "autopilot":
+        return Autopilot(_load_fields(map_name) if map_name is not None else None)
+    raise ValueError(f"Unknown policy: {name}")
+
+def run_one(job):
+    """Worker: joue une partie et retourne une ligne de stats."""
+    map_name, pattern_dir, seed, policy_name, max_time = job
+    walls, start, w, h = _load_map(map_name)
+    patterns = _load_patterns(pattern_dir)
+    engine = simulate_run(walls, start, w, h, patterns, seed,
+                          policy=_make_policy(policy_name, seed, map_name), max_time=max_time,
+                          attack_table=_load_table(pattern_dir, w, h),
+                          free_cells=_load_free_cells(map_name))
+    return {
+        "map": map_name,
+        "patterns": pattern_dir,
+        "seed": seed,
+        "policy": policy_name,
+        "score": engine.score,
+        "time_sec": round(engine.now, 3),
+        "waves": engine.wave_count,
+        "hit": int(not engine.alive),
+    }
+
+def run_chunk(jobs):
+    return [run_one(job) for job in jobs]
+
+def build_jobs(maps, pattern_dirs, seeds, policy, max_time):
+    return [(m, p, s, policy, max_time) for m in maps for p in pattern_dirs for s in seeds]
+
+def chunked(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+def run_batch(jobs, workers=None, chunk_size=64):
+    """Répartit les parties sur un pool de processus; workers=1 reste en local."""
+    if workers == 1:
+        return run_chunk(jobs)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(run_chunk, chunked(jobs, chunk_size)):
+            results.extend(part)
+    return results
+
+def summarize(rows):
+    by_key = {}
+    for r in rows:
+        by_key.setdefault((r["map"], r["patterns"]), []).append(r)
+    lines = []
+    for (m, p), rs in sorted(by_key.items()):
+        times = sorted(r["time_sec"] for r in rs)
+        mean_t = sum(times) / len(times)
+        mean_s = sum(r["score"] for r in rs) / len(rs)
+        median_t = times[len(times) // 2]
+        lines.append(f"{m:<20} {p:<12} runs={len(rs):>6}  mean_time={mean_t:7.2f}s  "
+                     f"median_time={median_t:7.2f}s  mean_score={mean_s:6.2f}")
+    return lines
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Headless Mini-Adventure batch simulator")
+    ap.add_argument("--maps", nargs="+", default=["all"],
+                    help="map file names in maps/, 'empty' for the default map, or 'all'")
+    ap.add_argument("--attacks", nargs="+", default=[cfg.ATTACKS_DIR],
+                    help="one or more pattern folders (each one is a pattern set)")
+    ap.add_argument("--seeds", type=int, default=100, help="number of seeds per map/pattern set")
+    ap.add_argument("--seed-start", type=int, default=0)
+    ap.add_argument("--policy", choices=["idle", "random", "autopilot"], default="random")
+    ap.add_argument("--max-time", type=float, default=600.0, help="simulated seconds before a run is cut")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    ap.add_argument("--out", default="sim_runs.csv")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    maps = []
+    for m in args.maps:
+        if m == "all":
+            maps.append(EMPTY_MAP)
+            maps.extend(list_maps(cfg.MAPS_DIR))
+        elif m.lower() == "empty":
+            maps.append(EMPTY_MAP)
+        else:
+            maps.append(m)
+
+    seeds = range(args.seed_start, args.seed_start + args.seeds)
+    jobs = build_jobs(maps, args.attacks, seeds, args.policy, args.max_time)
+
+    t0 = time.perf_counter()
+    rows = run_batch(jobs, workers=args.workers)
+    dt = time.perf_counter() - t0
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    for line in summarize(rows):
+        print(line)
+    rate = len(rows) / dt if dt > 0 else float("inf")
+    print(f"{len(rows)} runs in {dt:.2f}s ({rate:.0f} runs/s) -> {args.out}")
+
+if __name__ == "__main__":
+    main()
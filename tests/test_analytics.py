@@ -0,0 +1,53 @@
+"""The column fast path of analytics.py must agree with the csv path."""
+import random
+
+import analytics
+
+HEADER = b"map,score,time_sec,datetime\n"
+
+
+def make_rows(seed, n, times):
+    rng = random.Random(seed)
+    return b"".join(b"%s,%d,%s,2025-01-%02d 12:00:00\n" % (rng.choice([b"Ruins.map", b"Canal.map"]),
+                                                         rng.randint(0, 50), times(rng).encode(),
+                                                         rng.randint(1, 28))
+                    for _ in range(n))
+
+def scan_both(tmp_path, rows):
+    path = tmp_path / "scores.csv"
+    path.write_bytes(HEADER + rows)
+    fast, lines, skipped = analytics.scan_file(str(path), workers=1)
+    slow = {}
+    analytics._scan_rows(slow, rows.rstrip(b"\n"))
+    return fast, slow, lines, skipped
+
+def assert_same(fast, slow):
+    assert set(fast) == set(slow)
+    for label in fast:
+        a, b = fast[label].time, slow[label].time
+        assert (a.bins, a.zeros, a.count, a.min, a.max) == (b.bins, b.zeros, b.count, b.min, b.max)
+        assert abs(a.total - b.total) < 1e-6 * max(1.0, abs(b.total))
+        assert fast[label].score.bins == slow[label].score.bins
+        assert fast[label].days == slow[label].days
+
+
+def test_exact_min_max(tmp_path):
+    rows = make_rows(1, 5000, lambda rng: "%.2f" % rng.uniform(1, 300))
+    fast, slow, lines, skipped = scan_both(tmp_path, rows)
+    assert (lines, skipped) == (5000, 0)
+    assert_same(fast, slow)
+    for st in fast.values():
+        assert 1 <= st.time.min and st.time.max <= 300
+
+def test_zero_times_stay_on_column_path(tmp_path, monkeypatch):
+    rows = make_rows(2, 5000, lambda rng: rng.choice(["0.0", "0", "%.2f" % rng.uniform(0.5, 90)]))
+    fast, slow, lines, skipped = scan_both(tmp_path, rows)
+    assert_same(fast, slow)
+    assert sum(st.time.zeros for st in fast.values()) > 0
+
+    def no_csv(stats, body):
+        raise AssertionError("csv fallback used")
+    monkeypatch.setattr(analytics, "_scan_rows", no_csv)
+    again, lines, skipped = analytics.scan_file(str(tmp_path / "scores.csv"), workers=1)
+    assert (lines, skipped) == (5000, 0)
+    assert_same(again, slow)
@@ -0,0 +1,69 @@
+"""Fairness analyzer: trapped cells on small hand-built maps."""
+import options as cfg
+from analyze import Board, analyze_job, moves_in
+
+
+def mask(cells, w):
+    m = 0
+    for x, y in cells:
+        m |= 1 << (y * w + x)
+    return m
+
+def cells(m, w):
+    return {(i % w, i // w) for i in range(m.bit_length()) if m >> i & 1}
+
+
+# ----- Board.trapped -----
+def test_corridor_depends_on_moves():
+    # couloir de 10 cases, attaque sur les 6 premières: la case x est à 6 - x pas d'une case sûre
+    w = 10
+    board = Board(set(), (0, 0), w, 1)
+    at_2, at_4 = board.trapped(mask([(x, 0) for x in range(6)], w), 2, 4)
+    assert cells(at_2, w) == {(0, 0), (1, 0), (2, 0), (3, 0)}
+    assert cells(at_4, w) == {(0, 0), (1, 0)}
+
+def test_wall_makes_the_way_out_longer():
+    # "P.#.."   la case sûre (4, 0) est derrière le mur: on passe par la rangée du bas
+    # "..#.."
+    # "....."
+    walls = {(2, 0), (2, 1)}
+    w, h = 5, 3
+    board = Board(walls, (0, 0), w, h)
+    attack = mask([(x, y) for y in range(h) for x in range(w) if (x, y) not in walls | {(4, 0)}], w)
+    at_6, at_7 = board.trapped(attack, 6, 7)
+    assert cells(at_6, w) == {(0, 0), (1, 0), (0, 1)}   # 8, 7 et 7 pas
+    assert cells(at_7, w) == {(0, 0)}
+    assert board.trapped(attack, 8, 8) == (0, 0)
+
+def test_no_escape_across_rows():
+    # (3, 0) et (0, 1) sont voisines en bits, pas sur la carte: 4 pas, pas 1
+    w, h = 4, 3
+    board = Board(set(), (0, 0), w, h)
+    attack = mask([(x, y) for y in range(h) for x in range(w) if (x, y) != (0, 1)], w)
+    trapped, _ = board.trapped(attack, 1, 1)
+    assert (3, 0) in cells(trapped, w)
+    assert not cells(trapped, w) & {(0, 0), (1, 1), (0, 2)}
+
+
+# ----- analyze_job -----
+def test_analyze_job_counts_unfair_placements(tmp_path):
+    # couloir de 24 cases, ligne de 12: aux deux bouts, 12 pas pour sortir
+    (tmp_path / "corridor.map").write_text("P" + "." * 23 + "\n", encoding="utf-8")
+    pattern = tmp_path / "line.txt"
+    pattern.write_text("1" * 12 + "\n", encoding="utf-8")
+    assert moves_in(cfg.MIN_WARNING) < 12 <= moves_in(cfg.BASE_WARNING)
+    result = analyze_job(("corridor.map", str(tmp_path), str(pattern)))
+    assert result["fits"] and result["placements"] == 13   # l'orientation verticale ne rentre pas
+    assert (result["unfair_min"], result["unfair_base"], result["no_safe_cell"]) == (2, 0, 0)
+    assert result["worst"]["trapped_cells"] == 2 and result["worst"]["origin"] in ([0, 0], [12, 0])
+    assert result["heat"][0] == 1 / 13 and abs(sum(result["heat"]) - 12) < 1e-9
+
+def test_analyze_job_no_safe_cell(tmp_path):
+    # la rangée du bas est libre mais hors d'atteinte: une ligne sur la rangée du haut ne laisse aucune issue
+    (tmp_path / "closed.map").write_text("P.....\n######\n......\n", encoding="utf-8")
+    pattern = tmp_path / "line.txt"
+    pattern.write_text("111111\n", encoding="utf-8")
+    result = analyze_job(("closed.map", str(tmp_path), str(pattern)))
+    assert result["placements"] == 3   # une par rangée; celle du bas ne touche aucune case atteignable
+    assert (result["no_safe_cell"], result["unfair_min"], result["unfair_base"]) == (1, 1, 1)
+    assert result["worst"] == {"orientation": 0, "origin": [0, 0], "trapped_cells": 6}
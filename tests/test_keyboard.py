@@ -0,0 +1,84 @@
+"""Key decoding: CSI/SS3 sequences, sequences cut between reads and the lone Escape key."""
+import os
+import threading
+
+import pytest
+
+from keyboard import (ESCAPE_KEYS, KEY_DOWN, KEY_ENTER, KEY_ESC, KEY_LEFT, KEY_PGDN, KEY_PGUP, KEY_RIGHT,
+                      KEY_UP, PosixKeyboard, decode_keys)
+
+ARROWS = [KEY_UP, KEY_DOWN, KEY_RIGHT, KEY_LEFT]
+
+
+def decode_split(data, cuts):
+    """Décode `data` lu en morceaux, comme une suite de lectures: le reste passe à la suivante."""
+    keys, rest = [], ""
+    for a, b in zip((0,) + cuts, cuts + (len(data),)):
+        more, rest = decode_keys(rest + data[a:b])
+        keys.extend(more)
+    return keys, rest
+
+
+# ----- decode_keys -----
+@pytest.mark.parametrize("intro", ["[", "O"])
+def test_arrows(intro):
+    data = "".join("\x1b" + intro + c for c in "ABCD")
+    assert decode_keys(data) == (ARROWS, "")
+
+def test_every_known_sequence():
+    for seq, key in ESCAPE_KEYS.items():
+        assert decode_keys(seq) == ([key], "")
+    assert decode_keys("\x1b[5~\x1b[6~") == ([KEY_PGUP, KEY_PGDN], "")
+
+def test_plain_keys_and_enter():
+    assert decode_keys("wA\rq\n") == (["w", "a", KEY_ENTER, "q", KEY_ENTER], "")
+
+def test_unknown_sequences_are_skipped():
+    # F5 (CSI 15~), Shift+flèche (CSI 1;2A): ignorées, sans avaler la touche suivante
+    assert decode_keys("\x1b[15~w\x1b[1;2Aa\x1bOPs") == (["w", "a", "s"], "")
+
+@pytest.mark.parametrize("data", ["\x1b[A", "\x1bOB", "\x1b[5~", "w\x1b[Cd"])
+def test_split_sequences(data):
+    whole, _ = decode_keys(data)
+    for cut in range(1, len(data)):
+        assert decode_split(data, (cut,)) == (whole, ""), cut
+    assert decode_split(data, tuple(range(1, len(data)))) == (whole, "")
+
+def test_incomplete_sequence_is_kept():
+    assert decode_keys("a\x1b") == (["a"], "\x1b")
+    assert decode_keys("a\x1b[") == (["a"], "\x1b[")
+    assert decode_keys("\x1b[1;") == ([], "\x1b[1;")
+
+def test_escape_followed_by_a_key():
+    # Échap suivi d'une touche ordinaire: pas une séquence
+    assert decode_keys("\x1bq") == ([KEY_ESC, "q"], "")
+    assert decode_keys("\x1b\x1b[A") == ([KEY_ESC, KEY_UP], "")
+
+
+# ----- PosixKeyboard: Échap seul ou séquence coupée -----
+@pytest.fixture
+def pipe_keyboard():
+    if os.name == "nt":
+        pytest.skip("POSIX pipes")
+    r, w = os.pipe()
+    kb = PosixKeyboard(fd=r)
+    yield kb, w
+    os.close(r)
+    os.close(w)
+
+def test_lone_escape_after_grace(pipe_keyboard):
+    kb, w = pipe_keyboard
+    os.write(w, b"\x1b")
+    assert kb.read_keys() == [KEY_ESC]
+    assert kb.read_keys() == []
+
+def test_sequence_completed_within_grace(pipe_keyboard, monkeypatch):
+    kb, w = pipe_keyboard
+    monkeypatch.setattr(PosixKeyboard, "ESC_GRACE", 1.0)
+    os.write(w, b"\x1b[")
+    late = threading.Timer(0.05, os.write, (w, b"Bs"))
+    late.start()
+    try:
+        assert kb.read_keys() == [KEY_DOWN, "s"]
+    finally:
+        late.join()
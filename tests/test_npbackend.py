@@ -0,0 +1,69 @@
+"""The NumPy backend must give the same masks and glyphs as the pure-Python path."""
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import options as cfg
+import npbackend
+from bitgrid import GridState
+from engine import WaveTimeline, build_attack_table, load_attack_patterns, pick_attack_masks
+from mini_adventure import NP_GLYPHS, _grid_rows
+
+W, H = 40, 30
+
+
+@pytest.fixture(scope="module")
+def table():
+    return build_attack_table(load_attack_patterns(cfg.ATTACKS_DIR), W, H)
+
+def random_attacks(table, rng):
+    return [a for a in (pick_attack_masks(table, W, rng) for _ in range(rng.randint(1, 3))) if a]
+
+def random_grid(rng):
+    walls = {(rng.randrange(W), rng.randrange(H)) for _ in range(W * H // 5)}
+    return GridState(W, H, walls)
+
+def sample_times(timeline_levels):
+    """Instants d'échantillonnage: chaque niveau de vague, juste avant, et entre deux."""
+    times = {0.0, 1.0}
+    for t in timeline_levels:
+        times.update((t, t - 1e-9, t + cfg.WAVE_STAGGER / 2))
+    return sorted(t for t in times if t >= 0)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_array_timeline_matches_wave_timeline(table, seed):
+    rng = random.Random(seed)
+    attacks = random_attacks(table, rng)
+    ref = WaveTimeline(attacks)
+    arr = npbackend.ArrayTimeline(attacks, W, H)
+    assert arr.full == ref.full
+
+    levels = [t for t, _ in ref.appear] + [t for t, _ in ref.vanish]
+    # warning puis damage (appear), puis fade (vanish): chaque phase repart de zéro
+    for phase, ref_events, arr_times in (("warning", ref.appear, arr.appear),
+                                         ("damage", ref.appear, arr.appear),
+                                         ("idle", ref.vanish, arr.vanish)):
+        ref.rewind(ref_events)
+        arr.rewind(arr_times)
+        for t in sample_times(levels):
+            assert arr.advance(t) == ref.advance(t), (phase, t)
+            assert arr.visible_attacks(phase, t) == ref.visible_attacks(phase, t)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_glyph_rows_match_grid_rows(table, seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng)
+    timeline = WaveTimeline(random_attacks(table, rng))
+    damage = timeline.advance(rng.choice([0.0, 0.2, 1.0]))
+    warning = WaveTimeline(random_attacks(table, rng)).full
+    grid.set_layers(warning, damage)
+    grid.set_coin((rng.randrange(W), rng.randrange(H)))
+
+    for view in ((0, 0, W, H), (3, 5, 17, 11), (W - 7, H - 4, 7, 4)):
+        x0, y0, vw, vh = view
+        # joueur hors de la fenêtre: glyph_rows ne dessine pas le joueur
+        assert npbackend.glyph_rows(grid, view, NP_GLYPHS) == _grid_rows(-1, -1, grid, x0, y0, vw, vh)
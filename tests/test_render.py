@@ -0,0 +1,128 @@
+"""Frame output: the differential renderer's bytes and the game session's skip-unchanged-frames logic."""
+import options as cfg
+from engine import load_attack_patterns
+from mini_adventure import GRID_H, GRID_W, GameSession
+from render import DiffRenderer, cursor_to
+
+LINES = ["Title", "HUD"]
+GRID = [list("abc"), list("def")]
+FIELDS = {0: "Score: 1"}
+FULL = "\x1b[H\x1b[2J" + "Title\nHUD" + "\na b c    Score: 1" + "\nd e f"
+
+
+class NoKeys:
+    last_input_time = None
+
+    def read_keys(self):
+        return []
+
+    def frame_drawn(self):
+        pass
+
+
+def make_session():
+    return GameSession(set(), None, load_attack_patterns(cfg.ATTACKS_DIR), "Empty map", NoKeys(),
+                       seed=1, defer=True, grid_w=GRID_W, grid_h=GRID_H, size=(80, 24),
+                       record=False, threaded=False)
+
+
+# ----- GameSession: pas de frame quand rien n'a changé -----
+def test_rates_alone_do_not_redraw(monkeypatch):
+    monkeypatch.setattr(cfg, "SHOW_RATES", True)
+    session = make_session()
+    drawn = []
+    draw = session.draw
+
+    def spy(*args):
+        drawn.append(args)
+        return draw(*args)
+    session.draw = spy
+    session.render()
+    assert len(drawn) == 1
+    # les cadences retombent pendant une phase calme: le texte change, pas l'état
+    for rate in (20.0, 3.0, 0.4):
+        session.sim_rate._rate = rate
+        session.fps._rate = rate
+        session.render()
+    assert len(drawn) == 1
+
+def test_state_change_redraws_with_fresh_rates(monkeypatch):
+    monkeypatch.setattr(cfg, "SHOW_RATES", True)
+    session = make_session()
+    rates = []
+    draw = session.draw
+
+    def spy(renderer, viewport, per_attack, overlay=None, text=None):
+        rates.append(text)
+        return draw(renderer, viewport, per_attack, overlay, text)
+    session.draw = spy
+    session.render()
+    session.sim_rate._rate = 17.0
+    session.engine.now = 1.0   # le chrono (une fois par seconde) fait partie de l'état
+    session.render()
+    assert len(rates) == 2 and rates[1].startswith("sim 17 Hz")
+
+
+# ----- DiffRenderer: octets envoyés -----
+def renderer(size=(80, 24)):
+    term = [size]
+    r = DiffRenderer(field_col_gap=4, defer=True, size=lambda: term[0])
+    return r, term
+
+def frame(r, lines=LINES, grid=GRID, fields=FIELDS):
+    r.render(lines, [list(row) for row in grid], dict(fields))
+    return r.take()
+
+def test_first_frame_is_full():
+    r, _ = renderer()
+    assert frame(r) == FULL
+    assert r.full_repaints == 1
+
+def test_unchanged_frame_sends_nothing():
+    r, _ = renderer()
+    frame(r)
+    assert frame(r) == ""
+    assert r.last_bytes == 0 and r.full_repaints == 1
+
+def test_only_changed_cells_are_repainted():
+    r, _ = renderer()
+    frame(r)
+    # grille sous les 2 lignes de texte: la cellule (rx, ry) est en (2 + ry, 2 * rx)
+    assert frame(r, grid=[list("aXc"), list("def")]) == cursor_to(2, 2) + "X"
+    # deux voisines: un seul déplacement du curseur, puis " " + glyphe
+    assert frame(r, grid=[list("aXc"), list("dYZ")]) == cursor_to(3, 2) + "Y" + " Z"
+    assert frame(r, grid=[list("QXc"), list("dYW")]) == cursor_to(2, 0) + "Q" + cursor_to(3, 4) + "W"
+
+def test_changed_lines_and_fields():
+    r, _ = renderer()
+    frame(r)
+    assert frame(r, lines=["Title", "HUD 2"]) == cursor_to(1, 0) + "HUD 2\x1b[K"
+    assert frame(r) == cursor_to(1, 0) + "HUD\x1b[K"
+    col = 3 * 2 - 1 + 4   # après la grille (3 cellules espacées) et field_col_gap
+    assert frame(r, fields={0: "Score: 2"}) == cursor_to(2, col) + "Score: 2\x1b[K"
+    # champ retiré: effacé jusqu'à la fin de la ligne
+    assert frame(r, fields={}) == cursor_to(2, col) + "\x1b[K"
+
+def test_resize_and_layout_change_repaint():
+    r, term = renderer()
+    frame(r)
+    term[0] = (100, 30)
+    assert frame(r) == FULL
+    assert frame(r, grid=[list("abcd"), list("defg")]).startswith("\x1b[H\x1b[2J")
+    assert r.full_repaints == 3
+
+def test_invalidate_forces_full_repaint():
+    r, _ = renderer()
+    frame(r)
+    r.invalidate()
+    assert frame(r) == FULL
+    assert frame(r) == ""
+
+def test_keyframe_repaints_last_frame():
+    r, _ = renderer()
+    assert r.keyframe() == ""
+    frame(r)
+    moved = [list("aXc"), list("def")]
+    frame(r, grid=moved)
+    assert r.keyframe() == FULL.replace("a b c", "a X c")
+    assert frame(r, grid=moved) == ""   # keyframe() ne touche pas au front buffer
@@ -0,0 +1,201 @@
+"""ScoreStore: append-only CSV, per-map top N, tail re-reads and the .idx snapshot."""
+import json
+import os
+import random
+from datetime import datetime
+
+import pytest
+
+import scores
+from scores import FIELDS, SNAPSHOT_SUFFIX, ScoreStore, rank_key
+
+WHEN = datetime(2025, 1, 2, 12, 0, 0)
+
+
+def fill(store, rows):
+    for label, score, time_sec in rows:
+        store.add(label, score, time_sec, when=WHEN)
+
+def random_rows(seed, n, maps=("Ruins.map", "Canal.map", "Empty map")):
+    rng = random.Random(seed)
+    return [(rng.choice(maps), rng.randint(0, 30), round(rng.uniform(1, 200), 2)) for _ in range(n)]
+
+def expected_top(rows, label, top_n=10):
+    runs = [{"score": s, "time_sec": t} for m, s, t in rows if m == label]
+    return [(r["score"], r["time_sec"]) for r in sorted(runs, key=rank_key)[:top_n]]
+
+def top_pairs(store, label):
+    return [(r["score"], r["time_sec"]) for r in store.top(label)]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "high_scores.csv")
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Offsets passés à _parse_from: 0 = reconstruction complète."""
+    seen = []
+    parse = ScoreStore._parse_from
+
+    def spy(self, offset):
+        seen.append(offset)
+        return parse(self, offset)
+    monkeypatch.setattr(ScoreStore, "_parse_from", spy)
+    return seen
+
+
+# ----- ajout et classement -----
+def test_append_and_top_order(path):
+    rows = random_rows(1, 300)
+    store = ScoreStore(path)
+    fill(store, rows)
+    for label in ("Ruins.map", "Canal.map", "Empty map"):
+        assert top_pairs(store, label) == expected_top(rows, label)
+    assert len(store.top("Ruins.map", limit=3)) == 3
+    assert store.top("Nowhere.map") == []
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == ",".join(FIELDS) and len(lines) == 1 + len(rows)
+
+def test_ties_rank_shorter_time_first(path):
+    store = ScoreStore(path, top_n=2)
+    fill(store, [("A", 5, 30.0), ("A", 5, 10.0), ("A", 5, 20.0), ("A", 4, 1.0)])
+    assert top_pairs(store, "A") == [(5, 10.0), (5, 20.0)]
+
+
+# ----- autres écrivains, fichier remplacé ou tronqué -----
+def test_reads_rows_appended_by_another_writer(path, parses):
+    rows = random_rows(2, 50)
+    mine, other = ScoreStore(path), ScoreStore(path)
+    fill(mine, rows[:20])
+    fill(other, rows[20:35])
+    with open(path, "a", encoding="utf-8") as f:   # un autre processus, sans ScoreStore
+        f.writelines(f"{m},{s},{t},2025-01-03 08:00:00\n" for m, s, t in rows[35:])
+    offset = mine._offset
+    parses.clear()
+    for label in ("Ruins.map", "Canal.map", "Empty map"):
+        assert top_pairs(mine, label) == expected_top(rows, label)
+    assert parses == [offset]   # seulement la fin du fichier
+    fill(mine, [("Ruins.map", 99, 1.0)])   # l'écriture suivante part du bon offset
+    assert top_pairs(other, "Ruins.map")[0] == (99, 1.0)
+    assert sum(mine.stats(label).count for label in ("Ruins.map", "Canal.map", "Empty map")) == 51
+
+def test_partial_line_waits_for_its_end(path):
+    store = ScoreStore(path)
+    fill(store, [("A", 1, 5.0)])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("A,7,3.0,2025-01")
+    assert top_pairs(store, "A") == [(1, 5.0)]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("-03 08:00:00\n")
+    assert top_pairs(store, "A") == [(7, 3.0), (1, 5.0)]
+
+def test_rebuild_when_file_replaced(path, parses):
+    store = ScoreStore(path)
+    fill(store, random_rows(3, 40))
+    rows = random_rows(4, 25)
+    new = ScoreStore(path + ".new")
+    fill(new, rows)
+    os.replace(path + ".new", path)   # nouvel inode
+    parses.clear()
+    assert top_pairs(store, "Canal.map") == expected_top(rows, "Canal.map")
+    assert parses == [0]
+    assert store.stats("Canal.map").count == sum(1 for m, _, _ in rows if m == "Canal.map")
+
+def test_rebuild_when_file_truncated(path, parses):
+    store = ScoreStore(path)
+    fill(store, random_rows(5, 40))
+    rows = random_rows(6, 5)
+    with open(path, "w", encoding="utf-8") as f:   # même inode, plus court
+        f.write(",".join(FIELDS) + "\n")
+        f.writelines(f"{m},{s},{t},2025-01-04 09:00:00\n" for m, s, t in rows)
+    parses.clear()
+    assert top_pairs(store, "Ruins.map") == expected_top(rows, "Ruins.map")
+    assert parses == [0]
+
+
+# ----- snapshot .idx -----
+def snapshot(path, rows):
+    store = ScoreStore(path)
+    fill(store, rows)
+    store.close()
+    assert os.path.exists(path + SNAPSHOT_SUFFIX)
+
+def test_snapshot_loaded_without_reparsing(path, parses):
+    rows = random_rows(7, 120)
+    snapshot(path, rows)
+    parses.clear()
+    store = ScoreStore(path)
+    for label in ("Ruins.map", "Canal.map", "Empty map"):
+        assert top_pairs(store, label) == expected_top(rows, label)
+    assert parses == []
+    fill(ScoreStore(path), [("Canal.map", 50, 2.0)])   # ajouté après le snapshot
+    fresh = ScoreStore(path)
+    assert top_pairs(fresh, "Canal.map")[0] == (50, 2.0)
+    assert parses and 0 not in parses   # seulement les lignes d'après le snapshot
+
+def edit_snapshot(path, **changes):
+    with open(path + SNAPSHOT_SUFFIX, encoding="utf-8") as f:
+        snap = json.load(f)
+    snap.update(changes)
+    with open(path + SNAPSHOT_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(snap, f)
+
+@pytest.mark.parametrize("change", ["ino", "tail", "top_n"])
+def test_snapshot_rejected_on_mismatch(path, parses, change):
+    rows = random_rows(8, 60) + [("Ruins.map", 10, 5.0)]
+    snapshot(path, rows)
+    top_n = 10
+    if change == "ino":
+        edit_snapshot(path, ino=os.stat(path).st_ino + 1)
+    elif change == "tail":
+        # même inode et même taille, mais la dernière ligne réécrite sur place
+        with open(path, "r+b") as f:
+            f.seek(-len(b"Ruins.map,10,5.0,2025-01-02 12:00:00\n"), os.SEEK_END)
+            f.write(b"Ruins.map,99")
+        rows[-1] = ("Ruins.map", 99, 5.0)
+    else:
+        top_n = 3
+    parses.clear()
+    store = ScoreStore(path, top_n=top_n)
+    for label in ("Ruins.map", "Canal.map", "Empty map"):
+        assert top_pairs(store, label) == expected_top(rows, label, top_n)
+    assert parses == [0]
+
+def test_snapshot_from_before_stats_is_rebuilt(path, parses):
+    snapshot(path, random_rows(9, 30))
+    with open(path + SNAPSHOT_SUFFIX, encoding="utf-8") as f:
+        snap = json.load(f)
+    del snap["stats"]
+    with open(path + SNAPSHOT_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(snap, f)
+    parses.clear()
+    assert ScoreStore(path).stats("Ruins.map") is not None
+    assert parses == [0]
+
+def test_snapshot_written_in_background(path, monkeypatch):
+    monkeypatch.setattr(scores, "SNAPSHOT_EVERY", 25)
+    store = ScoreStore(path)
+    fill(store, random_rows(10, 30))
+    store._snapshot_thread.join()
+    with open(path + SNAPSHOT_SUFFIX, encoding="utf-8") as f:
+        snap = json.load(f)
+    assert snap["top_n"] == 10 and 0 < snap["offset"] <= os.path.getsize(path)
+
+
+# ----- statistiques par carte -----
+def test_map_stats_counts(path):
+    rows = random_rows(11, 200)
+    store = ScoreStore(path)
+    for i, (label, score, time_sec) in enumerate(rows):
+        store.add(label, score, time_sec, when=datetime(2025, 1, 1 + i % 3, 12, 0, 0))
+    store.close()
+    for reader in (store, ScoreStore(path)):   # en mémoire, puis depuis le snapshot
+        for label in ("Ruins.map", "Canal.map", "Empty map"):
+            mine = [(i, s, t) for i, (m, s, t) in enumerate(rows) if m == label]
+            st = reader.stats(label)
+            assert st.count == len(mine)
+            assert (st.score.min, st.score.max) == (min(s for _, s, _ in mine), max(s for _, s, _ in mine))
+            assert dict(st.days) == {f"2025-01-0{1 + d}": sum(1 for i, _, _ in mine if i % 3 == d)
+                                     for d in range(3) if any(i % 3 == d for i, _, _ in mine)}
+    assert store.stats("Nowhere.map") is None
@@ -0,0 +1,190 @@
+"""Seeded runs: per-subsystem streams, replay round trip and the reachable-cell index."""
+import random
+
+import pytest
+
+import options as cfg
+from bitgrid import FreeCellIndex, GridState
+from engine import (ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT, ACTION_UP, Engine, WaveScheduler,
+                    build_attack_table, load_attack_patterns)
+from replay import (EMPTY_MAP, OUTCOME_HIT, OUTCOME_QUIT, REPLAY_EXT, RunRecorder, prune_replays,
+                    read_recording, verify)
+
+W, H = cfg.GRID_W, cfg.GRID_H
+MOVES = (None, ACTION_UP, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT)
+
+
+@pytest.fixture(scope="module")
+def patterns():
+    return load_attack_patterns(cfg.ATTACKS_DIR)
+
+@pytest.fixture(scope="module")
+def table(patterns):
+    return build_attack_table(patterns, W, H)
+
+def make_engine(patterns, table, **seeding):
+    return Engine(set(), None, W, H, patterns, attack_table=table, **seeding)
+
+def play(engine, policy, max_ticks=3000):
+    """Joue jusqu'au coup fatal; retourne les tours vus (attaques, multi) et les actions jouées."""
+    waves, actions = [], []
+    for n in range(max_ticks):
+        action = policy(n)
+        actions.append(action)
+        was_warning = engine.phase == 'warning'
+        alive = engine.step(n * cfg.TICK, action)
+        if engine.phase == 'warning' and not was_warning:
+            waves.append((engine.current_attacks, engine.multi_active))
+        if not alive:
+            break
+    return waves, actions
+
+def idle(n):
+    return None
+
+def walker(seed):
+    rng = random.Random(seed)
+    return lambda n: rng.choice(MOVES)
+
+
+# ----- flux séparés -----
+@pytest.mark.parametrize("seed", [1, 42, 2 ** 62 + 7])
+def test_same_seed_same_waves(patterns, table, seed):
+    a, _ = play(make_engine(patterns, table, seed=seed), walker(0))
+    b, _ = play(make_engine(patterns, table, seed=seed), walker(0))
+    assert a and a == b
+
+@pytest.mark.parametrize("seed", [3, 1234])
+def test_player_does_not_shift_waves(patterns, table, seed):
+    # des déplacements (et pièces) différents: mêmes tours, jusqu'à la fin de la plus courte
+    runs = [play(make_engine(patterns, table, seed=seed), policy)[0]
+            for policy in (idle, walker(1), walker(2))]
+    n = min(len(r) for r in runs)
+    assert n > 0
+    assert runs[0][:n] == runs[1][:n] == runs[2][:n]
+
+def test_coin_draws_do_not_shift_attack_stream(patterns, table):
+    plain = make_engine(patterns, table, seed=99)
+    busy = make_engine(patterns, table, seed=99)
+    for _ in range(200):
+        busy._spawn_coin()   # tirages du flux des pièces seulement
+    for _ in range(10):
+        a, b = plain.waves.next(), busy.waves.next()
+        assert (a.index, a.attacks, a.multi) == (b.index, b.attacks, b.multi)
+
+def test_lookahead_does_not_change_waves(table):
+    grid = GridState(W, H, set())
+    ahead = WaveScheduler.seeded(5, table, grid, lookahead=4)
+    late = WaveScheduler.seeded(5, table, grid, lookahead=0)
+    ahead.fill(budget=4)
+    assert len(ahead.upcoming()) == 4
+    for _ in range(12):
+        a, b = ahead.next(), late.next()
+        assert (a.index, a.attacks, a.multi, a.timings) == (b.index, b.attacks, b.multi, b.timings)
+        ahead.fill()
+
+
+# ----- enregistrement -> vérification -----
+def record_run(path, engine, seed, policy):
+    rec = RunRecorder(str(path), seed, EMPTY_MAP, cfg.ATTACKS_DIR, grid_w=W, grid_h=H)
+    n = 0
+    for n in range(3000):
+        action = policy(n)
+        rec.record(n, action)
+        if not engine.step(n * cfg.TICK, action):
+            break
+    outcome = OUTCOME_QUIT if engine.alive else OUTCOME_HIT
+    rec.finish(outcome, engine.score, n + 1, engine.now)
+    return engine
+
+def check(path):
+    return verify(str(path), maps_dir=cfg.MAPS_DIR, attacks_dir=cfg.ATTACKS_DIR)
+
+def test_replay_round_trip_v2(tmp_path, patterns, table):
+    path = tmp_path / "run.mrp"
+    engine = record_run(path, make_engine(patterns, table, seed=77), 77, walker(3))
+    assert read_recording(str(path))["version"] == 2
+    result = check(path)
+    assert result["ok"], result.get("reason")
+    assert (result["score"], result["time_sec"]) == (engine.score, engine.now)
+
+def test_replay_round_trip_v1(tmp_path, patterns, table):
+    # version 1: un seul flux Random(seed) pour tout, comme avant les flux séparés
+    path = tmp_path / "run.mrp"
+    record_run(path, make_engine(patterns, table, rng=random.Random(77)), 77, walker(3))
+    data = bytearray(path.read_bytes())
+    data[4] = 1   # octet de version de l'en-tête
+    path.write_bytes(bytes(data))
+    assert read_recording(str(path))["version"] == 1
+    result = check(path)
+    assert result["ok"], result.get("reason")
+
+def test_replay_detects_wrong_score(tmp_path, patterns, table):
+    path = tmp_path / "run.mrp"
+    engine = make_engine(patterns, table, seed=8)
+    rec = RunRecorder(str(path), 8, EMPTY_MAP, cfg.ATTACKS_DIR, grid_w=W, grid_h=H)
+    for n in range(50):
+        engine.step(n * cfg.TICK)
+    rec.finish(OUTCOME_QUIT, engine.score + 5, 50, engine.now)
+    assert not check(path)["ok"]
+
+def test_prune_keeps_newest_recordings(tmp_path):
+    names = [f"202501{d:02d}-120000_{d:016x}{REPLAY_EXT}" for d in range(1, 8)]
+    for name in reversed(names):
+        (tmp_path / name).write_bytes(b"MRUN")
+    (tmp_path / "notes.txt").write_text("pas un enregistrement", encoding="utf-8")
+    assert prune_replays(str(tmp_path), keep=3) == 4
+    assert sorted(p.name for p in tmp_path.iterdir()) == names[-3:] + ["notes.txt"]
+    assert prune_replays(str(tmp_path), keep=0) == 0
+    assert prune_replays(str(tmp_path / "missing"), keep=3) == 0
+
+
+# ----- index des cases atteignables -----
+MAP_W, MAP_H = 20, 12
+
+def walled_grid():
+    """Carte coupée en deux par un mur vertical: la moitié droite est inatteignable depuis (0, 0)."""
+    walls = {(10, y) for y in range(MAP_H)}
+    return GridState(MAP_W, MAP_H, walls), walls
+
+def test_free_cell_index_only_reachable_cells():
+    grid, walls = walled_grid()
+    index = FreeCellIndex.reachable(grid, (0, 0))
+    expected = {(x, y) for y in range(MAP_H) for x in range(10)}
+    assert len(index) == len(expected)
+    assert all(pos in index for pos in expected)
+    assert (10, 0) not in index and (11, 0) not in index
+
+def test_free_cell_index_pick_discard_add():
+    grid, _ = walled_grid()
+    index = FreeCellIndex.reachable(grid, (0, 0))
+    reachable = {(x, y) for y in range(MAP_H) for x in range(10)}
+    rng = random.Random(0)
+    taken = set()
+    for _ in range(500):
+        player = (rng.randrange(10), rng.randrange(MAP_H))
+        pos = index.pick(rng, (player,))
+        assert pos in reachable and pos != player and pos not in taken
+        assert index.discard(pos)
+        taken.add(pos)
+        if len(taken) > 30 or rng.random() < 0.5:   # pièces ramassées: cases rendues
+            back = taken.pop()
+            index.add(back)
+            assert back in index
+        assert len(index) == len(reachable) - len(taken)
+        assert {c for c in reachable if c in index} == reachable - taken
+    assert not index.discard((11, 0))   # hors de l'index: rien à retirer
+
+def test_free_cell_index_pick_when_full():
+    grid = GridState(2, 1, set())
+    index = FreeCellIndex.reachable(grid, (0, 0))
+    assert index.pick(random.Random(0), ((0, 0),)) == (1, 0)
+    index.discard((1, 0))
+    assert index.pick(random.Random(0), ((0, 0),)) is None
+
+def test_free_cell_index_copy_is_independent():
+    grid, _ = walled_grid()
+    index = FreeCellIndex.reachable(grid, (0, 0))
+    copy = index.copy()
+    copy.discard((0, 0))
+    assert (0, 0) in index and (0, 0) not in copy
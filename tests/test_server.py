@@ -0,0 +1,145 @@
+"""Telnet server: IAC/NAWS parsing, per-map caches and a localhost smoke test with a bot."""
+import asyncio
+import os
+import random
+import socket
+import time
+
+import pytest
+
+import options as cfg
+import server
+from keyboard import KEY_DOWN, KEY_ENTER, KEY_UP
+from server import (DEFAULT_SIZE, DO, IAC, OPT_ECHO, OPT_NAWS, SB, SE, WILL, GameServer, TelnetInput,
+                    bot_client)
+
+
+def naws(cols, lines):
+    return bytes([IAC, SB, OPT_NAWS, cols >> 8, cols & 255, lines >> 8, lines & 255, IAC, SE])
+
+def feed_split(data, cuts):
+    """Les touches de `data` envoyé en morceaux (coupé aux positions `cuts`)."""
+    tin = TelnetInput()
+    keys = []
+    for a, b in zip((0,) + cuts, cuts + (len(data),)):
+        keys.extend(tin.feed(data[a:b]))
+    assert tin.read_keys() == keys
+    return tin, keys
+
+
+# ----- TelnetInput -----
+def test_negotiation_is_stripped():
+    tin = TelnetInput()
+    data = bytes([IAC, WILL, OPT_ECHO]) + b"w" + bytes([IAC, DO, OPT_NAWS]) + b"s"
+    assert tin.feed(data) == ["w", "s"]
+    assert tin.size == DEFAULT_SIZE
+
+def test_naws_sets_terminal_size():
+    tin = TelnetInput()
+    assert tin.feed(naws(132, 50) + b"q") == ["q"]
+    assert tin.size == (132, 50)
+    tin.feed(naws(0, 0))   # taille inconnue: on garde la précédente
+    assert tin.size == (132, 50)
+
+def test_naws_with_escaped_iac():
+    # 255 colonnes: l'octet 255 est doublé dans la sous-négociation
+    tin = TelnetInput()
+    data = bytes([IAC, SB, OPT_NAWS, 0, IAC, IAC, 0, 40, IAC, SE]) + b"a"
+    assert tin.feed(data) == ["a"]
+    assert tin.size == (255, 40)
+
+def test_escaped_iac_in_data_is_not_a_command():
+    tin = TelnetInput()
+    tin.feed(bytes([IAC, IAC]) + b"d")
+    assert tin._raw == b"" and tin.read_keys()[-1] == "d"
+
+@pytest.mark.parametrize("cut", range(1, 9))
+def test_naws_split_across_feeds(cut):
+    tin, keys = feed_split(naws(100, 30) + b"w", (cut,))
+    assert keys == ["w"] and tin.size == (100, 30)
+
+@pytest.mark.parametrize("cuts", [(1,), (2,), (1, 2), (3, 4)])
+def test_option_split_across_feeds(cuts):
+    _, keys = feed_split(b"a" + bytes([IAC, WILL, OPT_ECHO]) + b"d", cuts)
+    assert keys == ["a", "d"]
+
+def test_enter_and_arrows():
+    data = b"\r\n" + b"\r\0" + b"\x1b[A" + naws(90, 20) + b"\x1bOB" + b"\r"
+    for cuts in ((), (1,), (3, 5), (len(data) - 3,)):
+        tin, keys = feed_split(data, cuts)
+        assert keys == [KEY_ENTER, KEY_ENTER, KEY_UP, KEY_DOWN, KEY_ENTER], cuts
+        assert tin.size == (90, 20)
+
+def test_last_input_time_only_on_keys():
+    tin = TelnetInput()
+    tin.feed(naws(80, 25))
+    assert tin.last_input_time is None
+    tin.feed(b"x")
+    assert tin.last_input_time is not None and tin.wait(0)
+
+
+# ----- caches par carte -----
+def test_free_cells_rebuilt_when_map_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "MAPS_DIR", str(tmp_path))
+    monkeypatch.setattr(server, "_FREE", {})
+    path = tmp_path / "edit.map"
+    path.write_text("P....\n.....\n", encoding="utf-8")
+    key = server.map_key("edit.map")
+    walls, start, w, h, _ = server.load_map("edit.map", key)
+    before = server._load_free_cells(key, walls, start, w, h)
+    assert len(before) == 10
+    assert server._load_free_cells(server.map_key("edit.map"), walls, start, w, h) is before
+    path.write_text("P.#..\n..#..\n", encoding="utf-8")
+    os.utime(path, ns=(key[1] + 10 ** 9, key[1] + 10 ** 9))
+    key = server.map_key("edit.map")
+    walls, start, w, h, _ = server.load_map("edit.map", key)
+    assert (2, 0) in walls
+    assert len(server._load_free_cells(key, walls, start, w, h)) == 4
+
+def test_free_cells_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(cfg, "MAP_CACHE_SIZE", 3)
+    monkeypatch.setattr(server, "_FREE", {})
+    for mtime in range(10):
+        server._load_free_cells(("a.map", mtime), set(), None, 4, 4)
+    assert list(server._FREE) == [("a.map", 7), ("a.map", 8), ("a.map", 9)]
+
+
+# ----- serveur local + un bot -----
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_server_smoke(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "MAPS_DIR", str(tmp_path))   # menu: la carte vide seulement
+    monkeypatch.setattr(cfg, "HIGH_SCORE_FILE", str(tmp_path / "scores.csv"))
+    monkeypatch.setattr(cfg, "SERVER_STATS_EVERY", 0)
+    monkeypatch.setattr(cfg, "SERVER_RECORD", False)
+    port = free_port()
+    stats = {"connected": 0, "failed": 0, "bytes": 0, "games": 0}
+
+    async def scenario():
+        game = GameServer()
+        serving = asyncio.ensure_future(game.serve("127.0.0.1", port))
+        for _ in range(200):   # attendre l'écoute
+            try:
+                _, probe = await asyncio.open_connection("127.0.0.1", port)
+                probe.close()
+                break
+            except OSError:
+                await asyncio.sleep(0.02)
+        bot = asyncio.ensure_future(bot_client("127.0.0.1", port, stats, time.monotonic() + 1.5,
+                                               random.Random(0)))
+        seen = set()
+        while not bot.done():
+            seen.update(c.state for c in game.clients)
+            await asyncio.sleep(0.05)
+        passes = game.scheduler.passes
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+        return seen, passes
+
+    seen, passes = asyncio.run(scenario())
+    assert stats["failed"] == 0 and stats["connected"] == 0   # connecté, puis fermé proprement
+    assert server.PLAYING in seen
+    assert passes > 0 and stats["bytes"] > 1000
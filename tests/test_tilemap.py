@@ -0,0 +1,178 @@
+"""Chunked tile maps (.tmap) must behave like the ASCII map they were converted from."""
+import random
+
+import pytest
+
+import options as cfg
+from bitgrid import FreeCellIndex, GridState
+from engine import Engine, attack_cells, build_attack_table, load_attack_patterns, spawn_position
+from mini_adventure import _grid_rows, read_map_file
+from tilemap import ChunkedGridState, TileMap, convert_ascii
+
+W, H = 37, 23   # pas un multiple de la taille de tuile
+CHUNK = 8
+
+
+def write_map(path, seed, w=W, h=H, start=(5, 7)):
+    rng = random.Random(seed)
+    rows = []
+    for y in range(h):
+        row = ["#" if rng.random() < 0.2 else "." for _ in range(w)]
+        if (0, y) == (0, start[1]):
+            row[start[0]] = "P"
+        rows.append("".join(row))
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    return rows
+
+@pytest.fixture
+def maps(tmp_path):
+    """(carte ASCII, carte .tmap) lues par read_map_file."""
+    src = tmp_path / "odd.map"
+    write_map(src, 1)
+    dst = convert_ascii(str(src), chunk=CHUNK)
+    return read_map_file(str(src)), read_map_file(dst)
+
+@pytest.fixture(scope="module")
+def patterns():
+    return load_attack_patterns(cfg.ATTACKS_DIR)
+
+
+# ----- conversion: même carte que la source ASCII -----
+def tile_order_first(walls, w, h, exclude=()):
+    """Première case libre dans l'ordre des tuiles de CHUNK cases (comme TileMap.first_free)."""
+    for ty in range(0, h, CHUNK):
+        for tx in range(0, w, CHUNK):
+            for y in range(ty, min(ty + CHUNK, h)):
+                for x in range(tx, min(tx + CHUNK, w)):
+                    if (x, y) not in walls and (x, y) not in exclude:
+                        return (x, y)
+    return None
+
+@pytest.mark.parametrize("size", [(37, 23), (9, 17), (8, 8), (1, 13)])
+def test_convert_round_trip(tmp_path, size):
+    w, h = size
+    src = tmp_path / "odd.map"
+    rows = write_map(src, w * h, w, h, start=(min(5, w - 1), min(7, h - 1)))
+    rows[2] = rows[2][:max(1, w // 2)]   # rangée courte: complétée par du sol
+    src.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    walls, start, aw, ah = read_map_file(str(src))
+    tiles = TileMap(convert_ascii(str(src), chunk=CHUNK))
+    assert (tiles.w, tiles.h, tiles.start) == (aw, ah, start) == (w, h, start)
+    for y in range(h):
+        for x in range(w):
+            assert tiles.is_wall(x, y) == ((x, y) in walls), (x, y)
+    assert not tiles.is_wall(-1, 0) and not tiles.is_wall(w, h - 1)
+    grid = GridState(w, h, walls)
+    for view in ((0, 0, w, h), (w // 3, h // 2, w - w // 3, h - h // 2), (w - 1, 1, 1, h - 1)):
+        assert tiles.window(*view) == grid.window_walls(*view), view
+    assert tiles.first_free() == tile_order_first(walls, w, h)
+    taken = {tile_order_first(walls, w, h)}
+    assert tiles.first_free(exclude=taken) == tile_order_first(walls, w, h, taken)
+
+def test_chunked_free_mask_matches_bitplanes(maps):
+    (walls, start, w, h), (tiles, _, _, _) = maps
+    ref, chunked = GridState(w, h, walls), ChunkedGridState(tiles)
+    exclude = {start, (0, 0), (w - 1, h - 1), (12, 9)}
+    assert chunked.free_mask() == ref.free_mask()
+    assert chunked.free_mask(exclude) == ref.free_mask(exclude)
+    for view in ((0, 0, w, h), (3, 5, 17, 11), (w - 9, h - 6, 9, 6), (12, 9, 1, 1)):
+        assert chunked.free_mask(exclude, window=view) == ref.free_mask(exclude, window=view), view
+    # fenêtre: bits locaux (y - y0) * vw + x - x0
+    x0, y0, vw, vh = 3, 5, 17, 11
+    mask = chunked.free_mask(window=(x0, y0, vw, vh))
+    assert all(((mask >> ((y - y0) * vw + x - x0)) & 1) == ((x, y) not in walls)
+               for y in range(y0, y0 + vh) for x in range(x0, x0 + vw))
+
+
+# ----- moteur sur tuiles: attaques en coordonnées locales -----
+@pytest.mark.parametrize("seed", [1, 7, 2024])
+def test_chunked_engine_matches_bitplanes(maps, patterns, seed):
+    (walls, start, w, h), (tiles, tstart, tw, th) = maps
+    table = build_attack_table(patterns, w, h)
+    ref = Engine(walls, start, w, h, patterns, seed=seed, attack_table=table)
+    chunked = Engine(tiles, tstart, tw, th, patterns, seed=seed, attack_table=table)
+    view = (0, 0, w, h)
+    for n in range(int(40 / cfg.TICK)):
+        now = n * cfg.TICK
+        assert chunked.step(now) == ref.step(now)
+        # on ignore le coup fatal pour parcourir plusieurs tours
+        ref.alive = chunked.alive = True
+        assert (chunked.phase, chunked.wave_count) == (ref.phase, ref.wave_count)
+        assert ([sorted(attack_cells(a, m, w)) for a in chunked.current_attacks for _, m in a]
+                == [sorted(attack_cells(a, m, w)) for a in ref.current_attacks for _, m in a])
+        assert chunked.update_layers() == ref.update_layers()
+        for plane in ("warning", "damage"):
+            assert (chunked.grid.window_bits(getattr(chunked.grid, plane), *view)
+                    == ref.grid.window_bits(getattr(ref.grid, plane), *view)), (n, plane)
+        if n % 7 == 0:
+            assert ([chunked.grid.hit(x, y) for y in range(h) for x in range(w)]
+                    == [ref.grid.hit(x, y) for y in range(h) for x in range(w)])
+    assert ref.wave_count >= 3
+
+def test_chunked_planes_render_like_bitplanes(maps, patterns):
+    (walls, start, w, h), (tiles, tstart, tw, th) = maps
+    ref = Engine(walls, start, w, h, patterns, seed=3)
+    chunked = Engine(tiles, tstart, tw, th, patterns, seed=3)
+    for n in range(int(20 / cfg.TICK)):
+        ref.step(n * cfg.TICK)
+        chunked.step(n * cfg.TICK)
+        ref.alive = chunked.alive = True
+        ref.update_layers()
+        chunked.update_layers()
+        chunked.grid.set_coin(ref.coin_pos)   # pièces: flux identique, index différent
+        for x0, y0, vw, vh in ((0, 0, w, h), (3, 5, 17, 11), (w - 9, h - 6, 9, 6)):
+            assert (_grid_rows(ref.px, ref.py, chunked.grid, x0, y0, vw, vh)
+                    == _grid_rows(ref.px, ref.py, ref.grid, x0, y0, vw, vh))
+
+def test_chunked_grid_has_no_map_sized_planes(maps, patterns):
+    _, (tiles, start, w, h) = maps
+    engine = Engine(tiles, start, w, h, patterns, seed=5)
+    for n in range(int(30 / cfg.TICK)):
+        engine.step(n * cfg.TICK)
+        engine.alive = True
+        engine.update_layers()
+        for plane in (engine.grid.warning, engine.grid.damage, engine.grid.coin):
+            for (ox, oy, rw, rh), mask in plane:
+                assert mask.bit_length() <= rw * rh < w * h
+
+
+# ----- couche reach: pièces jamais dans une poche fermée -----
+POCKET_MAP = [
+    "P.........#.....",
+    "..........#.....",
+    "######....#.###.",
+    "....#.....#.#.#.",
+    ".##.#.....#.###.",
+    "....#.....#.....",
+    "###########.....",
+    ".........#......",
+    ".........#......",
+]
+
+@pytest.mark.parametrize("seed", [0, 5, 11, 17])
+def test_reach_layer_matches_flood_fill(tmp_path, seed):
+    src = tmp_path / "pockets.map"
+    rng = random.Random(seed)
+    rows = [("".join("#" if rng.random() < 0.45 else "." for _ in range(rng.randint(20, 41))))
+            for _ in range(rng.randint(10, 30))]
+    src.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    walls, start, w, h = read_map_file(str(src))
+    tiles = TileMap(convert_ascii(str(src), chunk=CHUNK))
+    index = FreeCellIndex.reachable(GridState(w, h, walls), spawn_position(start, walls, w, h))
+    for y in range(h):
+        for x in range(w):
+            assert tiles.is_reachable(x, y) == ((x, y) in index), (x, y)
+
+def test_chunked_coins_stay_reachable(tmp_path, patterns):
+    src = tmp_path / "pockets.map"
+    src.write_text("\n".join(POCKET_MAP) + "\n", encoding="utf-8")
+    walls, start, w, h = read_map_file(str(src))
+    reachable = FreeCellIndex.reachable(GridState(w, h, walls), start)
+    tiles, tstart, tw, th = read_map_file(convert_ascii(str(src), chunk=CHUNK))
+    for pocket in ((13, 3), (0, 4), (0, 8)):   # cases libres, mais dans des poches fermées
+        assert not tiles.is_wall(*pocket) and not tiles.is_reachable(*pocket)
+    engine = Engine(tiles, tstart, tw, th, patterns, seed=1)
+    for _ in range(2000):
+        engine._spawn_coin()
+        assert engine.coin_pos in reachable
+    assert tiles.first_reachable(exclude={(0, 0)}) == (1, 0)
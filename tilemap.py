@@ -0,0 +1,540 @@
+"""
+Chunked tile maps: large worlds stored as fixed-size wall bitmaps.
+
+    python tilemap.py convert maps/Huge.map            # -> maps/Huge.tmap
+    python tilemap.py convert maps/Huge.map -o out.tmap --chunk 64
+    python tilemap.py info maps/Huge.tmap
+
+An ASCII `.map` of 10k x 10k cells would be parsed into a list of strings
+and then into a set of 10M wall tuples. A `.tmap` file instead holds one
+bitmap per 64x64 tile. The file is memory-mapped, and a tile is decoded
+only when a cell inside it is queried. A small LRU keeps the recently used
+decoded tiles, so movement, rendering, coin spawning and menu previews
+touch only the tiles around what they look at.
+
+The converter also stores which free cells can be reached from the spawn
+point. It labels the connected components of the free cells with a
+union-find over the runs of free cells in each row, and stores a
+"reachable" bitmap for each tile. Coins are only placed on reachable
+cells, so a coin is never spawned in a pocket walled off from the player.
+
+File layout (little-endian):
+    header   magic "MATM", version u16, chunk size u16, width u32, height u32,
+             start x i32, start y i32 (-1, -1 if the map has no 'P')
+    index    one u32 file offset per tile, row-major; 0 = tile without walls
+    reach    (version 2) one u32 per tile: 0 = no reachable cell, 1 = every
+             free cell of the tile is reachable, else the offset of its bitmap
+    tiles    chunk*chunk bits each, bit ly*chunk + lx = cell (lx, ly) is a wall
+             (or, for a reach bitmap, is reachable from the spawn point)
+"""
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+import options as cfg
+from bitgrid import GridState, window_free_mask
+
+MAGIC = b"MATM"
+VERSION = 2
+VERSIONS = (1, 2)   # 1: sans couche d'accessibilité (à reconvertir)
+CHUNK = 64
+TILEMAP_EXT = ".tmap"
+HEADER = struct.Struct("<4sHHIIii")
+INDEX = struct.Struct("<I")
+MAX_SAMPLES = 4096   # tirages aléatoires avant de chercher une case libre par balayage
+FULL_TILE = 1        # entrée de l'index reach: toutes les cases libres de la tuile sont atteignables
+WALLS, REACH = 0, 1  # couches d'une tuile
+_FREE_RUN = re.compile("0+")
+_INVERT = str.maketrans("01", "10")
+
+
+class _WallBits(dict):
+    """Table de str.translate: '#' -> '1', tout le reste -> '0'."""
+
+    def __missing__(self, code):
+        return 49 if code == 35 else 48
+
+_WALL_BITS = _WallBits()
+
+
+class TileMap:
+    """
+    Carte .tmap en lecture seule, projetée en mémoire et décodée par tuiles.
+    Se comporte comme l'ensemble des murs pour `(x, y) in tiles`.
+    """
+
+    def __init__(self, path, cache_size=None):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+        if len(head) < HEADER.size:
+            raise ValueError("Not a tile map (file too short).")
+        magic, version, cs, w, h, sx, sy = HEADER.unpack(head)
+        if magic != MAGIC:
+            raise ValueError("Not a tile map (bad magic).")
+        if version not in VERSIONS:
+            raise ValueError(f"Unsupported tile map version {version}.")
+        self.version = version
+        self.has_reach = version >= 2
+        self.chunk = cs
+        self.w, self.h = w, h
+        self.start = (sx, sy) if sx >= 0 else None
+        self.cols = (w + cs - 1) // cs
+        self.rows = (h + cs - 1) // cs
+        self.tile_bytes = cs * cs // 8
+        self.cache_size = cfg.CHUNK_CACHE_SIZE if cache_size is None else cache_size
+        self._empty = ("0" * cs,) * cs
+        self._mm = None
+        self._tiles = OrderedDict()   # (couche, cx, cy) -> tuple de rangées '0'/'1'
+        self.hits = 0
+        self.misses = 0
+
+    # ----- pagination -----
+    def _map(self):
+        if self._mm is None:
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def _decode(self, cx, cy, layer):
+        mm = self._map()
+        n = self.cols * self.rows
+        (offset,) = INDEX.unpack_from(mm, HEADER.size + INDEX.size * (layer * n + cy * self.cols + cx))
+        if offset == 0:
+            return self._empty
+        if offset == FULL_TILE:
+            # cases atteignables = cases libres de la tuile
+            return tuple(row.translate(_INVERT) for row in self.tile(cx, cy))
+        cs = self.chunk
+        value = int.from_bytes(mm[offset:offset + self.tile_bytes], "little")
+        bits = format(value, f"0{cs * cs}b")[::-1]
+        return tuple(bits[i:i + cs] for i in range(0, cs * cs, cs))
+
+    def tile(self, cx, cy, layer=WALLS):
+        """
+        Rangées '0'/'1' de la tuile (cx, cy), depuis le LRU ou décodées du fichier.
+        `layer`: WALLS ('1' = mur) ou REACH ('1' = atteignable depuis le départ).
+        """
+        key = (layer, cx, cy)
+        tiles = self._tiles
+        rows = tiles.get(key)
+        if rows is not None:
+            self.hits += 1
+            tiles.move_to_end(key)
+            return rows
+        self.misses += 1
+        rows = self._decode(cx, cy, layer)
+        tiles[key] = rows
+        if len(tiles) > self.cache_size:
+            tiles.popitem(last=False)
+        return rows
+
+    def close(self):
+        self._tiles.clear()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    # ----- requêtes -----
+    def is_wall(self, x, y):
+        if not (0 <= x < self.w and 0 <= y < self.h):
+            return False
+        cs = self.chunk
+        return self.tile(x // cs, y // cs)[y % cs][x % cs] == "1"
+
+    def is_reachable(self, x, y):
+        """
+        Case atteignable depuis le départ de la carte. Un .tmap de version 1
+        n'a pas cette couche: toute case libre compte (le reconvertir).
+        """
+        if not (0 <= x < self.w and 0 <= y < self.h):
+            return False
+        cs = self.chunk
+        if not self.has_reach:
+            return self.tile(x // cs, y // cs)[y % cs][x % cs] == "0"
+        return self.tile(x // cs, y // cs, REACH)[y % cs][x % cs] == "1"
+
+    def __contains__(self, pos):
+        return self.is_wall(pos[0], pos[1])
+
+    def window(self, x0, y0, vw, vh):
+        """Murs de la fenêtre (x0, y0, vw, vh): une chaîne '0'/'1' par rangée."""
+        cs = self.chunk
+        cx0, cx1 = x0 // cs, (x0 + vw - 1) // cs
+        out = []
+        for y in range(y0, y0 + vh):
+            cy, ly = divmod(y, cs)
+            row = "".join(self.tile(cx, cy)[ly] for cx in range(cx0, cx1 + 1))
+            start = x0 - cx0 * cs
+            out.append(row[start:start + vw])
+        return out
+
+    def first_free(self, exclude=()):
+        """Première case sans mur (ordre des tuiles), ou None si la carte est pleine."""
+        return self._first(WALLS, "0", exclude)
+
+    def first_reachable(self, exclude=()):
+        """Première case atteignable depuis le départ (ordre des tuiles), ou None."""
+        if not self.has_reach:
+            return self.first_free(exclude)
+        return self._first(REACH, "1", exclude)
+
+    def _first(self, layer, ch, exclude):
+        cs = self.chunk
+        for cy in range(self.rows):
+            for cx in range(self.cols):
+                rows = self.tile(cx, cy, layer)
+                for ly, row in enumerate(rows):
+                    y = cy * cs + ly
+                    if y >= self.h:
+                        break
+                    lx = row.find(ch)
+                    while lx != -1 and cx * cs + lx < self.w:
+                        pos = (cx * cs + lx, y)
+                        if pos not in exclude:
+                            return pos
+                        lx = row.find(ch, lx + 1)
+        return None
+
+    def stats(self):
+        return {"tiles_cached": len(self._tiles), "hits": self.hits, "misses": self.misses}
+
+
+# =========================================
+#  Sparse planes (chunked maps)
+# =========================================
+# On a chunked map the warning, damage and coin planes are not map-sized
+# integers. A plane is a tuple of (rect, mask) pairs: rect = (ox, oy, w, h)
+# in map cells, mask a bitboard local to that rect (bit ly*w + lx). There
+# is one pair per attack (or for the coin), so testing, merging and
+# rendering a plane costs what the attacks cover, whatever the map size.
+
+def reframe(mask, src, dst):
+    """Bits de `mask` (repère du rectangle src) qui tombent dans le rectangle dst, dans le repère de dst."""
+    if src == dst or not mask:
+        return mask
+    sx, sy, sw, sh = src
+    dx, dy, dw, dh = dst
+    x0, x1 = max(sx, dx), min(sx + sw, dx + dw)
+    y0, y1 = max(sy, dy), min(sy + sh, dy + dh)
+    if x0 >= x1 or y0 >= y1:
+        return 0
+    row = (1 << (x1 - x0)) - 1
+    out = 0
+    for y in range(y0, y1):
+        bits = (mask >> ((y - sy) * sw + x0 - sx)) & row
+        if bits:
+            out |= bits << ((y - dy) * dw + x0 - dx)
+    return out
+
+def plane_covers(plane, x, y):
+    """La case (x, y) est-elle dans le plan ?"""
+    for (ox, oy, w, h), mask in plane:
+        if ox <= x < ox + w and oy <= y < oy + h and (mask >> ((y - oy) * w + x - ox)) & 1:
+            return True
+    return False
+
+def plane_without(a, b):
+    """Le plan a privé des cases du plan b (a & ~b des bitboards)."""
+    out = []
+    for rect, mask in a:
+        for other, m in b:
+            mask &= ~reframe(m, other, rect)
+        if mask:
+            out.append((rect, mask))
+    return tuple(out)
+
+def plane_window(plane, window):
+    """Le plan vu dans la fenêtre (x0, y0, vw, vh): masque local de la fenêtre."""
+    mask = 0
+    for rect, m in plane:
+        mask |= reframe(m, rect, window)
+    return mask
+
+
+class ChunkedGridState(GridState):
+    """
+    GridState dont les murs viennent d'une TileMap au lieu d'un plan de bits:
+    aucun plan de la taille de la carte n'est construit. Les plans
+    warning/damage/pièce sont des plans creux ((rect, masque local), ...),
+    et il n'y a pas de `full`.
+    """
+    empty = ()
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.w, self.h = tiles.w, tiles.h
+        self.size = self.w * self.h
+        self.walls = 0
+        self.warning = ()
+        self.damage = ()
+        self.coin = ()
+
+    def bit(self, x, y):
+        return (((x, y, 1, 1), 1),)
+
+    def covers(self, plane, x, y):
+        return plane_covers(plane, x, y)
+
+    def is_wall(self, x, y):
+        return self.tiles.is_wall(x, y)
+
+    def set_coin(self, pos):
+        self.coin = () if pos is None else self.bit(*pos)
+
+    def set_layers(self, warning, damage):
+        self.damage = damage
+        self.warning = plane_without(warning, damage)
+
+    def clear_layers(self):
+        self.warning = ()
+        self.damage = ()
+
+    def hit(self, x, y):
+        return plane_covers(self.damage, x, y)
+
+    def cell_char(self, x, y, warning_char="!", damage_char="X"):
+        if plane_covers(self.damage, x, y):
+            return damage_char
+        if plane_covers(self.warning, x, y):
+            return warning_char
+        return None
+
+    def window_bits(self, plane, x0, y0, vw, vh):
+        """Fenêtre d'un plan creux, au format de GridState.window_bits."""
+        mask = plane_window(plane, (x0, y0, vw, vh))
+        if not mask:
+            return [("0" * vw)] * vh
+        s = format(mask, f"0{vw * vh}b")[::-1]
+        return [s[r * vw:(r + 1) * vw] for r in range(vh)]
+
+    def window_walls(self, x0, y0, vw, vh):
+        return self.tiles.window(x0, y0, vw, vh)
+
+    def free_mask(self, exclude=(), window=None):
+        """
+        Comme GridState.free_mask, lu dans les tuiles: le coût suit la fenêtre.
+        Sans `window`, toute la carte (à éviter sur les très grandes cartes).
+        """
+        if window is None:
+            window = (0, 0, self.w, self.h)
+        return window_free_mask(self.tiles.window(*window), window, exclude)
+
+    def random_free_cell(self, exclude=(), rng=None):
+        """
+        Case tirée au hasard parmi celles atteignables depuis le départ (couche
+        reach du .tmap), hors `exclude`: jamais dans une poche fermée. Balayage
+        des tuiles en dernier recours; None si aucune.
+        """
+        size, w = self.size, self.w
+        reachable = self.tiles.is_reachable
+        for _ in range(MAX_SAMPLES):
+            i = rng.randrange(size)
+            pos = (i % w, i // w)
+            if pos not in exclude and reachable(*pos):
+                return pos
+        return self.tiles.first_reachable(exclude)
+
+
+# ======================
+#   ASCII -> .tmap
+# ======================
+class _Runs:
+    """
+    Segments de cases libres, rangée par rangée, et leurs composantes
+    4-connexes (union-find): deux segments de rangées voisines qui se
+    chevauchent sont reliés. Le coût suit le nombre de segments, pas de cases.
+    """
+
+    def __init__(self):
+        self.x0 = array("i")
+        self.x1 = array("i")
+        self.parent = array("i")
+        self.rows = array("q", [0])   # premier segment de chaque rangée, puis la fin
+
+    def add_row(self, bits):
+        """Rangée '0'/'1' (1 = mur), complétée à la largeur de la carte."""
+        x0, x1, parent = self.x0, self.x1, self.parent
+        start = len(x0)
+        for m in _FREE_RUN.finditer(bits):
+            x0.append(m.start())
+            x1.append(m.end())
+            parent.append(len(parent))
+        end = len(x0)
+        i = self.rows[-2] if len(self.rows) > 1 else start
+        j = start
+        while i < start and j < end:
+            if x0[i] < x1[j] and x0[j] < x1[i]:
+                self.union(i, j)
+            if x1[i] <= x1[j]:
+                i += 1
+            else:
+                j += 1
+        self.rows.append(end)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def at(self, x, y):
+        """Segment qui contient la case (x, y), ou None (mur)."""
+        lo, hi = self.rows[y], self.rows[y + 1]
+        k = bisect_right(self.x0, x, lo, hi) - 1
+        return k if k >= lo and x < self.x1[k] else None
+
+    def spawn(self, start):
+        """Segment du point de départ (spawn_position: 'P', sinon (0, 0), sinon la première case libre)."""
+        if start is not None:
+            k = self.at(*start)
+            if k is not None:
+                return k
+        k = self.at(0, 0)
+        if k is not None:
+            return k
+        return 0 if len(self.x0) else None
+
+
+def _tile_value(band, cx, chunk):
+    value = 0
+    for ly, bits in enumerate(band):
+        seg = bits[cx * chunk:(cx + 1) * chunk]
+        if "1" in seg:
+            value |= int(seg[::-1], 2) << (ly * chunk)
+    return value
+
+def convert_ascii(src, dst=None, chunk=CHUNK):
+    """
+    Convertit une carte ASCII (.map) en .tmap, en deux passes en flux:
+    dimensions d'abord, puis une bande de `chunk` rangées à la fois.
+    Les segments de cases libres de chaque rangée sont gardés (union-find)
+    pour écrire ensuite la couche des cases atteignables depuis le départ.
+    La mémoire utilisée suit la largeur de la carte et le nombre de segments.
+    Retourne le chemin écrit.
+    """
+    if chunk <= 0 or (chunk * chunk) % 8:
+        raise ValueError("Chunk size must be positive and chunk*chunk a multiple of 8.")
+    dst = dst or os.path.splitext(src)[0] + TILEMAP_EXT
+
+    w = h = 0
+    start = None
+    with open(src, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            if start is None:
+                p = line.find("P")
+                if p != -1:
+                    start = (p, h)
+            w = max(w, len(line))
+            h += 1
+    if h == 0:
+        raise ValueError("The map is empty.")
+
+    cols = (w + chunk - 1) // chunk
+    rows = (h + chunk - 1) // chunk
+    tile_bytes = chunk * chunk // 8
+    n = cols * rows
+    index = [0] * n
+    reach = [FULL_TILE] * n
+    sx, sy = start if start is not None else (-1, -1)
+    runs = _Runs()
+
+    tmp = dst + ".tmp"
+    with open(src, "r", encoding="utf-8") as f, open(tmp, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, chunk, w, h, sx, sy))
+        out.write(bytes(INDEX.size * 2 * n))
+
+        def flush(band, cy):
+            for cx in range(cols):
+                value = _tile_value(band, cx, chunk)
+                if value:
+                    index[cy * cols + cx] = out.tell()
+                    out.write(value.to_bytes(tile_bytes, "little"))
+
+        band, cy = [], 0
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            bits = line.translate(_WALL_BITS)
+            runs.add_row(bits.ljust(w, "0"))
+            band.append(bits)
+            if len(band) == chunk:
+                flush(band, cy)
+                band, cy = [], cy + 1
+        if band:
+            flush(band, cy)
+
+        # couche reach: seules les tuiles avec des cases libres hors d'atteinte ont un bitmap
+        spawn = runs.spawn(start)
+        root = runs.find(spawn) if spawn is not None else -1
+        find, x0, x1 = runs.find, runs.x0, runs.x1
+        for cy in range(rows):
+            band, partial = [], set()
+            for y in range(cy * chunk, min(h, (cy + 1) * chunk)):
+                parts, pos = [], 0
+                for k in range(runs.rows[y], runs.rows[y + 1]):
+                    if find(k) == root:
+                        parts.append("0" * (x0[k] - pos))
+                        parts.append("1" * (x1[k] - x0[k]))
+                        pos = x1[k]
+                    else:
+                        partial.update(range(x0[k] // chunk, (x1[k] - 1) // chunk + 1))
+                band.append("".join(parts))
+            for cx in partial:
+                value = _tile_value(band, cx, chunk)
+                if value:
+                    reach[cy * cols + cx] = out.tell()
+                    out.write(value.to_bytes(tile_bytes, "little"))
+                else:
+                    reach[cy * cols + cx] = 0
+
+        out.seek(HEADER.size)
+        out.write(b"".join(INDEX.pack(off) for off in index + reach))
+    os.replace(tmp, dst)
+    return dst
+
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Chunked tile maps (.tmap)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="convert an ASCII .map to .tmap")
+    conv.add_argument("src")
+    conv.add_argument("-o", "--out", help="output path (default: same name, .tmap)")
+    conv.add_argument("--chunk", type=int, default=CHUNK, help="tile size in cells (default 64)")
+    info = sub.add_parser("info", help="print a .tmap header")
+    info.add_argument("path")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.cmd == "convert":
+        dst = convert_ascii(args.src, args.out, args.chunk)
+        tiles = TileMap(dst)
+        print(f"{args.src} -> {dst} ({tiles.w}x{tiles.h}, {tiles.cols}x{tiles.rows} tiles of "
+              f"{tiles.chunk}x{tiles.chunk}, {os.path.getsize(dst)} bytes)")
+    else:
+        tiles = TileMap(args.path)
+        print(f"{args.path}: {tiles.w}x{tiles.h}, start {tiles.start}, "
+              f"{tiles.cols}x{tiles.rows} tiles of {tiles.chunk}x{tiles.chunk}")
+        if not tiles.has_reach:
+            print("version 1: no reachability layer, coins may spawn in closed pockets "
+                  "(convert the .map again)")
+
+if __name__ == "__main__":
+    main()